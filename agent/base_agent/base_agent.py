@@ -4,13 +4,12 @@ Encapsulates core functionality including MCP tool management, AI agent creation
 """
 
 import os
-import json
+import copy
 import asyncio
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Any
 from pathlib import Path
 
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain_openai import ChatOpenAI
 from langchain.agents import create_agent
 from dotenv import load_dotenv
@@ -20,9 +19,18 @@ import sys
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, project_root)
 
-from tools.general_tools import extract_conversation, extract_tool_messages, get_config_value, write_config_value
+from tools.general_tools import extract_conversation, extract_tool_messages, write_config_value, write_config_values
 from tools.price_tools import add_no_trade_record
-from prompts.agent_prompt import get_agent_system_prompt, STOP_SIGNAL
+from tools.trading_calendar import get_trading_calendar
+from tools.position_ledger import get_position_ledger
+from tools.session_context import IN_PROCESS_TRANSPORT, SessionContext, apply_session_headers, new_session
+from tools.conversation_context import ConversationContext
+from tools.session_metrics import SessionMetrics, metrics_file_path
+from tools.session_logger import SessionLogger, log_file_path, DEFAULT_LOG_COMPRESSION
+from tools.mcp_pool import MCPSessionPool, get_schema_cache
+from tools.session_checkpoint import SessionCheckpoint, ResumeGuard, applied_since, checkpoint_file_path, resume_turn
+from tools.llm_cache import CachedChatOpenAI, ReplayMissError, get_cache_store, DEFAULT_CACHE_MODE
+from prompts.agent_prompt import get_agent_system_prompt, load_prompt_template, prepare_agent_prompts, STOP_SIGNAL
 
 # Load environment variables
 load_dotenv()
@@ -67,7 +75,16 @@ class BaseAgent:
         base_delay: float = 0.5,
         openai_base_url: Optional[str] = None,
         initial_cash: float = 10000.0,
-        init_date: str = "2025-10-13"
+        init_date: str = "2025-10-13",
+        context_keep_turns: int = 4,
+        context_max_chars: int = 60000,
+        llm_cache_mode: Optional[str] = None,
+        llm_cache_dir: Optional[str] = None,
+        log_compression: Optional[str] = None,
+        mcp_cache_dir: Optional[str] = None,
+        tool_binding: Optional[str] = None,
+        prompt_template: Optional[str] = None,
+        shared_runtime: bool = True
     ):
         """
         Initialize BaseAgent
@@ -77,13 +94,26 @@ class BaseAgent:
             basemodel: Base model name
             stock_symbols: List of stock symbols, defaults to NASDAQ 100
             mcp_config: MCP tool configuration, including port and URL information
-            log_path: Log path, defaults to ./data/agent_data
+            log_path: Log path, defaults to $AGENT_DATA_DIR or ./data/agent_data
             max_steps: Maximum reasoning steps
             max_retries: Maximum retry attempts
             base_delay: Base delay time for retries
             openai_base_url: OpenAI API base URL
             initial_cash: Initial cash amount
             init_date: Initialization date
+            context_keep_turns: Number of recent steps resent verbatim; older steps are summarized
+            context_max_chars: Character budget for the messages sent at each step
+            llm_cache_mode: "off", "record" or "replay", defaults to $LLM_CACHE_MODE or "off"
+            llm_cache_dir: LLM response store, defaults to $LLM_CACHE_DIR or ./data/llm_cache
+            log_compression: None or "gzip" (log.jsonl.gz), defaults to $LOG_COMPRESSION
+            mcp_cache_dir: MCP tool schema cache, defaults to $MCP_CACHE_DIR or ./data/mcp_cache
+            tool_binding: How the default MCP config reaches the local tools: "http" (MCP servers,
+                default) or "in_process" (Math, LocalPrices and TradeTools called in this process);
+                defaults to $TOOL_BINDING
+            prompt_template: File with a system prompt template (same placeholders as the default
+                prompt), defaults to the built-in prompt
+            shared_runtime: Also write the shared runtime config file (TODAY_DATE, SIGNATURE, IF_TRADE);
+                disable when models run concurrently, their tools get the context from session headers
         """
         self.signature = signature
         self.basemodel = basemodel
@@ -93,21 +123,31 @@ class BaseAgent:
         self.base_delay = base_delay
         self.initial_cash = initial_cash
         self.init_date = init_date
-        
-        # Set MCP configuration
-        self.mcp_config = mcp_config or self._get_default_mcp_config()
+        self.context_keep_turns = context_keep_turns
+        self.context_max_chars = context_max_chars
+        self.llm_cache_mode = llm_cache_mode or DEFAULT_CACHE_MODE
+        self.llm_cache_dir = llm_cache_dir
+        self.mcp_cache_dir = mcp_cache_dir
+        self.tool_binding = tool_binding or os.getenv("TOOL_BINDING", "http")
+        self.prompt_template = load_prompt_template(prompt_template) if prompt_template else None
+        self.shared_runtime = shared_runtime
+        
+        # Set MCP configuration (copied: session headers are set on it per trading session)
+        self.mcp_config = copy.deepcopy(mcp_config) if mcp_config else self._get_default_mcp_config()
         
         # Set log path
-        self.base_log_path = log_path or "./data/agent_data"
+        self.base_log_path = log_path or os.getenv("AGENT_DATA_DIR") or "./data/agent_data"
+        self.log_compression = log_compression or DEFAULT_LOG_COMPRESSION
         
         # Set OpenAI configuration
         self.openai_base_url = openai_base_url or os.getenv("OPENAI_API_BASE")
         
         # Initialize components
-        self.client: Optional[MultiServerMCPClient] = None
+        self.client: Optional[MCPSessionPool] = None
         self.tools: Optional[List] = None
         self.model: Optional[ChatOpenAI] = None
         self.agent: Optional[Any] = None
+        self.session: Optional[SessionContext] = None
         
         # Data paths
         self.data_path = os.path.join(self.base_log_path, self.signature)
@@ -115,6 +155,20 @@ class BaseAgent:
         
     def _get_default_mcp_config(self) -> Dict[str, Dict[str, Any]]:
         """Get default MCP configuration"""
+        if self.tool_binding == "in_process":
+            # The pure-Python tool servers run inside the agent process; search stays an MCP
+            # server (it calls an external API anyway)
+            return {
+                "math": {"transport": IN_PROCESS_TRANSPORT, "module": "agent_tools.tool_math"},
+                "stock_local": {"transport": IN_PROCESS_TRANSPORT, "module": "agent_tools.tool_get_price_local"},
+                "search": {
+                    "transport": "streamable_http",
+                    "url": f"http://localhost:{os.getenv('SEARCH_HTTP_PORT', '8001')}/mcp",
+                },
+                "trade": {"transport": IN_PROCESS_TRANSPORT, "module": "agent_tools.tool_trade"},
+            }
+        if self.tool_binding != "http":
+            raise ValueError(f"Unknown tool binding '{self.tool_binding}', expected 'http' or 'in_process'")
         return {
             "math": {
                 "transport": "streamable_http",
@@ -138,134 +192,198 @@ class BaseAgent:
         """Initialize MCP client and AI model"""
         print(f"🚀 Initializing agent: {self.signature}")
         
-        # Create MCP client
-        self.client = MultiServerMCPClient(self.mcp_config)
+        # Create MCP client: one persistent session per server, tool schemas from the local cache
+        self.client = MCPSessionPool(self.mcp_config, get_schema_cache(self.mcp_cache_dir))
         
         # Get tools
         self.tools = await self.client.get_tools()
         print(f"✅ Loaded {len(self.tools)} MCP tools")
         
-        # Create AI model
-        self.model = ChatOpenAI(
+        # Create AI model; in record/replay mode responses go through the local LLM cache
+        self.model = CachedChatOpenAI(
             model=self.basemodel,
             base_url=self.openai_base_url,
             max_retries=3,
-            timeout=30
+            timeout=30,
+            cache_mode=self.llm_cache_mode,
+            cache_store=get_cache_store(self.llm_cache_dir) if self.llm_cache_mode != "off" else None
         )
+        if self.llm_cache_mode != "off":
+            print(f"💾 LLM cache: {self.llm_cache_mode} ({self.model.cache_store.root})")
         
         # Note: agent will be created in run_trading_session() based on specific date
         # because system_prompt needs the current date and price information
         
         print(f"✅ Agent {self.signature} initialization completed")
     
-    def _setup_logging(self, today_date: str) -> str:
-        """Set up log file path"""
-        log_path = os.path.join(self.base_log_path, self.signature, 'log', today_date)
-        if not os.path.exists(log_path):
-            os.makedirs(log_path)
-        return os.path.join(log_path, "log.jsonl")
+    def _setup_logging(self, today_date: str) -> SessionLogger:
+        """Set up the session's log writer"""
+        log_file = log_file_path(self.base_log_path, self.signature, today_date, self.log_compression)
+        return SessionLogger(log_file, self.signature, compression=self.log_compression)
     
-    def _log_message(self, log_file: str, new_messages: List[Dict[str, str]]) -> None:
-        """Log messages to log file"""
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "signature": self.signature,
-            "new_messages": new_messages
-        }
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
+    def _log_message(self, logger: SessionLogger, new_messages: List[Dict[str, str]]) -> None:
+        """Queue messages for the log file; written in batches by the logger's background task"""
+        logger.log(new_messages)
     
-    async def _ainvoke_with_retry(self, message: List[Dict[str, str]]) -> Any:
-        """Agent invocation with retry"""
+    async def _ainvoke_with_retry(self, message: List[Dict[str, str]], metrics: Optional[SessionMetrics] = None,
+                                  before_retry: Optional[Callable[[], None]] = None) -> Any:
+        """Agent invocation with retry; LLM and tool calls are timed into metrics if given, before_retry runs before each retry"""
+        config = {"recursion_limit": 100}
+        if metrics is not None:
+            config["callbacks"] = [metrics]
         for attempt in range(1, self.max_retries + 1):
             try:
                 return await self.agent.ainvoke(
                     {"messages": message}, 
-                    {"recursion_limit": 100}
+                    config
                 )
+            except ReplayMissError:
+                # Retrying cannot produce a recorded response
+                raise
             except Exception as e:
                 if attempt == self.max_retries:
                     raise e
+                if metrics is not None:
+                    metrics.retry()
                 print(f"⚠️ Attempt {attempt} failed, retrying after {self.base_delay * attempt} seconds...")
                 print(f"Error details: {e}")
                 await asyncio.sleep(self.base_delay * attempt)
+                if before_retry is not None:
+                    before_retry()
     
     async def run_trading_session(self, today_date: str) -> None:
         """
         Run single day trading session
         
+        Resumes from the last completed step if an earlier attempt of the same day
+        left a checkpoint (retry or process restart).
+        
         Args:
             today_date: Trading date
         """
         print(f"📈 Starting trading session: {today_date}")
         
+        ledger = get_position_ledger(self.position_file)
+        checkpoint = SessionCheckpoint(checkpoint_file_path(self.base_log_path, self.signature, today_date))
+        saved = checkpoint.load()
+        
+        # Every MCP tool call of this session carries its signature, date and session id
+        if saved is not None:
+            self.session = SessionContext(self.signature, today_date, saved["session_id"])
+        else:
+            self.session = new_session(self.signature, today_date)
+        apply_session_headers(self.mcp_config, self.session)
+        
         # Set up logging
-        log_file = self._setup_logging(today_date)
+        logger = self._setup_logging(today_date)
+        metrics = SessionMetrics(metrics_file_path(self.base_log_path, self.signature, today_date),
+                                 self.signature, today_date, self.session.session_id)
         
-        # Update system prompt
-        self.agent = create_agent(
-            self.model,
-            tools=self.tools,
-            system_prompt=get_agent_system_prompt(today_date, self.signature),
-        )
+        # Tool schemas may have been refreshed after a server version change
+        self.tools = await self.client.get_tools()
         
         # Initial user query
         user_query = [{"role": "user", "content": f"Please analyze and update today's ({today_date}) positions."}]
-        message = user_query.copy()
+        # Last steps verbatim, older ones folded into a summary, within a character budget
+        context = ConversationContext(user_query, keep_turns=self.context_keep_turns, max_chars=self.context_max_chars)
         
-        # Log initial message
-        self._log_message(log_file, user_query)
-        
-        # Trading loop
+        # Trades already in the ledger from a failed attempt of a step are not executed again
+        guard = ResumeGuard()
         current_step = 0
-        while current_step < self.max_steps:
-            current_step += 1
-            print(f"🔄 Step {current_step}/{self.max_steps}")
+        if saved is not None:
+            context.restore(saved["context"])
+            current_step = saved["step"]
+            # Trades of the step that did not complete are in the ledger already
+            applied = applied_since(ledger, today_date, saved["ledger_mark"])
+            print(f"⏯️ Resuming {today_date} after step {current_step}"
+                  + (f", {len(applied)} trade(s) of the interrupted step already executed" if applied else ""))
+            if applied:
+                context.add_turn(*resume_turn(applied))
+                guard.arm(applied)
+        
+        # Update system prompt
+        self.agent = create_agent(
+            self.model,
+            tools=guard.wrap(self.tools),
+            system_prompt=get_agent_system_prompt(today_date, self.signature, self.prompt_template),
+        )
+        
+        try:
+            if saved is None:
+                # Log initial message
+                self._log_message(logger, user_query)
+                checkpoint.save(self.signature, today_date, self.session.session_id, 0, ledger.max_id(today_date), context.state())
             
-            try:
-                # Call agent
-                response = await self._ainvoke_with_retry(message)
-                
-                # Extract agent response
-                agent_response = extract_conversation(response, "final")
-                
-                # Check stop signal
-                if STOP_SIGNAL in agent_response:
-                    print("✅ Received stop signal, trading session ended")
-                    print(agent_response)
-                    self._log_message(log_file, [{"role": "assistant", "content": agent_response}])
-                    break
-                
-                # Extract tool messages
-                tool_msgs = extract_tool_messages(response)
-                tool_response = '\n'.join([msg.content for msg in tool_msgs])
+            # Trading loop
+            while current_step < self.max_steps:
+                current_step += 1
+                print(f"🔄 Step {current_step}/{self.max_steps}")
+                metrics.start_step(current_step)
                 
-                # Prepare new messages
-                new_messages = [
-                    {"role": "assistant", "content": agent_response},
-                    {"role": "user", "content": f'Tool results: {tool_response}'}
-                ]
-                
-                # Add new messages
-                message.extend(new_messages)
-                
-                # Log messages
-                self._log_message(log_file, new_messages[0])
-                self._log_message(log_file, new_messages[1])
-                
-            except Exception as e:
-                print(f"❌ Trading session error: {str(e)}")
-                print(f"Error details: {e}")
-                raise
+                try:
+                    # Call agent; a retried attempt must not repeat the trades of the failed one
+                    step_mark = ledger.max_id(today_date)
+                    response = await self._ainvoke_with_retry(
+                        context.messages(), metrics,
+                        before_retry=lambda: guard.arm(applied_since(ledger, today_date, step_mark)))
+                    # Later steps may place the same orders again on purpose
+                    guard.arm([])
+                    
+                    # Extract agent response
+                    agent_response = extract_conversation(response, "final")
+                    
+                    # Check stop signal
+                    if STOP_SIGNAL in agent_response:
+                        print("✅ Received stop signal, trading session ended")
+                        print(agent_response)
+                        self._log_message(logger, [{"role": "assistant", "content": agent_response}])
+                        metrics.end_step()
+                        break
+                    
+                    # Extract tool messages
+                    tool_msgs = extract_tool_messages(response)
+                    tool_response = '\n'.join([msg.content for msg in tool_msgs])
+                    
+                    # Prepare new messages
+                    new_messages = [
+                        {"role": "assistant", "content": agent_response},
+                        {"role": "user", "content": f'Tool results: {tool_response}'}
+                    ]
+                    
+                    # Add new messages
+                    context.add_turn(agent_response, tool_msgs, response)
+                    
+                    # Log messages
+                    self._log_message(logger, new_messages[0])
+                    self._log_message(logger, new_messages[1])
+                    metrics.end_step()
+                    
+                    # Step completed: a retry resumes after it, with its trades counted as done
+                    checkpoint.save(self.signature, today_date, self.session.session_id, current_step,
+                                    ledger.max_id(today_date), context.state())
+                    
+                except Exception as e:
+                    print(f"❌ Trading session error: {str(e)}")
+                    print(f"Error details: {e}")
+                    metrics.end_step()
+                    metrics.end_session("failed")
+                    raise
+        
+        finally:
+            # Flush the queued log entries, also when the session failed
+            await logger.aclose()
+        
+        metrics.end_session()
+        checkpoint.clear()
         
         # Handle trading results
         await self._handle_trading_result(today_date)
     
     async def _handle_trading_result(self, today_date: str) -> None:
         """Handle trading results"""
-        if_trade = get_config_value("IF_TRADE")
+        # Trades of this session are in the ledger; the shared IF_TRADE flag is not per-session
+        if_trade = get_position_ledger(self.position_file).max_id(today_date) >= 0
         if if_trade:
-            write_config_value("IF_TRADE", False)
             print("✅ Trading completed")
         else:
             print("📊 No trading, maintaining positions")
@@ -274,6 +392,7 @@ class BaseAgent:
             except NameError as e:
                 print(f"❌ NameError: {e}")
                 raise
+        if self.shared_runtime:
             write_config_value("IF_TRADE", False)
     
     def register_agent(self) -> None:
@@ -293,12 +412,12 @@ class BaseAgent:
         init_position = {symbol: 0 for symbol in self.stock_symbols}
         init_position['CASH'] = self.initial_cash
         
-        with open(self.position_file, "w") as f:  # Use "w" mode to ensure creating new file
-            f.write(json.dumps({
-                "date": self.init_date, 
-                "id": 0, 
-                "positions": init_position
-            }) + "\n")
+        # Written through the ledger so it follows the configured position encoding
+        get_position_ledger(self.position_file).append({
+            "date": self.init_date,
+            "id": 0,
+            "positions": init_position
+        })
         
         print(f"✅ Agent {self.signature} registration completed")
         print(f"📁 Position file: {self.position_file}")
@@ -323,36 +442,31 @@ class BaseAgent:
             self.register_agent()
             max_date = init_date
         else:
-            # Read existing position file, find latest date
-            with open(self.position_file, "r") as f:
-                for line in f:
-                    doc = json.loads(line)
-                    current_date = doc['date']
-                    if max_date is None:
-                        max_date = current_date
-                    else:
-                        current_date_obj = datetime.strptime(current_date, "%Y-%m-%d")
-                        max_date_obj = datetime.strptime(max_date, "%Y-%m-%d")
-                        if current_date_obj > max_date_obj:
-                            max_date = current_date
+            # Latest date comes from the position ledger index
+            max_date = get_position_ledger(self.position_file).max_date() or init_date
+        
+        # A day interrupted after some of its trades were written is resumed from its checkpoint
+        interrupted = [max_date] if SessionCheckpoint(checkpoint_file_path(self.base_log_path, self.signature, max_date)).exists() else []
         
         # Check if new dates need to be processed
         max_date_obj = datetime.strptime(max_date, "%Y-%m-%d")
         end_date_obj = datetime.strptime(end_date, "%Y-%m-%d")
         
         if end_date_obj <= max_date_obj:
-            return []
+            return interrupted
         
-        # Generate trading date list
-        trading_dates = []
-        current_date = max_date_obj + timedelta(days=1)
+        # Generate trading date list from the trading calendar (skips weekends and market holidays)
+        calendar = get_trading_calendar()
+        if calendar.last_data_date and end_date > calendar.last_data_date:
+            print(f"⚠️ No price data after {calendar.last_data_date}, END_DATE {end_date} is capped")
+            end_date = calendar.last_data_date
         
-        while current_date <= end_date_obj:
-            if current_date.weekday() < 5:  # Weekdays
-                trading_dates.append(current_date.strftime("%Y-%m-%d"))
-            current_date += timedelta(days=1)
+        trading_dates = [
+            date for date in calendar.trading_days_between(max_date, end_date)
+            if date > max_date
+        ]
         
-        return trading_dates
+        return interrupted + trading_dates
     
     async def run_with_retry(self, today_date: str) -> None:
         """Run method with retry"""
@@ -362,6 +476,10 @@ class BaseAgent:
                 await self.run_trading_session(today_date)
                 print(f"✅ {self.signature} - {today_date} run successful")
                 return
+            except ReplayMissError as e:
+                # Rerunning the session cannot produce a recorded response
+                print(f"💥 {self.signature} - {today_date} replay miss, not retried: {str(e)}")
+                raise
             except Exception as e:
                 print(f"❌ Attempt {attempt} failed: {str(e)}")
                 if attempt == self.max_retries:
@@ -390,14 +508,15 @@ class BaseAgent:
             return
         
         print(f"📊 Trading days to process: {trading_dates}")
+        prepare_agent_prompts(trading_dates)
         
         # Process each trading day
         for date in trading_dates:
             print(f"🔄 Processing {self.signature} - Date: {date}")
             
-            # Set configuration
-            write_config_value("TODAY_DATE", date)
-            write_config_value("SIGNATURE", self.signature)
+            # Shared runtime config, only read by tools called without session headers (e.g. stdio)
+            if self.shared_runtime:
+                write_config_values({"TODAY_DATE": date, "SIGNATURE": self.signature})
             
             try:
                 await self.run_with_retry(date)
@@ -406,27 +525,35 @@ class BaseAgent:
                 print(e)
                 raise
         
+        if self.llm_cache_mode != "off":
+            store = self.model.cache_store
+            print(f"💾 LLM cache ({self.llm_cache_mode}): {store.stats['hits']} hits, {store.stats['misses']} misses, {store.stats['writes']} recorded")
+        for server, stats in self.client.stats().items():
+            avg = f"{stats['avg_call_time'] * 1000:.1f}ms" if stats["avg_call_time"] is not None else "-"
+            print(f"🔌 MCP {server}: {stats['calls']} calls, {stats['errors']} errors, avg {avg}, "
+                  f"{stats['connects']} connection(s), schema cache {stats['schema_cache']}")
         print(f"✅ {self.signature} processing completed")
     
+    async def close(self) -> None:
+        """Close the MCP sessions"""
+        if self.client is not None:
+            await self.client.close()
+    
     def get_position_summary(self) -> Dict[str, Any]:
         """Get position summary"""
         if not os.path.exists(self.position_file):
             return {"error": "Position file does not exist"}
         
-        positions = []
-        with open(self.position_file, "r") as f:
-            for line in f:
-                positions.append(json.loads(line))
-        
-        if not positions:
+        ledger = get_position_ledger(self.position_file)
+        latest_position = ledger.last_record()
+        if latest_position is None:
             return {"error": "No position records"}
         
-        latest_position = positions[-1]
         return {
             "signature": self.signature,
             "latest_date": latest_position.get("date"),
             "positions": latest_position.get("positions", {}),
-            "total_records": len(positions)
+            "total_records": ledger.count()
         }
     
     def __str__(self) -> str:
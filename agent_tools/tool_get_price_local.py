@@ -1,13 +1,30 @@
 from pathlib import Path
-import json
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from fastmcp import FastMCP
+import sys
 import os
+# Add project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+import numpy as np
+from tools.indicators import compute_indicators
+from tools.price_store import get_price_store, BUY_PRICE_FIELD, HIGH_FIELD, LOW_FIELD, SELL_PRICE_FIELD, VOLUME_FIELD
+from tools.general_tools import source_version
+from tools.session_context import get_session_context
 from dotenv import load_dotenv
 load_dotenv()
 
-mcp = FastMCP("LocalPrices")
+mcp = FastMCP("LocalPrices", version=source_version(__file__))
+
+# Field names accepted by get_prices_local -> bar field in merged.jsonl
+PRICE_FIELDS = {
+    "open": BUY_PRICE_FIELD,
+    "high": HIGH_FIELD,
+    "low": LOW_FIELD,
+    "close": SELL_PRICE_FIELD,
+    "volume": VOLUME_FIELD,
+}
 
 
 def _workspace_data_path(filename: str) -> Path:
@@ -22,6 +39,11 @@ def _validate_date(date_str: str) -> None:
         raise ValueError("date must be in YYYY-MM-DD format") from exc
 
 
+def _session_today() -> Optional[str]:
+    """Trading day of the calling session; bars after it are never served, and of its own bar only the open"""
+    return get_session_context().today_date
+
+
 @mcp.tool()
 def get_price_local(symbol: str, date: str) -> Dict[str, Any]:
     """Read OHLCV data for specified stock and date. Get historical information for specified stock.
@@ -40,40 +62,182 @@ def get_price_local(symbol: str, date: str) -> Dict[str, Any]:
         return {"error": str(e), "symbol": symbol, "date": date}
 
     data_path = _workspace_data_path(filename)
-    if not data_path.exists():
+    store = get_price_store(str(data_path))
+    if not store.exists():
         return {"error": f"Data file not found: {data_path}", "symbol": symbol, "date": date}
 
-    with data_path.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
+    if not store.has_symbol(symbol):
+        return {"error": f"No records found for stock {symbol} in local data", "symbol": symbol, "date": date}
+
+    day = store.get_ohlcv(symbol, date)
+    if day is None:
+        sample_dates = store.available_dates(symbol)[::-1][:5]
+        return {
+            "error": f"Data not found for date {date}. Please verify the date exists in data. Sample available dates: {sample_dates}",
+            "symbol": symbol,
+            "date": date
+        }
+    return {
+        "symbol": symbol,
+        "date": date,
+        "ohlcv": {
+            "open": day.get("1. buy price"),
+            "high": day.get("2. high"),
+            "low": day.get("3. low"), 
+            "close": day.get("4. sell price"),
+            "volume": day.get("5. volume"),
+        },
+    }
+
+
+
+@mcp.tool()
+def get_prices_local(symbols: List[str], dates: List[str], fields: Optional[List[str]] = None, max_rows: Optional[int] = None) -> Dict[str, Any]:
+    """Read OHLCV data for multiple stocks and dates in one call, returned as a compact table.
+
+    Prefer this over calling get_price_local repeatedly.
+
+    Args:
+        symbols: Stock symbols, e.g. ['AAPL', 'MSFT'].
+        dates: Dates in 'YYYY-MM-DD' format.
+        fields: Subset of 'open', 'high', 'low', 'close', 'volume'. Defaults to all five.
+        max_rows: Optional cap on the number of rows returned; remaining rows are dropped and 'truncated' is set.
+
+    Returns:
+        Dictionary with 'columns' (symbol, date, then the requested fields), 'rows' (one list per
+        symbol/date pair that has data, values are numbers or null), 'missing' (pairs without data),
+        'future_dates' (dates after today, not served) and 'truncated'. For today only the open
+        price is available; the other fields are null.
+    """
+    fields = list(fields) if fields else list(PRICE_FIELDS.keys())
+    unknown_fields = [field for field in fields if field not in PRICE_FIELDS]
+    if unknown_fields:
+        return {"error": f"Unknown fields: {unknown_fields}. Valid fields: {list(PRICE_FIELDS.keys())}"}
+    for date in dates:
+        try:
+            _validate_date(date)
+        except ValueError as e:
+            return {"error": f"{e}: {date}"}
+    if max_rows is not None and max_rows < 0:
+        return {"error": "max_rows must be a non-negative integer"}
+
+    data_path = _workspace_data_path("merged.jsonl")
+    store = get_price_store(str(data_path))
+    if not store.exists():
+        return {"error": f"Data file not found: {data_path}"}
+
+    today = _session_today()
+    future_dates = [date for date in dict.fromkeys(dates) if today and date > today]
+    rows: List[List[Any]] = []
+    missing: List[str] = []
+    truncated = False
+    for symbol in dict.fromkeys(symbols):
+        for date in dict.fromkeys(dates):
+            if date in future_dates:
+                continue
+            if not store.has_bar(symbol, date):
+                missing.append(f"{symbol}@{date}")
                 continue
-            doc = json.loads(line)
-            meta = doc.get("Meta Data", {})
-            if meta.get("2. Symbol") != symbol:
+            if max_rows is not None and len(rows) >= max_rows:
+                truncated = True
                 continue
-            series = doc.get("Time Series (Daily)", {})
-            day = series.get(date)
-            if day is None:
-                sample_dates = sorted(series.keys(), reverse=True)[:5]
-                return {
-                    "error": f"Data not found for date {date}. Please verify the date exists in data. Sample available dates: {sample_dates}",
-                    "symbol": symbol,
-                    "date": date
-                }
-            return {
-                "symbol": symbol,
-                "date": date,
-                "ohlcv": {
-                    "open": day.get("1. buy price"),
-                    "high": day.get("2. high"),
-                    "low": day.get("3. low"), 
-                    "close": day.get("4. sell price"),
-                    "volume": day.get("5. volume"),
-                },
-            }
-
-    return {"error": f"No records found for stock {symbol} in local data", "symbol": symbol, "date": date}
+            row: List[Any] = [symbol, date]
+            for field in fields:
+                if date == today and field != "open":
+                    # Today's bar is still forming: only the open is known
+                    row.append(None)
+                    continue
+                value = store.get_price(symbol, date, PRICE_FIELDS[field])
+                row.append(int(value) if field == "volume" and value is not None else value)
+            rows.append(row)
+
+    return {
+        "columns": ["symbol", "date"] + fields,
+        "rows": rows,
+        "missing": missing,
+        "future_dates": future_dates,
+        "truncated": truncated,
+    }
+
 
+@mcp.tool()
+def get_price_history(symbol: str, start: str, end: str, indicators: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Read the daily OHLCV window of a stock with technical indicators computed server-side.
+
+    Use this instead of fetching prices day by day and doing arithmetic with the math tools.
+
+    Args:
+        symbol: Stock symbol, e.g. 'AAPL'.
+        start: First date of the window, 'YYYY-MM-DD' (inclusive).
+        end: Last date of the window, 'YYYY-MM-DD' (inclusive).
+        indicators: Optional indicator specs, name with optional window: 'sma_20', 'ema_12', 'rsi_14',
+            'atr_14', 'volatility_20' (rolling std of daily returns) and 'returns' (daily return).
+            Indicators use all history before `start` for warm-up.
+
+    Returns:
+        Dictionary with 'columns' (date, open, high, low, close, volume, then each indicator) and
+        'rows' (one list per trading day in the window; unavailable values are null). The window
+        ends at today at the latest, and today's row only has the open price.
+    """
+    indicators = list(indicators) if indicators else []
+    try:
+        _validate_date(start)
+        _validate_date(end)
+    except ValueError as e:
+        return {"error": str(e), "symbol": symbol, "start": start, "end": end}
+    if start > end:
+        return {"error": "start must not be after end", "symbol": symbol, "start": start, "end": end}
+    today = _session_today()
+    if today and start > today:
+        return {"error": f"No data after today ({today})", "symbol": symbol, "start": start, "end": end}
+    if today and end > today:
+        end = today
+
+    data_path = _workspace_data_path("merged.jsonl")
+    store = get_price_store(str(data_path))
+    if not store.exists():
+        return {"error": f"Data file not found: {data_path}", "symbol": symbol, "start": start, "end": end}
+
+    dates, columns = store.get_history(symbol)
+    if not dates:
+        return {"error": f"No records found for stock {symbol} in local data", "symbol": symbol, "start": start, "end": end}
+
+    # Indicators are computed over history up to `end` so the window start has warm-up data
+    upto = int(np.searchsorted(dates, end, side="right"))
+    history = {name: np.array(values[:upto], dtype=np.float64) for name, values in columns.items()}
+    if upto and dates[upto - 1] == today:
+        # Today's bar is still forming: only the open is known, so nothing else (and no indicator) uses it
+        for name in history:
+            if name != "open":
+                history[name][-1] = np.nan
+    try:
+        indicator_values = compute_indicators(history, indicators)
+    except ValueError as e:
+        return {"error": str(e), "symbol": symbol, "start": start, "end": end}
+
+    begin = int(np.searchsorted(dates, start, side="left"))
+    series_names = list(PRICE_FIELDS.keys())
+    rows: List[List[Any]] = []
+    for k in range(begin, upto):
+        row: List[Any] = [dates[k]]
+        for name in series_names:
+            value = history[name][k]
+            if np.isnan(value):
+                row.append(None)
+            else:
+                row.append(int(value) if name == "volume" else float(value))
+        for spec in indicators:
+            value = indicator_values[spec][k]
+            row.append(None if np.isnan(value) else round(float(value), 4))
+        rows.append(row)
+
+    return {
+        "symbol": symbol,
+        "start": start,
+        "end": end,
+        "columns": ["date"] + series_names + indicators,
+        "rows": rows,
+    }
 
 
 def get_price_local_function(symbol: str, date: str, filename: str = "merged.jsonl") -> Dict[str, Any]:
@@ -93,39 +257,32 @@ def get_price_local_function(symbol: str, date: str, filename: str = "merged.jso
         return {"error": str(e), "symbol": symbol, "date": date}
 
     data_path = _workspace_data_path(filename)
-    if not data_path.exists():
+    store = get_price_store(str(data_path))
+    if not store.exists():
         return {"error": f"Data file not found: {data_path}", "symbol": symbol, "date": date}
 
-    with data_path.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            doc = json.loads(line)
-            meta = doc.get("Meta Data", {})
-            if meta.get("2. Symbol") != symbol:
-                continue
-            series = doc.get("Time Series (Daily)", {})
-            day = series.get(date)
-            if day is None:
-                sample_dates = sorted(series.keys(), reverse=True)[:5]
-                return {
-                    "error": f"Data not found for date {date}. Please verify the date exists in data. Sample available dates: {sample_dates}",
-                    "symbol": symbol,
-                    "date": date
-                }
-            return {
-                "symbol": symbol,
-                "date": date,
-                "ohlcv": {
-                    "buy price": day.get("1. buy price"),
-                    "high": day.get("2. high"),
-                    "low": day.get("3. low"),
-                    "sell price": day.get("4. sell price"),
-                    "volume": day.get("5. volume"),
-                },
-            }
-
-    return {"error": f"No records found for stock {symbol} in local data", "symbol": symbol, "date": date}
+    if not store.has_symbol(symbol):
+        return {"error": f"No records found for stock {symbol} in local data", "symbol": symbol, "date": date}
+
+    day = store.get_ohlcv(symbol, date)
+    if day is None:
+        sample_dates = store.available_dates(symbol)[::-1][:5]
+        return {
+            "error": f"Data not found for date {date}. Please verify the date exists in data. Sample available dates: {sample_dates}",
+            "symbol": symbol,
+            "date": date
+        }
+    return {
+        "symbol": symbol,
+        "date": date,
+        "ohlcv": {
+            "buy price": day.get("1. buy price"),
+            "high": day.get("2. high"),
+            "low": day.get("3. low"),
+            "sell price": day.get("4. sell price"),
+            "volume": day.get("5. volume"),
+        },
+    }
 
 if __name__ == "__main__":
     # print("a test case")
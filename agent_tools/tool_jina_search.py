@@ -13,7 +13,8 @@ import json
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from tools.general_tools import get_config_value
+from tools.session_context import get_session_context
+from tools.general_tools import source_version
 
 logger = logging.getLogger(__name__)
 
@@ -101,9 +102,9 @@ class WebScrapingJinaTool:
         if not self.api_key:
             raise ValueError("Jina API key not provided! Please set JINA_API_KEY environment variable.")
 
-    def __call__(self, query: str) -> List[Dict[str, Any]]:
+    def __call__(self, query: str, today_date: Optional[str] = None) -> List[Dict[str, Any]]:
         print(f"Searching for {query}")
-        all_urls = self._jina_search(query)
+        all_urls = self._jina_search(query, today_date)
         return_content = []
         print(f"Found {len(all_urls)} URLs")
         if len(all_urls)>1:
@@ -148,7 +149,7 @@ class WebScrapingJinaTool:
                 'error': str(e)
             }
 
-    def _jina_search(self, query: str) -> List[str]:
+    def _jina_search(self, query: str, today_date: Optional[str] = None) -> List[str]:
         url = f'https://s.jina.ai/?q={query}&n=1'
         headers = {
             'Authorization': f'Bearer {self.api_key}',        
@@ -189,7 +190,6 @@ class WebScrapingJinaTool:
                     continue
                 
                 # Check if before TODAY_DATE
-                today_date = get_config_value("TODAY_DATE")
                 if today_date:
                     if today_date > standardized_date:
                         filtered_urls.append(item['url'])
@@ -211,7 +211,7 @@ class WebScrapingJinaTool:
             return []
 
 
-mcp = FastMCP("Search")
+mcp = FastMCP("Search", version=source_version(__file__))
 
 
 @mcp.tool()
@@ -234,7 +234,8 @@ def get_information(query: str) -> str:
     """
     try:
         tool = WebScrapingJinaTool()
-        results = tool(query)
+        # Only results published before the calling session's trading date are returned
+        results = tool(query, get_session_context().today_date)
         
         # Check if results are empty
         if not results:
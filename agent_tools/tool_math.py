@@ -1,9 +1,14 @@
 from fastmcp import FastMCP
+import sys
 import os
+# Add project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from tools.general_tools import source_version
 from dotenv import load_dotenv
 load_dotenv()
 
-mcp = FastMCP("Math")
+mcp = FastMCP("Math", version=source_version(__file__))
 
 @mcp.tool()
 def add(a: float, b: float) -> float:
@@ -1,197 +1,420 @@
 from fastmcp import FastMCP
 import sys
 import os
-from typing import Dict, List, Optional, Any
+import asyncio
+from typing import Dict, List, Any
 # Add project root directory to Python path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
-from tools.price_tools import get_yesterday_date, get_open_prices, get_yesterday_open_and_close_price, get_latest_position, get_yesterday_profit
+from tools.price_tools import get_open_prices, get_latest_position
 import json
-from tools.general_tools import get_config_value,write_config_value
-mcp = FastMCP("TradeTools")
+from tools.position_ledger import get_position_ledger, position_file_path
+from tools.general_tools import source_version, write_config_value
+from tools.session_context import SessionContext, get_session_context
+mcp = FastMCP("TradeTools", version=source_version(__file__))
 
+# One asyncio lock per signature: concurrent tool calls from the same agent are
+# queued here instead of piling up threads on the ledger's file lock
+_trade_locks: Dict[str, asyncio.Lock] = {}
+
+
+def _get_trade_lock(signature: str) -> asyncio.Lock:
+    lock = _trade_locks.get(signature)
+    if lock is None:
+        lock = _trade_locks[signature] = asyncio.Lock()
+    return lock
+
+
+def _get_session() -> SessionContext:
+    # Signature (model name) and trading date of the calling agent session, taken from the
+    # request headers, or from the shared runtime config for clients that do not send them
+    context = get_session_context()
+    if context.signature is None:
+        raise ValueError("SIGNATURE environment variable is not set")
+    return context
+
+
+def _mark_traded(context: SessionContext, traded: bool) -> None:
+    # Agent sessions detect trades from the ledger; IF_TRADE only serves the shared-config flow
+    if traded and context.session_id is None:
+        write_config_value("IF_TRADE", True)
+
+
+def _buy(signature: str, today_date: str, symbol: str, amount: int) -> Dict[str, Any]:
+    """Buy implementation; steps 2-6 run inside one ledger transaction (see buy)"""
+    ledger = get_position_ledger(position_file_path(signature))
+    with ledger.transaction():
+        # Step 2: Get current latest position and operation ID
+        # get_latest_position returns two values: position dictionary and current maximum operation ID
+        # This ID is used to ensure each operation has a unique identifier
+        try:
+            current_position, current_action_id = get_latest_position(today_date, signature)
+        except Exception as e:
+            print(e)
+            print(today_date, signature)
+            return {"error": f"Failed to read the current position: {e}", "symbol": symbol, "date": today_date}
+        # Step 3: Get stock opening price for the day
+        # Use get_open_prices function to get the opening price of specified stock for the day
+        # If stock symbol does not exist or price data is missing, KeyError exception will be raised
+        try:
+            this_symbol_price = get_open_prices(today_date, [symbol])[f'{symbol}_price']
+        except KeyError:
+            # Stock symbol does not exist or price data is missing, return error message
+            return {"error": f"Symbol {symbol} not found! This action will not be allowed.", "symbol": symbol, "date": today_date}
+
+        # Step 4: Validate buy conditions
+        # Calculate cash required for purchase: stock price × buy quantity
+        try:
+            cash_left = current_position["CASH"] - this_symbol_price * amount
+        except Exception as e:
+            print(current_position, "CASH", this_symbol_price, amount)
+            return {"error": f"Cannot price this order: {e}. This action will not be allowed.", "symbol": symbol, "date": today_date}
+
+        # Check if cash balance is sufficient for purchase
+        if cash_left < 0:
+            # Insufficient cash, return error message
+            return {"error": "Insufficient cash! This action will not be allowed.", "required_cash": this_symbol_price * amount, "cash_available": current_position.get("CASH", 0), "symbol": symbol, "date": today_date}
+
+        # Step 5: Execute buy operation, update position
+        # Create a copy of current position to avoid directly modifying original data
+        new_position = current_position.copy()
+
+        # Decrease cash balance
+        new_position["CASH"] = cash_left
+
+        # Increase stock position quantity
+        new_position[symbol] += amount
+
+        # Step 6: Record transaction to position.jsonl file
+        # Append to {project_root}/data/agent_data/{signature}/position/position.jsonl through the
+        # shared PositionLedger; the id comes from the ledger's monotonic counter, and the
+        # held transaction guarantees no other writer read the same position in between
+        record = {"date": today_date, "id": ledger.next_id(current_action_id), "this_action":{"action":"buy","symbol":symbol,"amount":amount},"positions": new_position}
+        print(f"Writing to position.jsonl: {json.dumps(record)}")
+        ledger.append(record)
+    # Step 7: Return updated position
+    return new_position
+
+
+def _sell(signature: str, today_date: str, symbol: str, amount: int) -> Dict[str, Any]:
+    """Sell implementation; steps 2-6 run inside one ledger transaction (see sell)"""
+    ledger = get_position_ledger(position_file_path(signature))
+    with ledger.transaction():
+        # Step 2: Get current latest position and operation ID
+        # get_latest_position returns two values: position dictionary and current maximum operation ID
+        # This ID is used to ensure each operation has a unique identifier
+        current_position, current_action_id = get_latest_position(today_date, signature)
+
+        # Step 3: Get stock opening price for the day
+        # Use get_open_prices function to get the opening price of specified stock for the day
+        # If stock symbol does not exist or price data is missing, KeyError exception will be raised
+        try:
+            this_symbol_price = get_open_prices(today_date, [symbol])[f'{symbol}_price']
+        except KeyError:
+            # Stock symbol does not exist or price data is missing, return error message
+            return {"error": f"Symbol {symbol} not found! This action will not be allowed.", "symbol": symbol, "date": today_date}
+
+        # Step 4: Validate sell conditions
+        # Check if holding this stock
+        if symbol not in current_position:
+            return {"error": f"No position for {symbol}! This action will not be allowed.", "symbol": symbol, "date": today_date}
+
+        # Check if position quantity is sufficient for selling
+        if current_position[symbol] < amount:
+            return {"error": "Insufficient shares! This action will not be allowed.", "have": current_position.get(symbol, 0), "want_to_sell": amount, "symbol": symbol, "date": today_date}
+
+        # Step 5: Execute sell operation, update position
+        # Create a copy of current position to avoid directly modifying original data
+        new_position = current_position.copy()
+
+        # Decrease stock position quantity
+        new_position[symbol] -= amount
+
+        # Increase cash balance: sell price × sell quantity
+        # Use get method to ensure CASH field exists, default to 0 if not present
+        new_position["CASH"] = new_position.get("CASH", 0) + this_symbol_price * amount
+
+        # Step 6: Record transaction to position.jsonl file
+        # Append to {project_root}/data/agent_data/{signature}/position/position.jsonl through the
+        # shared PositionLedger; the id comes from the ledger's monotonic counter, and the
+        # held transaction guarantees no other writer read the same position in between
+        record = {"date": today_date, "id": ledger.next_id(current_action_id), "this_action":{"action":"sell","symbol":symbol,"amount":amount},"positions": new_position}
+        print(f"Writing to position.jsonl: {json.dumps(record)}")
+        ledger.append(record)
+
+    # Step 7: Return updated position
+    return new_position
+
+
+def _execute_orders(signature: str, today_date: str, orders: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Batch implementation; one snapshot, one price lookup and one ledger write (see execute_orders)"""
+    ledger = get_position_ledger(position_file_path(signature))
+    with ledger.transaction():
+        # One position snapshot and one price lookup for the whole batch
+        current_position, current_action_id = get_latest_position(today_date, signature)
+        symbols = [order.get("symbol") for order in orders if isinstance(order, dict) and isinstance(order.get("symbol"), str)]
+        prices = get_open_prices(today_date, symbols)
+
+        position = current_position.copy()
+        next_id = ledger.next_id(current_action_id)
+        records: List[Dict[str, Any]] = []
+        results: List[Dict[str, Any]] = []
+        for index, order in enumerate(orders):
+            order = order if isinstance(order, dict) else {}
+            action = str(order.get("action", "")).lower()
+            symbol = order.get("symbol")
+            amount = order.get("amount")
+            result = {"order": index, "action": action, "symbol": symbol, "amount": amount}
+
+            # Validate against the position as updated by the previous orders of the batch
+            error = None
+            if action not in ("buy", "sell"):
+                error = f"Unknown action '{order.get('action')}', expected 'buy' or 'sell'. This action will not be allowed."
+            elif isinstance(amount, bool) or not isinstance(amount, int) or amount <= 0:
+                error = "Amount must be a positive integer. This action will not be allowed."
+            elif f'{symbol}_price' not in prices or prices[f'{symbol}_price'] is None:
+                error = f"Symbol {symbol} not found! This action will not be allowed."
+            else:
+                price = prices[f'{symbol}_price']
+                result["price"] = price
+                if action == "buy":
+                    cash_left = position.get("CASH", 0) - price * amount
+                    if cash_left < 0:
+                        error = "Insufficient cash! This action will not be allowed."
+                        result.update({"required_cash": price * amount, "cash_available": position.get("CASH", 0)})
+                    else:
+                        position["CASH"] = cash_left
+                        position[symbol] = position.get(symbol, 0) + amount
+                elif symbol not in position:
+                    error = f"No position for {symbol}! This action will not be allowed."
+                elif position[symbol] < amount:
+                    error = "Insufficient shares! This action will not be allowed."
+                    result.update({"have": position.get(symbol, 0), "want_to_sell": amount})
+                else:
+                    position[symbol] -= amount
+                    position["CASH"] = position.get("CASH", 0) + price * amount
+
+            if error is not None:
+                result.update({"status": "rejected", "error": error})
+            else:
+                result["status"] = "filled"
+                records.append({"date": today_date, "id": next_id, "this_action":{"action":action,"symbol":symbol,"amount":amount},"positions": position.copy()})
+                next_id += 1
+            results.append(result)
+
+        # One record per filled order, written in a single buffered append
+        ledger.append_many(records)
+
+    return {
+        "date": today_date,
+        "filled": len(records),
+        "rejected": len(results) - len(records),
+        "results": results,
+        "positions": position,
+    }
 
 
 @mcp.tool()
-def buy(symbol: str, amount: int) -> Dict[str, Any]:
+async def buy(symbol: str, amount: int) -> Dict[str, Any]:
     """
     Buy stock function
-    
+
     This function simulates stock buying operations, including the following steps:
     1. Get current position and operation ID
     2. Get stock opening price for the day
     3. Validate buy conditions (sufficient cash)
     4. Update position (increase stock quantity, decrease cash)
     5. Record transaction to position.jsonl file
-    
+
     Args:
         symbol: Stock symbol, such as "AAPL", "MSFT", etc.
         amount: Buy quantity, must be a positive integer, indicating how many shares to buy
-        
+
     Returns:
         Dict[str, Any]:
           - Success: Returns new position dictionary (containing stock quantity and cash balance)
           - Failure: Returns {"error": error message, ...} dictionary
-        
+
     Raises:
         ValueError: Raised when SIGNATURE environment variable is not set
-        
+
     Example:
         >>> result = buy("AAPL", 10)
         >>> print(result)  # {"AAPL": 110, "MSFT": 5, "CASH": 5000.0, ...}
     """
     # Step 1: Get environment variables and basic information
-    # Get signature (model name) from environment variable, used to determine data storage path
-    signature = get_config_value("SIGNATURE")
-    if signature is None:
-        raise ValueError("SIGNATURE environment variable is not set")
-    
-    # Get current trading date from environment variable
-    today_date = get_config_value("TODAY_DATE")
-    
-    # Step 2: Get current latest position and operation ID
-    # get_latest_position returns two values: position dictionary and current maximum operation ID
-    # This ID is used to ensure each operation has a unique identifier
-    try:
-        current_position, current_action_id = get_latest_position(today_date, signature)
-    except Exception as e:
-        print(e)
-        print(current_position, current_action_id)
-        print(today_date, signature)
-    # Step 3: Get stock opening price for the day
-    # Use get_open_prices function to get the opening price of specified stock for the day
-    # If stock symbol does not exist or price data is missing, KeyError exception will be raised
-    try:
-        this_symbol_price = get_open_prices(today_date, [symbol])[f'{symbol}_price']
-    except KeyError:
-        # Stock symbol does not exist or price data is missing, return error message
-        return {"error": f"Symbol {symbol} not found! This action will not be allowed.", "symbol": symbol, "date": today_date}
-
-    # Step 4: Validate buy conditions
-    # Calculate cash required for purchase: stock price × buy quantity
-    try:
-        cash_left = current_position["CASH"] - this_symbol_price * amount
-    except Exception as e:
-        print(current_position, "CASH", this_symbol_price, amount)
-
-    # Check if cash balance is sufficient for purchase
-    if cash_left < 0:
-        # Insufficient cash, return error message
-        return {"error": "Insufficient cash! This action will not be allowed.", "required_cash": this_symbol_price * amount, "cash_available": current_position.get("CASH", 0), "symbol": symbol, "date": today_date}
-    else:
-        # Step 5: Execute buy operation, update position
-        # Create a copy of current position to avoid directly modifying original data
-        new_position = current_position.copy()
-        
-        # Decrease cash balance
-        new_position["CASH"] = cash_left
-        
-        # Increase stock position quantity
-        new_position[symbol] += amount
-        
-        # Step 6: Record transaction to position.jsonl file
-        # Build file path: {project_root}/data/agent_data/{signature}/position/position.jsonl
-        # Use append mode ("a") to write new transaction record
-        # Each operation ID increments by 1, ensuring uniqueness of operation sequence
-        position_file_path = os.path.join(project_root, "data", "agent_data", signature, "position", "position.jsonl")
-        with open(position_file_path, "a") as f:
-            # Write JSON format transaction record, containing date, operation ID, transaction details and updated position
-            print(f"Writing to position.jsonl: {json.dumps({'date': today_date, 'id': current_action_id + 1, 'this_action':{'action':'buy','symbol':symbol,'amount':amount},'positions': new_position})}")
-            f.write(json.dumps({"date": today_date, "id": current_action_id + 1, "this_action":{"action":"buy","symbol":symbol,"amount":amount},"positions": new_position}) + "\n")
-        # Step 7: Return updated position
-        write_config_value("IF_TRADE", True)
-        print("IF_TRADE", get_config_value("IF_TRADE"))
-        return new_position
+    context = _get_session()
+    # Parallel tool calls are serialized per signature; the ledger's file lock covers other processes
+    async with _get_trade_lock(context.signature):
+        result = await asyncio.to_thread(_buy, context.signature, context.today_date, symbol, amount)
+    _mark_traded(context, "error" not in result)
+    return result
 
 @mcp.tool()
-def sell(symbol: str, amount: int) -> Dict[str, Any]:
+async def sell(symbol: str, amount: int) -> Dict[str, Any]:
     """
     Sell stock function
-    
+
     This function simulates stock selling operations, including the following steps:
     1. Get current position and operation ID
     2. Get stock opening price for the day
     3. Validate sell conditions (position exists, sufficient quantity)
     4. Update position (decrease stock quantity, increase cash)
     5. Record transaction to position.jsonl file
-    
+
     Args:
         symbol: Stock symbol, such as "AAPL", "MSFT", etc.
         amount: Sell quantity, must be a positive integer, indicating how many shares to sell
-        
+
     Returns:
         Dict[str, Any]:
           - Success: Returns new position dictionary (containing stock quantity and cash balance)
           - Failure: Returns {"error": error message, ...} dictionary
-        
+
     Raises:
         ValueError: Raised when SIGNATURE environment variable is not set
-        
+
     Example:
         >>> result = sell("AAPL", 10)
         >>> print(result)  # {"AAPL": 90, "MSFT": 5, "CASH": 15000.0, ...}
     """
     # Step 1: Get environment variables and basic information
-    # Get signature (model name) from environment variable, used to determine data storage path
-    signature = get_config_value("SIGNATURE")
-    if signature is None:
-        raise ValueError("SIGNATURE environment variable is not set")
-    
-    # Get current trading date from environment variable
-    today_date = get_config_value("TODAY_DATE")
-    
-    # Step 2: Get current latest position and operation ID
-    # get_latest_position returns two values: position dictionary and current maximum operation ID
-    # This ID is used to ensure each operation has a unique identifier
-    current_position, current_action_id = get_latest_position(today_date, signature)
-    
-    # Step 3: Get stock opening price for the day
-    # Use get_open_prices function to get the opening price of specified stock for the day
-    # If stock symbol does not exist or price data is missing, KeyError exception will be raised
+    context = _get_session()
+    # Parallel tool calls are serialized per signature; the ledger's file lock covers other processes
+    async with _get_trade_lock(context.signature):
+        result = await asyncio.to_thread(_sell, context.signature, context.today_date, symbol, amount)
+    _mark_traded(context, "error" not in result)
+    return result
+
+
+@mcp.tool()
+async def execute_orders(orders: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Execute a batch of buy/sell orders at today's opening prices
+
+    Orders are validated and applied in the given order against a single
+    position snapshot, so later orders see the cash and shares produced by
+    earlier ones (e.g. sell first to fund a buy). Invalid orders are rejected
+    individually; the remaining orders are still executed. Prefer this over
+    repeated buy/sell calls when rebalancing several stocks.
+
+    Args:
+        orders: List of orders, each {"action": "buy" | "sell", "symbol": "AAPL", "amount": 10}
+            where amount is a positive integer number of shares
+
+    Returns:
+        Dict[str, Any]:
+          - date: Trading date
+          - filled / rejected: Number of executed / rejected orders
+          - results: Per-order {"order", "action", "symbol", "amount", "status", "price" | "error", ...}
+          - positions: Position dictionary after all filled orders
+
+    Example:
+        >>> result = execute_orders([{"action": "sell", "symbol": "MSFT", "amount": 5}, {"action": "buy", "symbol": "AAPL", "amount": 10}])
+        >>> print(result["filled"], result["positions"]["CASH"])
+    """
+    context = _get_session()
+    async with _get_trade_lock(context.signature):
+        result = await asyncio.to_thread(_execute_orders, context.signature, context.today_date, orders)
+    _mark_traded(context, result["filled"] > 0)
+    return result
+
+
+def _stress_worker(orders: int, seed: int) -> int:
+    """Fire `orders` concurrent random buy/sell calls at an in-memory TradeTools client"""
+    import random
+    from fastmcp import Client
+
+    rng = random.Random(seed)
+    symbols = ["AAPL", "MSFT", "NVDA", "AMZN"]
+
+    async def run() -> int:
+        async with Client(mcp) as client:
+            calls = [
+                client.call_tool(rng.choice(["buy", "sell"]), {"symbol": rng.choice(symbols), "amount": rng.randint(1, 5)}, raise_on_error=False)
+                for _ in range(orders)
+            ]
+            results = await asyncio.gather(*calls)
+        return sum(1 for r in results if not r.is_error and "error" not in (r.structured_content or {}))
+
+    return asyncio.run(run())
+
+
+def run_stress_test(orders: int = 400, processes: int = 2) -> bool:
+    """
+    Stress test: concurrent buys/sells from several processes against one ledger
+
+    Each process drives its own in-memory TradeTools client, so both the
+    per-signature asyncio lock and the cross-process file lock are exercised.
+    The ledger is then replayed: ids must be unique and consecutive, every
+    record must equal its predecessor plus its action at the day's open
+    price, cash and holdings must never go negative, and the number of
+    records must match the number of successful trades.
+
+    Returns:
+        True if the ledger is consistent
+    """
+    import shutil
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+    from tools.price_tools import all_nasdaq_100_symbols
+    from tools.trading_calendar import get_trading_calendar
+
+    calendar = get_trading_calendar()
+    today_date = calendar.last_data_date
+    signature = f"stress-test-{os.getpid()}"
+    position_file = position_file_path(signature)
+    runtime_dir = tempfile.mkdtemp()
+    runtime_env = os.path.join(runtime_dir, "runtime_env.json")
+    with open(runtime_env, "w", encoding="utf-8") as f:
+        json.dump({"SIGNATURE": signature, "TODAY_DATE": today_date, "IF_TRADE": False}, f)
+    # Environment fallbacks keep get_config_value working even while the runtime file is rewritten
+    os.environ.update({"RUNTIME_ENV_PATH": runtime_env, "SIGNATURE": signature, "TODAY_DATE": today_date})
+
     try:
-        this_symbol_price = get_open_prices(today_date, [symbol])[f'{symbol}_price']
-    except KeyError:
-        # Stock symbol does not exist or price data is missing, return error message
-        return {"error": f"Symbol {symbol} not found! This action will not be allowed.", "symbol": symbol, "date": today_date}
-
-    # Step 4: Validate sell conditions
-    # Check if holding this stock
-    if symbol not in current_position:
-        return {"error": f"No position for {symbol}! This action will not be allowed.", "symbol": symbol, "date": today_date}
-
-    # Check if position quantity is sufficient for selling
-    if current_position[symbol] < amount:
-        return {"error": "Insufficient shares! This action will not be allowed.", "have": current_position.get(symbol, 0), "want_to_sell": amount, "symbol": symbol, "date": today_date}
-
-    # Step 5: Execute sell operation, update position
-    # Create a copy of current position to avoid directly modifying original data
-    new_position = current_position.copy()
-    
-    # Decrease stock position quantity
-    new_position[symbol] -= amount
-    
-    # Increase cash balance: sell price × sell quantity
-    # Use get method to ensure CASH field exists, default to 0 if not present
-    new_position["CASH"] = new_position.get("CASH", 0) + this_symbol_price * amount
-
-    # Step 6: Record transaction to position.jsonl file
-    # Build file path: {project_root}/data/agent_data/{signature}/position/position.jsonl
-    # Use append mode ("a") to write new transaction record
-    # Each operation ID increments by 1, ensuring uniqueness of operation sequence
-    position_file_path = os.path.join(project_root, "data", "agent_data", signature, "position", "position.jsonl")
-    with open(position_file_path, "a") as f:
-        # Write JSON format transaction record, containing date, operation ID and updated position
-        print(f"Writing to position.jsonl: {json.dumps({'date': today_date, 'id': current_action_id + 1, 'this_action':{'action':'sell','symbol':symbol,'amount':amount},'positions': new_position})}")
-        f.write(json.dumps({"date": today_date, "id": current_action_id + 1, "this_action":{"action":"sell","symbol":symbol,"amount":amount},"positions": new_position}) + "\n")
+        init_position = {symbol: 0 for symbol in all_nasdaq_100_symbols}
+        init_position["CASH"] = 10000.0
+        get_position_ledger(position_file).append({"date": calendar.prev_trading_day(today_date), "id": 0, "positions": init_position})
+
+        per_process = orders // processes
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            succeeded = sum(pool.map(_stress_worker, [per_process] * processes, range(processes)))
+
+        # Decoded records in file order; checkpoint lines are not trades and are skipped
+        records = list(get_position_ledger(position_file).iter_records())
+        prices = get_open_prices(today_date, all_nasdaq_100_symbols)
+        errors = []
+        for prev, record in zip(records, records[1:]):
+            action = record["this_action"]
+            expected = dict(prev["positions"])
+            sign = 1 if action["action"] == "buy" else -1
+            expected[action["symbol"]] += sign * action["amount"]
+            expected["CASH"] -= sign * prices[f"{action['symbol']}_price"] * action["amount"]
+            if record["id"] != prev["id"] + 1:
+                errors.append(f"id {record['id']} follows {prev['id']}")
+            if any(abs(expected[k] - record["positions"][k]) > 1e-6 for k in expected):
+                errors.append(f"id {record['id']}: positions do not follow from id {prev['id']}")
+            if record["positions"]["CASH"] < -1e-6 or any(v < 0 for k, v in record["positions"].items() if k != "CASH"):
+                errors.append(f"id {record['id']}: negative balance")
+        if len(records) - 1 != succeeded:
+            errors.append(f"{succeeded} successful trades but {len(records) - 1} ledger records")
+
+        print(f"Stress test: {orders} orders from {processes} processes, {succeeded} filled, {len(records) - 1} records")
+        for error in errors[:20]:
+            print(f"❌ {error}")
+        print("✅ Ledger consistent" if not errors else f"❌ {len(errors)} inconsistencies")
+        return not errors
+    finally:
+        shutil.rmtree(position_file.parents[1], ignore_errors=True)
+        shutil.rmtree(runtime_dir, ignore_errors=True)
 
-    # Step 7: Return updated position
-    write_config_value("IF_TRADE", True)
-    return new_position
 
 if __name__ == "__main__":
     # new_result = buy("AAPL", 1)
     # print(new_result)
     # new_result = sell("AAPL", 1)
     # print(new_result)
+    if "--stress" in sys.argv:
+        sys.exit(0 if run_stress_test() else 1)
     port = int(os.getenv("TRADE_HTTP_PORT", "8002"))
     mcp.run(transport="streamable-http", port=port)
@@ -3,6 +3,14 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Tuple
+
+from requests.adapters import HTTPAdapter
 
 
 all_nasdaq_100_symbols = [
@@ -19,27 +27,189 @@ all_nasdaq_100_symbols = [
     "ON", "BIIB", "LULU", "CDW", "GFS"
 ]
 
-def get_daily_price(SYMBOL: str):
-    FUNCTION = "TIME_SERIES_DAILY"
-    OUTPUTSIZE = 'compact'
-    APIKEY = os.getenv("ALPHAADVANTAGE_API_KEY")
-    url = f'https://www.alphavantage.co/query?function={FUNCTION}&symbol={SYMBOL}&outputsize={OUTPUTSIZE}&apikey={APIKEY}'
-    r = requests.get(url)
-    data = r.json()
-    print(data)
-    if data.get('Note') is not None or data.get('Information') is not None:
-        print(f"Error")
-        return
-    with open(f'./daily_prices_{SYMBOL}.json', 'w', encoding='utf-8') as f:
+# Alpha Vantage endpoint; override to point the pipeline at a local stand-in server
+BASE_URL = os.getenv("ALPHAVANTAGE_BASE_URL", "https://www.alphavantage.co/query")
+# Requests per minute allowed by the API key's plan
+REQUESTS_PER_MINUTE = float(os.getenv("ALPHAVANTAGE_REQUESTS_PER_MINUTE", "75"))
+MAX_WORKERS = int(os.getenv("ALPHAVANTAGE_MAX_WORKERS", "4"))
+MAX_RETRIES = 5
+BASE_BACKOFF = 2.0
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `capacity` stored"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until one token is available and consume it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def create_session(pool_size: int) -> requests.Session:
+    """HTTP session with a connection pool sized for the worker pool"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_daily_price(session: requests.Session, bucket: TokenBucket, SYMBOL: str, outputsize: str = "compact", base_url: str = BASE_URL) -> Optional[dict]:
+    """
+    Fetch TIME_SERIES_DAILY for one symbol
+
+    Throttling responses ("Note"/"Information"), HTTP 429/5xx and connection
+    errors are retried with exponential backoff and jitter.
+
+    Returns:
+        Parsed JSON payload, or None if all retries failed
+    """
+    params = {
+        "function": "TIME_SERIES_DAILY",
+        "symbol": SYMBOL,
+        "outputsize": outputsize,
+        "apikey": os.getenv("ALPHAADVANTAGE_API_KEY"),
+    }
+    for attempt in range(MAX_RETRIES):
+        bucket.acquire()
+        reason = None
+        try:
+            r = session.get(base_url, params=params, timeout=30)
+            if r.status_code == 429 or r.status_code >= 500:
+                reason = f"HTTP {r.status_code}"
+            else:
+                r.raise_for_status()
+                data = r.json()
+                if data.get('Note') is not None or data.get('Information') is not None:
+                    reason = data.get('Note') or data.get('Information')
+                elif data.get('Error Message') is not None:
+                    print(f"❌ {SYMBOL}: {data['Error Message']}")
+                    return None
+                else:
+                    return data
+        except (requests.RequestException, ValueError) as e:
+            reason = str(e)
+        delay = BASE_BACKOFF * (2 ** attempt) + random.uniform(0, 1)
+        print(f"⚠️ {SYMBOL}: attempt {attempt + 1} throttled/failed ({reason}), retrying in {delay:.1f}s")
+        time.sleep(delay)
+    print(f"❌ {SYMBOL}: giving up after {MAX_RETRIES} attempts")
+    return None
+
+
+def merge_daily_prices(existing: Optional[dict], new: dict) -> dict:
+    """
+    Merge freshly fetched bars into an existing daily_prices payload
+
+    Bars from `new` win on overlapping dates; older bars only present in
+    `existing` are kept, so compact (last ~100 days) fetches extend history
+    instead of truncating it.
+    """
+    if not existing:
+        return new
+    merged_series = dict(existing.get("Time Series (Daily)", {}))
+    merged_series.update(new.get("Time Series (Daily)", {}))
+    merged = dict(new)
+    merged["Time Series (Daily)"] = dict(sorted(merged_series.items(), reverse=True))
+    return merged
+
+
+def _write_json_atomic(path: str, data: dict) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, path)
+
+
+def get_daily_price(SYMBOL: str, session: Optional[requests.Session] = None, bucket: Optional[TokenBucket] = None,
+                    outputsize: str = "compact", base_url: str = BASE_URL, data_dir: str = DATA_DIR) -> bool:
+    """
+    Fetch one symbol and merge it into data_dir/daily_prices_{SYMBOL}.json
+
+    Returns:
+        True on success, False if the fetch failed
+    """
+    session = session or create_session(1)
+    bucket = bucket or TokenBucket(REQUESTS_PER_MINUTE / 60.0, 1)
+    data = fetch_daily_price(session, bucket, SYMBOL, outputsize, base_url)
+    if data is None:
+        return False
+
+    out_path = os.path.join(data_dir, f'daily_prices_{SYMBOL}.json')
+    existing = None
+    if os.path.exists(out_path):
+        try:
+            with open(out_path, 'r', encoding='utf-8') as f:
+                existing = json.load(f)
+        except Exception:
+            existing = None
+    merged = merge_daily_prices(existing, data)
+    _write_json_atomic(out_path, merged)
     if SYMBOL == "QQQ":
-        with open(f'./Adaily_prices_{SYMBOL}.json', 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        _write_json_atomic(os.path.join(data_dir, f'Adaily_prices_{SYMBOL}.json'), merged)
+    return True
+
+
+def fetch_all(symbols: List[str], max_workers: int = MAX_WORKERS, requests_per_minute: float = REQUESTS_PER_MINUTE,
+              outputsize: str = "compact", base_url: str = BASE_URL, data_dir: str = DATA_DIR) -> Tuple[List[str], List[str], float]:
+    """
+    Fetch many symbols with a bounded worker pool sharing one session and one rate limiter
 
+    Returns:
+        (succeeded symbols, failed symbols, elapsed seconds)
+    """
+    session = create_session(max_workers)
+    # Burst of at most one token per worker keeps the average under the quota
+    bucket = TokenBucket(requests_per_minute / 60.0, max(1, max_workers))
+    succeeded: List[str] = []
+    failed: List[str] = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(get_daily_price, symbol, session, bucket, outputsize, base_url, data_dir): symbol
+            for symbol in symbols
+        }
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                ok = future.result()
+            except Exception as e:
+                print(f"❌ {symbol}: {e}")
+                ok = False
+            (succeeded if ok else failed).append(symbol)
+    elapsed = time.perf_counter() - start
+    session.close()
+    return succeeded, failed, elapsed
 
 
 if __name__ == "__main__":
-    for symbol in all_nasdaq_100_symbols:
-        get_daily_price(symbol)
+    parser = argparse.ArgumentParser(description="Fetch daily prices from Alpha Vantage and merge them into daily_prices_*.json")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Number of concurrent fetch workers")
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_MINUTE, help="Requests per minute allowed by the API plan")
+    parser.add_argument("--outputsize", default="compact", choices=["compact", "full"])
+    parser.add_argument("--base-url", default=BASE_URL, help="API endpoint, e.g. a local stand-in server")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("symbols", nargs="*", help="Symbols to fetch, defaults to NASDAQ 100 + QQQ")
+    args = parser.parse_args()
 
-    get_daily_price("QQQ")
\ No newline at end of file
+    symbols = args.symbols or all_nasdaq_100_symbols + ["QQQ"]
+    succeeded, failed, elapsed = fetch_all(symbols, args.workers, args.rate, args.outputsize, args.base_url, args.data_dir)
+    print(f"✅ Fetched {len(succeeded)}/{len(symbols)} symbols in {elapsed:.2f}s ({len(succeeded) / elapsed if elapsed > 0 else 0:.2f} symbols/sec)")
+    if failed:
+        print(f"❌ Failed: {sorted(failed)}")
@@ -1,6 +1,15 @@
 import json
 import os
 import glob
+import sys
+from typing import List, Optional, Tuple
+
+# 将项目根目录加入 Python 路径，便于导入 tools 包
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+from tools.price_cache import build_price_cache, file_content_hash
+from tools.merged_manifest import load_manifest, save_manifest
 
 
 all_nasdaq_100_symbols = [
@@ -17,46 +26,126 @@ all_nasdaq_100_symbols = [
     "ON", "BIIB", "LULU", "CDW", "GFS"
 ]
 
-# 合并所有以 daily_price 开头的 json，逐文件一行写入 merged.jsonl
-current_dir = os.path.dirname(__file__)
-pattern = os.path.join(current_dir, 'daily_price*.json')
-files = sorted(glob.glob(pattern))
+def transform_daily_prices(data: dict) -> dict:
+    """将单个 daily_prices_*.json 转换为 merged.jsonl 中的一行（原地修改并返回）"""
+    # 统一重命名："1. open" -> "1. buy price"；"4. close" -> "4. sell price"
+    # 对于最新的一天，只保留并写入 "1. buy price"
+    try:
+        series = data.get("Time Series (Daily)", {})
+        if isinstance(series, dict) and series:
+            # 先对所有日期做键名重命名
+            for d, bar in list(series.items()):
+                if not isinstance(bar, dict):
+                    continue
+                if "1. open" in bar:
+                    bar["1. buy price"] = bar.pop("1. open")
+                if "4. close" in bar:
+                    bar["4. sell price"] = bar.pop("4. close")
+            # 再处理最新日期，仅保留买入价
+            latest_date = max(series.keys())
+            latest_bar = series.get(latest_date, {})
+            if isinstance(latest_bar, dict):
+                buy_val = latest_bar.get("1. buy price")
+                series[latest_date] = {"1. buy price": buy_val} if buy_val is not None else {}
+            # 更新 Meta Data 描述
+            meta = data.get("Meta Data", {})
+            if isinstance(meta, dict):
+                meta["1. Information"] = "Daily Prices (buy price, high, low, sell price) and Volumes"
+    except Exception:
+        # 若结构异常则原样写入
+        pass
+    return data
+
+
+def _file_stamp(path: str) -> Optional[List[int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def merge_daily_prices(data_dir: str, output_file: str, force: bool = False) -> Tuple[bool, int, int]:
+    """
+    增量合并 data_dir 下所有 daily_price*.json 到 output_file（每个文件一行）
+
+    通过清单（merged_manifest.json）记录每个源文件的 sha256 与 mtime/size：
+    未变化的符号直接复用上一版 merged.jsonl 中对应的行，只有变化的文件才会重新解析。
+    输出先写入临时文件再 os.replace 原子替换，读取方永远不会看到半写的文件；
+    每次内容变化时 generation 加一，供 PriceStore 等读取方廉价地判断缓存是否失效。
+
+    Args:
+        data_dir: daily_price*.json 所在目录
+        output_file: merged.jsonl 路径
+        force: 忽略清单，全部重新处理
 
-output_file = os.path.join(current_dir, 'merged.jsonl')
+    Returns:
+        (是否重写了 output_file, 重新处理的文件数, 当前 generation)
+    """
+    files = sorted(glob.glob(os.path.join(data_dir, 'daily_price*.json')))
+    manifest = load_manifest(output_file)
+    old_entries = manifest.get("files", {})
 
-with open(output_file, 'w', encoding='utf-8') as fout:
+    # 仅当 merged.jsonl 仍是上次合并写出的版本时，才能复用其中的行
+    old_lines: List[str] = []
+    if not force and manifest.get("output_stamp") is not None and manifest["output_stamp"] == _file_stamp(output_file):
+        with open(output_file, 'r', encoding='utf-8') as f:
+            old_lines = f.readlines()
+
+    new_lines: List[str] = []
+    new_entries = {}
+    reprocessed = 0
     for fp in files:
         basename = os.path.basename(fp)
         # 仅当文件名包含任一纳指100成分符号时才写入
         if not any(symbol in basename for symbol in all_nasdaq_100_symbols):
             continue
-        with open(fp, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        # 统一重命名："1. open" -> "1. buy price"；"4. close" -> "4. sell price"
-        # 对于最新的一天，只保留并写入 "1. buy price"
-        try:
-            series = data.get("Time Series (Daily)", {})
-            if isinstance(series, dict) and series:
-                # 先对所有日期做键名重命名
-                for d, bar in list(series.items()):
-                    if not isinstance(bar, dict):
-                        continue
-                    if "1. open" in bar:
-                        bar["1. buy price"] = bar.pop("1. open")
-                    if "4. close" in bar:
-                        bar["4. sell price"] = bar.pop("4. close")
-                # 再处理最新日期，仅保留买入价
-                latest_date = max(series.keys())
-                latest_bar = series.get(latest_date, {})
-                if isinstance(latest_bar, dict):
-                    buy_val = latest_bar.get("1. buy price")
-                    series[latest_date] = {"1. buy price": buy_val} if buy_val is not None else {}
-                # 更新 Meta Data 描述
-                meta = data.get("Meta Data", {})
-                if isinstance(meta, dict):
-                    meta["1. Information"] = "Daily Prices (buy price, high, low, sell price) and Volumes"
-        except Exception:
-            # 若结构异常则原样写入
-            pass
-
-        fout.write(json.dumps(data, ensure_ascii=False) + "\n")
+        stamp = _file_stamp(fp)
+        entry = old_entries.get(basename)
+        reusable = entry is not None and 0 <= entry.get("line", -1) < len(old_lines)
+        if reusable and entry.get("stamp") == stamp:
+            # mtime/size 未变，无需计算哈希
+            content_hash = entry["hash"]
+            line = old_lines[entry["line"]]
+        else:
+            content_hash = file_content_hash(fp)
+            if reusable and entry.get("hash") == content_hash:
+                line = old_lines[entry["line"]]
+            else:
+                with open(fp, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                line = json.dumps(transform_daily_prices(data), ensure_ascii=False) + "\n"
+                reprocessed += 1
+        new_entries[basename] = {"hash": content_hash, "stamp": stamp, "line": len(new_lines)}
+        new_lines.append(line)
+
+    generation = int(manifest.get("generation", 0))
+    changed = new_lines != old_lines
+    if changed:
+        tmp_file = os.path.join(os.path.dirname(output_file), f".{os.path.basename(output_file)}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as fout:
+            fout.writelines(new_lines)
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.replace(tmp_file, output_file)
+        generation += 1
+
+    save_manifest(output_file, {
+        "generation": generation,
+        "output_stamp": _file_stamp(output_file),
+        "files": new_entries,
+    })
+    return changed, reprocessed, generation
+
+
+if __name__ == "__main__":
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    output_file = os.path.join(current_dir, 'merged.jsonl')
+
+    changed, reprocessed, generation = merge_daily_prices(current_dir, output_file, force="--force" in sys.argv)
+    print(f"merged.jsonl {'updated' if changed else 'unchanged'}: {reprocessed} file(s) re-processed, generation {generation}")
+
+    # 同步生成列式二进制价格缓存（data/price_cache/），merged.jsonl 仍为唯一数据源；
+    # 仅当 merged.jsonl 内容哈希变化时才会重建
+    if build_price_cache(output_file):
+        print(f"Price cache rebuilt: {os.path.join(current_dir, 'price_cache')}")
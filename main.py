@@ -1,4 +1,5 @@
 import os
+import time
 import asyncio
 from datetime import datetime, timedelta
 import json
@@ -7,7 +8,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import tools and prompts
-from tools.general_tools import get_config_value, write_config_value
+from tools.general_tools import get_config_value, write_config_values
 from prompts.agent_prompt import all_nasdaq_100_symbols
 
 
@@ -140,6 +141,15 @@ async def main(config_path=None):
     max_retries = agent_config.get("max_retries", 3)
     base_delay = agent_config.get("base_delay", 0.5)
     initial_cash = agent_config.get("initial_cash", 10000.0)
+    context_keep_turns = agent_config.get("context_keep_turns", 4)
+    context_max_chars = agent_config.get("context_max_chars", 60000)
+    # "record" stores every LLM response, "replay" reruns from the store without network access
+    llm_cache_mode = os.getenv("LLM_CACHE_MODE") or agent_config.get("llm_cache_mode", "off")
+    llm_cache_dir = agent_config.get("llm_cache_dir")
+    # Number of models run at the same time; 1 runs them one after another
+    max_concurrency = int(os.getenv("MAX_CONCURRENCY", agent_config.get("max_concurrency", 1)))
+    if os.getenv("MAX_CONCURRENCY"):
+        print(f"⚠️  Using environment variable to override max_concurrency: {max_concurrency}")
     
     # Display enabled model information
     model_names = [m.get("name", m.get("signature")) for m in enabled_models]
@@ -148,78 +158,143 @@ async def main(config_path=None):
     print(f"🤖 Agent type: {agent_type}")
     print(f"📅 Date range: {INIT_DATE} to {END_DATE}")
     print(f"🤖 Model list: {model_names}")
-    print(f"⚙️  Agent config: max_steps={max_steps}, max_retries={max_retries}, base_delay={base_delay}, initial_cash={initial_cash}")
-                    
-    for model_config in enabled_models:
-        # Read basemodel and signature directly from configuration file
-        model_name = model_config.get("name", "unknown")
-        basemodel = model_config.get("basemodel")
-        signature = model_config.get("signature")
+    print(f"⚙️  Agent config: max_steps={max_steps}, max_retries={max_retries}, base_delay={base_delay}, initial_cash={initial_cash}, max_concurrency={max_concurrency}")
+
+    agent_kwargs = {
+        "stock_symbols": all_nasdaq_100_symbols,
+        # AGENT_DATA_DIR is where the trade and price tools look for the ledgers, so it wins over the config
+        "log_path": os.getenv("AGENT_DATA_DIR") or log_config.get("log_path", "./data/agent_data"),
+        "max_steps": max_steps,
+        "max_retries": max_retries,
+        "base_delay": base_delay,
+        "initial_cash": initial_cash,
+        "init_date": INIT_DATE,
+        "context_keep_turns": context_keep_turns,
+        "context_max_chars": context_max_chars,
+        "llm_cache_mode": llm_cache_mode,
+        "llm_cache_dir": llm_cache_dir,
+        "log_compression": os.getenv("LOG_COMPRESSION") or log_config.get("compression"),
+        # "in_process" calls the math, price and trade tools in this process instead of over HTTP
+        "tool_binding": os.getenv("TOOL_BINDING") or agent_config.get("tool_binding", "http"),
+        "prompt_template": agent_config.get("prompt_template"),
+    }
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run_limited(model_config):
+        async with semaphore:
+            return await run_model(AgentClass, model_config, INIT_DATE, END_DATE, agent_kwargs, shared_runtime=max_concurrency <= 1)
+
+    results = await asyncio.gather(*[run_limited(model_config) for model_config in enabled_models])
+
+    print_summary(results)
+    print("🎉 All models processing completed!")
+    return results
+
+
+async def run_model(AgentClass, model_config, INIT_DATE, END_DATE, agent_kwargs, shared_runtime=True):
+    """Run one model over the date range
+    
+    Failures are reported in the returned result instead of stopping the other models.
+    
+    Args:
+        AgentClass: Agent class to instantiate
+        model_config: Model entry from the configuration file
+        INIT_DATE: Start date
+        END_DATE: End date
+        agent_kwargs: Keyword arguments shared by all agents (log_path, max_steps, ...)
+        shared_runtime: Initialize and update the shared runtime config file; only meaningful
+            when models run one at a time, concurrent agents pass their context to the
+            tools with each MCP request instead
         
-        # Validate required fields
-        if not basemodel:
-            print(f"❌ Model {model_name} missing basemodel field")
-            continue
-        if not signature:
-            print(f"❌ Model {model_name} missing signature field")
-            continue
+    Returns:
+        dict: {"name", "signature", "status", "elapsed", "latest_date", "cash", "error"}
+    """
+    # Read basemodel and signature directly from configuration file
+    model_name = model_config.get("name", "unknown")
+    basemodel = model_config.get("basemodel")
+    signature = model_config.get("signature")
+    result = {"name": model_name, "signature": signature, "status": "skipped", "elapsed": 0.0,
+              "latest_date": None, "cash": None, "error": None}
+    
+    # Validate required fields
+    if not basemodel:
+        print(f"❌ Model {model_name} missing basemodel field")
+        result["error"] = "missing basemodel field"
+        return result
+    if not signature:
+        print(f"❌ Model {model_name} missing signature field")
+        result["error"] = "missing signature field"
+        return result
+    
+    print("=" * 60)
+    print(f"🤖 Processing model: {model_name}")
+    print(f"📝 Signature: {signature}")
+    print(f"🔧 BaseModel: {basemodel}")
+    
+    # Initialize runtime configuration
+    if shared_runtime:
+        write_config_values({"SIGNATURE": signature, "TODAY_DATE": END_DATE, "IF_TRADE": False})
+
+    start = time.perf_counter()
+    agent = None
+    try:
+        # Dynamically create Agent instance
+        agent = AgentClass(signature=signature, basemodel=basemodel, shared_runtime=shared_runtime, **agent_kwargs)
         
-        print("=" * 60)
-        print(f"🤖 Processing model: {model_name}")
-        print(f"📝 Signature: {signature}")
-        print(f"🔧 BaseModel: {basemodel}")
+        print(f"✅ {type(agent).__name__} instance created successfully: {agent}")
         
-        # Initialize runtime configuration
-        write_config_value("SIGNATURE", signature)
-        write_config_value("TODAY_DATE", END_DATE)
-        write_config_value("IF_TRADE", False)
-
-
-        # Get log path configuration
-        log_path = log_config.get("log_path", "./data/agent_data")
-
-        try:
-            # Dynamically create Agent instance
-            agent = AgentClass(
-                signature=signature,
-                basemodel=basemodel,
-                stock_symbols=all_nasdaq_100_symbols,
-                log_path=log_path,
-                max_steps=max_steps,
-                max_retries=max_retries,
-                base_delay=base_delay,
-                initial_cash=initial_cash,
-                init_date=INIT_DATE
-            )
-            
-            print(f"✅ {agent_type} instance created successfully: {agent}")
-            
-            # Initialize MCP connection and AI model
-            await agent.initialize()
-            print("✅ Initialization successful")
-            # Run all trading days in date range
-            await agent.run_date_range(INIT_DATE, END_DATE)
-            
-            # Display final position summary
-            summary = agent.get_position_summary()
-            print(f"📊 Final position summary:")
-            print(f"   - Latest date: {summary.get('latest_date')}")
-            print(f"   - Total records: {summary.get('total_records')}")
-            print(f"   - Cash balance: ${summary.get('positions', {}).get('CASH', 0):.2f}")
-            
-        except Exception as e:
-            print(f"❌ Error processing model {model_name} ({signature}): {str(e)}")
-            print(f"📋 Error details: {e}")
-            # Can choose to continue processing next model, or exit
-            # continue  # Continue processing next model
-            exit()  # Or exit program
+        # Initialize MCP connection and AI model
+        await agent.initialize()
+        print(f"✅ Initialization successful: {signature}")
+        # Run all trading days in date range
+        await agent.run_date_range(INIT_DATE, END_DATE)
         
+        # Display final position summary
+        summary = agent.get_position_summary()
+        print(f"📊 Final position summary ({signature}):")
+        print(f"   - Latest date: {summary.get('latest_date')}")
+        print(f"   - Total records: {summary.get('total_records')}")
+        print(f"   - Cash balance: ${summary.get('positions', {}).get('CASH', 0):.2f}")
+        result.update({"status": "completed", "latest_date": summary.get("latest_date"),
+                       "cash": summary.get("positions", {}).get("CASH")})
+        
+    except Exception as e:
+        print(f"❌ Error processing model {model_name} ({signature}): {str(e)}")
+        print(f"📋 Error details: {e}")
+        result.update({"status": "failed", "error": str(e)})
+    finally:
+        if agent is not None:
+            await agent.close()
+        result["elapsed"] = time.perf_counter() - start
+    
+    if result["status"] == "completed":
         print("=" * 60)
         print(f"✅ Model {model_name} ({signature}) processing completed")
         print("=" * 60)
-    
-    print("🎉 All models processing completed!")
-    
+    return result
+
+
+def print_summary(results):
+    """Print one row per model: status, wall time, latest date and cash"""
+    rows = [("Model", "Signature", "Status", "Time", "Latest date", "Cash")]
+    for r in results:
+        rows.append((
+            str(r["name"]),
+            str(r["signature"]),
+            r["status"] if r["error"] is None else f"{r['status']} ({r['error'][:40]})",
+            f"{r['elapsed']:.1f}s",
+            str(r["latest_date"] or "-"),
+            f"${r['cash']:.2f}" if r["cash"] is not None else "-",
+        ))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    print("=" * 60)
+    print("📋 Run summary")
+    for i, row in enumerate(rows):
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+        if i == 0:
+            print("  ".join("-" * width for width in widths))
+    print("=" * 60)
+
 if __name__ == "__main__":
     import sys
     
@@ -233,5 +308,7 @@ if __name__ == "__main__":
     else:
         print(f"📄 Using default configuration file: configs/default_config.json")
     
-    asyncio.run(main(config_path))
+    results = asyncio.run(main(config_path))
+    if any(r["status"] == "failed" for r in results):
+        sys.exit(1)
 
@@ -1,16 +1,12 @@
 import os
 from dotenv import load_dotenv
 load_dotenv()
-import json
-from datetime import datetime, timedelta
-from pathlib import Path
-from typing import Dict, List, Optional
+from typing import List, Optional
 import sys
-import os
 # Add project root directory to Python path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
-from tools.price_tools import get_yesterday_date, get_open_prices, get_yesterday_open_and_close_price, get_today_init_position, get_yesterday_profit
+from tools.prompt_context import get_prompt_context_builder
 from tools.general_tools import get_config_value
 
 all_nasdaq_100_symbols = [
@@ -65,22 +61,24 @@ When you think your task is complete, output
 {STOP_SIGNAL}
 """
 
-def get_agent_system_prompt(today_date: str, signature: str) -> str:
+def load_prompt_template(path: str) -> str:
+    """Read a system prompt template; it may use the same {placeholders} as agent_system_prompt"""
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def get_agent_system_prompt(today_date: str, signature: str, template: Optional[str] = None) -> str:
     print(f"signature: {signature}")
     print(f"today_date: {today_date}")
-    # Get yesterday's buy and sell prices
-    yesterday_buy_prices, yesterday_sell_prices = get_yesterday_open_and_close_price(today_date, all_nasdaq_100_symbols)
-    today_buy_price = get_open_prices(today_date, all_nasdaq_100_symbols)
-    today_init_position = get_today_init_position(today_date, signature)
-    yesterday_profit = get_yesterday_profit(today_date, yesterday_buy_prices, yesterday_sell_prices, today_init_position)
-    return agent_system_prompt.format(
-        date=today_date, 
-        positions=today_init_position, 
-        STOP_SIGNAL=STOP_SIGNAL,
-        yesterday_close_price=yesterday_sell_prices,
-        today_buy_price=today_buy_price,
-        yesterday_profit=yesterday_profit
-    )
+    # Yesterday's prices, today's buy prices, initial positions and yesterday's profit,
+    # precomputed for the date range (see prepare_agent_prompts) and cached per day
+    context = get_prompt_context_builder(all_nasdaq_100_symbols).context(today_date, signature)
+    return (template or agent_system_prompt).format(STOP_SIGNAL=STOP_SIGNAL, **context)
+
+
+def prepare_agent_prompts(dates: List[str]) -> None:
+    """Compute the price context of all dates in one pass before their sessions run"""
+    get_prompt_context_builder(all_nasdaq_100_symbols).prepare(dates)
 
 
 
@@ -0,0 +1,284 @@
+"""
+Local OpenAI-compatible chat-completions server for stub mode and load testing.
+
+Point BaseAgent at it with OPENAI_API_BASE=http://localhost:8010/v1 (any
+OPENAI_API_KEY works). Each request is answered by a deterministic trading
+policy instead of a real model, so the whole main.py -> MCP -> ledger pipeline
+can run without any external service.
+
+The server is stateless: a policy decides a trading day's orders from the
+request itself (date, positions and prices in the system prompt, tools bound
+to the request). The first completion of an agent invocation returns the
+day's orders as parallel buy/sell tool calls; once the request carries tool
+results, the reply is a final message with the stop signal. A day without
+orders is finished right away, so every session takes one or two completions.
+
+Policies (--policy, or per request by naming the model "stub/<policy>"):
+    random:       seeded random buys and sells within the available cash/shares
+    buy_and_hold: on the first day (no holdings) spread the cash over a set of
+                  symbols, then never trade again
+    replay:       repeat the buy/sell actions recorded in a position.jsonl
+    module:func   any callable (context dict) -> list of {"action", "symbol", "amount"}
+"""
+
+import os
+import ast
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import importlib
+import re
+from typing import Any, Callable, Dict, List, Optional
+import sys
+
+# Add project root directory to Python path to allow running this file from subdirectories
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from prompts.agent_prompt import STOP_SIGNAL
+from tools.position_ledger import PositionLedger, position_file_path
+
+DEFAULT_PORT = int(os.getenv("STUB_LLM_PORT", "8010"))
+TRADE_TOOLS = ("buy", "sell")
+
+_DATE_RE = re.compile(r"Today's date:\s*(\d{4}-\d{2}-\d{2})")
+_POSITIONS_RE = re.compile(r"Yesterday's closing positions[^\n]*\n(\{[^\n]*\})")
+_PRICES_RE = re.compile(r"Today's buying prices:\s*\n(\{[^\n]*\})")
+
+
+def _literal(pattern: re.Pattern, text: str) -> dict:
+    match = pattern.search(text)
+    if not match:
+        return {}
+    try:
+        value = ast.literal_eval(match.group(1))
+    except (ValueError, SyntaxError):
+        return {}
+    return value if isinstance(value, dict) else {}
+
+
+def parse_context(request: dict) -> Dict[str, Any]:
+    """
+    Trading context of a chat-completions request
+
+    Returns:
+        {"model", "date", "positions", "prices" ({symbol: price}), "tools" (names),
+         "has_tool_results"}
+    """
+    messages = request.get("messages", [])
+    system = "\n".join(str(m.get("content") or "") for m in messages if m.get("role") == "system")
+    prices = {k[:-len("_price")]: v for k, v in _literal(_PRICES_RE, system).items() if k.endswith("_price") and v is not None}
+    date = None
+    match = _DATE_RE.search(system)
+    if match:
+        date = match.group(1)
+    tools = [t.get("function", {}).get("name") for t in request.get("tools") or []]
+    return {
+        "model": request.get("model", ""),
+        "date": date,
+        "positions": _literal(_POSITIONS_RE, system),
+        "prices": prices,
+        "tools": tools,
+        "has_tool_results": bool(messages) and messages[-1].get("role") == "tool",
+    }
+
+
+def _rng(seed: int, context: Dict[str, Any]) -> random.Random:
+    digest = hashlib.sha256(f"{seed}:{context['model']}:{context['date']}".encode()).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+
+def random_policy(context: Dict[str, Any], seed: int = 0, max_orders: int = 3) -> List[Dict[str, Any]]:
+    """Up to max_orders random orders that stay within the available cash and shares"""
+    rng = _rng(seed, context)
+    cash = float(context["positions"].get("CASH", 0))
+    holdings = {k: v for k, v in context["positions"].items() if k != "CASH"}
+    symbols = sorted(context["prices"])
+    orders = []
+    for _ in range(rng.randint(0, max_orders) if symbols else 0):
+        held = [s for s in symbols if holdings.get(s, 0) > 0]
+        if held and rng.random() < 0.5:
+            symbol = rng.choice(held)
+            amount = rng.randint(1, int(holdings[symbol]))
+            # Sale proceeds are not spent the same day: the orders run as parallel tool
+            # calls in any order, so each order must succeed whichever runs first
+            holdings[symbol] -= amount
+            orders.append({"action": "sell", "symbol": symbol, "amount": amount})
+        else:
+            symbol = rng.choice(symbols)
+            affordable = int(cash // context["prices"][symbol])
+            if affordable < 1:
+                continue
+            amount = rng.randint(1, min(affordable, 10))
+            holdings[symbol] = holdings.get(symbol, 0) + amount
+            cash -= amount * context["prices"][symbol]
+            orders.append({"action": "buy", "symbol": symbol, "amount": amount})
+    return orders
+
+
+def buy_and_hold_policy(context: Dict[str, Any], symbols: Optional[List[str]] = None, invest: float = 0.95) -> List[Dict[str, Any]]:
+    """Spread `invest` of the cash equally over symbols when nothing is held yet"""
+    if any(v for k, v in context["positions"].items() if k != "CASH"):
+        return []
+    symbols = [s for s in (symbols or ["NVDA", "MSFT", "AAPL", "AMZN", "GOOGL", "META", "AVGO", "TSLA", "COST", "NFLX"]) if s in context["prices"]]
+    if not symbols:
+        return []
+    budget = float(context["positions"].get("CASH", 0)) * invest / len(symbols)
+    orders = []
+    for symbol in symbols:
+        amount = int(budget // context["prices"][symbol])
+        if amount > 0:
+            orders.append({"action": "buy", "symbol": symbol, "amount": amount})
+    return orders
+
+
+def make_replay_policy(source: str) -> Callable[[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Policy replaying the buy/sell actions recorded in a position.jsonl (path or agent signature)"""
+    position_file = source if source.endswith(".jsonl") else position_file_path(source)
+    ledger = PositionLedger(position_file)
+    actions: Dict[str, List[Dict[str, Any]]] = {}
+    for record in ledger.iter_records():
+        action = record.get("this_action") or {}
+        if action.get("action") in TRADE_TOOLS:
+            actions.setdefault(record.get("date"), []).append(
+                {"action": action["action"], "symbol": action["symbol"], "amount": action["amount"]})
+
+    def replay_policy(context: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return list(actions.get(context["date"], []))
+
+    return replay_policy
+
+
+def load_policy(name: str, seed: int = 0, max_orders: int = 3, replay_from: Optional[str] = None) -> Callable:
+    if name == "random":
+        return lambda context: random_policy(context, seed, max_orders)
+    if name == "buy_and_hold":
+        return buy_and_hold_policy
+    if name == "replay":
+        if not replay_from:
+            raise ValueError("The replay policy needs --replay-from (position.jsonl path or signature)")
+        return make_replay_policy(replay_from)
+    if ":" in name:
+        module_name, func_name = name.split(":", 1)
+        return getattr(importlib.import_module(module_name), func_name)
+    raise ValueError(f"Unknown policy '{name}'")
+
+
+def _completion(model: str, message: Dict[str, Any], finish_reason: str, prompt_chars: int) -> Dict[str, Any]:
+    completion_chars = len(json.dumps(message))
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+        # Rough token counts (~4 characters per token) so metrics and cost reports have something to add up
+        "usage": {
+            "prompt_tokens": prompt_chars // 4,
+            "completion_tokens": completion_chars // 4,
+            "total_tokens": (prompt_chars + completion_chars) // 4,
+        },
+    }
+
+
+def create_app(policy: str = "random", seed: int = 0, max_orders: int = 3, replay_from: Optional[str] = None,
+               latency: float = 0.0) -> Starlette:
+    """
+    Build the stub server
+
+    Args:
+        policy: Default policy name (see module docstring)
+        seed: Seed of the random policy
+        max_orders: Most orders per day of the random policy
+        replay_from: position.jsonl path or signature for the replay policy
+        latency: Seconds to wait before every response, to mimic model latency
+    """
+    policies: Dict[str, Callable] = {}
+    stats = {"requests": 0, "tool_call_responses": 0, "final_responses": 0}
+
+    def get_policy(name: str) -> Callable:
+        if name not in policies:
+            policies[name] = load_policy(name, seed, max_orders, replay_from)
+        return policies[name]
+
+    default_policy = get_policy(policy)
+
+    async def chat_completions(request: Request) -> JSONResponse:
+        body = await request.json()
+        if body.get("stream"):
+            return JSONResponse({"error": {"message": "Streaming is not supported by the stub server", "type": "invalid_request_error"}}, status_code=400)
+        stats["requests"] += 1
+        if latency > 0:
+            await asyncio.sleep(latency)
+        context = parse_context(body)
+        model = context["model"]
+        prompt_chars = len(json.dumps(body.get("messages", [])))
+
+        requested = model.split("/", 1)[1] if model.startswith("stub/") else None
+        try:
+            orders = [] if context["has_tool_results"] else (get_policy(requested) if requested else default_policy)(context)
+        except Exception as e:
+            return JSONResponse({"error": {"message": f"Policy failed: {e}", "type": "server_error"}}, status_code=500)
+        orders = [o for o in orders if o.get("action") in context["tools"]]
+
+        if orders:
+            stats["tool_call_responses"] += 1
+            tool_calls = []
+            for i, order in enumerate(orders):
+                # Deterministic ids keep recorded conversations (LLM cache keys) stable across runs
+                call_id = "call_" + hashlib.sha1(f"{model}:{context['date']}:{i}".encode()).hexdigest()[:16]
+                tool_calls.append({
+                    "id": call_id,
+                    "type": "function",
+                    "function": {"name": order["action"], "arguments": json.dumps({"symbol": order["symbol"], "amount": order["amount"]})},
+                })
+            message = {"role": "assistant", "content": "", "tool_calls": tool_calls}
+            return JSONResponse(_completion(model, message, "tool_calls", prompt_chars))
+
+        stats["final_responses"] += 1
+        summary = "Orders executed, positions updated." if context["has_tool_results"] else "No trades today, holding positions."
+        message = {"role": "assistant", "content": f"{summary}\n{STOP_SIGNAL}"}
+        return JSONResponse(_completion(model, message, "stop", prompt_chars))
+
+    async def list_models(request: Request) -> JSONResponse:
+        names = ["stub/random", "stub/buy_and_hold", "stub/replay"]
+        return JSONResponse({"object": "list", "data": [{"id": n, "object": "model", "owned_by": "stub"} for n in names]})
+
+    async def get_stats(request: Request) -> JSONResponse:
+        return JSONResponse(stats)
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/chat/completions", chat_completions, methods=["POST"]),
+        Route("/v1/models", list_models, methods=["GET"]),
+        Route("/stats", get_stats, methods=["GET"]),
+    ])
+
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub model server")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--policy", default="random", help="random, buy_and_hold, replay or module:function")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random policy")
+    parser.add_argument("--max-orders", type=int, default=3, help="Most orders per day of the random policy")
+    parser.add_argument("--replay-from", help="position.jsonl path or agent signature for the replay policy")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before every response")
+    args = parser.parse_args()
+
+    app = create_app(args.policy, args.seed, args.max_orders, args.replay_from, args.latency)
+    print(f"🤖 Stub model server on http://{args.host}:{args.port}/v1 (policy: {args.policy})")
+    print(f"   export OPENAI_API_BASE=http://{args.host}:{args.port}/v1")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,289 @@
+"""
+Parameter sweep over backtest configurations
+
+Expands a grid over fields of a base configuration (default:
+configs/default_config.json) into one config per combination and runs each
+through main.py in its own worker process, from a pool of --workers
+processes. Every variant gets its own MCP port block, data directory and
+runtime config, so variants never share a ledger. Afterwards
+calculate_all_metrics is computed for every model of every variant and all
+results are printed as one comparison table (and written to summary.json).
+
+Grid file:
+    {
+      "base_config": "configs/default_config.json",
+      "grid": {
+        "models": [[{"name": "gpt-5", "basemodel": "openai/gpt-5", "signature": "gpt-5"}],
+                   [{"name": "qwen3-max", "basemodel": "qwen/qwen3-max", "signature": "qwen3-max"}]],
+        "agent_config.initial_cash": [10000.0, 50000.0],
+        "agent_config.max_steps": [10, 30],
+        "date_range": [{"init_date": "2025-10-01", "end_date": "2025-10-10"}],
+        "agent_config.prompt_template": [null, "prompts/variants/momentum.txt"]
+      }
+    }
+
+Keys are dotted paths into the config; each value is the list of values to
+try. Usage:
+    python sweep.py grid.json [--workers 2] [--base-port 9000] [--output-dir data/sweeps/NAME] [--dry-run]
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import socket
+import asyncio
+import itertools
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout, redirect_stderr
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# Port of each MCP service within a variant's port block (base_port + 10 * variant index)
+SERVICE_PORTS = {
+    "MATH_HTTP_PORT": ("tool_math.py", 0),
+    "SEARCH_HTTP_PORT": ("tool_jina_search.py", 1),
+    "TRADE_HTTP_PORT": ("tool_trade.py", 2),
+    "GETPRICE_HTTP_PORT": ("tool_get_price_local.py", 3),
+}
+PORT_BLOCK_SIZE = 10
+# Services an in-process agent still reaches over HTTP
+IN_PROCESS_SERVICES = ("SEARCH_HTTP_PORT",)
+
+# calculate_all_metrics fields shown in the comparison table
+METRIC_COLUMNS = ["cumulative_return", "annualized_return", "sharpe_ratio", "max_drawdown", "volatility",
+                  "win_rate", "profit_loss_ratio", "total_trading_days"]
+
+
+def set_path(config: Dict[str, Any], path: str, value: Any) -> None:
+    """Set config["a"]["b"] for path "a.b", creating intermediate dicts"""
+    keys = path.split(".")
+    node = config
+    for key in keys[:-1]:
+        node = node.setdefault(key, {})
+    node[keys[-1]] = copy.deepcopy(value)
+
+
+def expand_grid(base_config: Dict[str, Any], grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """
+    One config per combination of grid values
+
+    Returns:
+        [{"index", "params" ({path: value}), "config"}], in itertools.product order
+    """
+    paths = list(grid)
+    variants = []
+    for index, values in enumerate(itertools.product(*(grid[path] for path in paths))):
+        config = copy.deepcopy(base_config)
+        for path, value in zip(paths, values):
+            set_path(config, path, value)
+        variants.append({"index": index, "params": dict(zip(paths, values)), "config": config})
+    return variants
+
+
+def _describe(value: Any) -> str:
+    """Short label of a grid value for the comparison table"""
+    if isinstance(value, list) and all(isinstance(v, dict) and "signature" in v for v in value):
+        return "+".join(v["signature"] for v in value)
+    if isinstance(value, dict):
+        return "..".join(str(v) for v in value.values())
+    if isinstance(value, str) and os.path.sep in value:
+        return Path(value).stem
+    return str(value)
+
+
+def _wait_for_port(port: int, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.settimeout(0.5)
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return True
+        time.sleep(0.2)
+    return False
+
+
+def _start_services(env: Dict[str, str], names, log_dir: Path) -> List[subprocess.Popen]:
+    processes = []
+    for name in names:
+        script, _ = SERVICE_PORTS[name]
+        log = (log_dir / f"{Path(script).stem}.log").open("w")
+        processes.append(subprocess.Popen([sys.executable, os.path.join(project_root, "agent_tools", script)],
+                                          env=env, stdout=log, stderr=subprocess.STDOUT, cwd=project_root))
+    for name in names:
+        if not _wait_for_port(int(env[name]), timeout=30):
+            raise RuntimeError(f"MCP service {SERVICE_PORTS[name][0]} did not start on port {env[name]}")
+    return processes
+
+
+def _stop_services(processes: List[subprocess.Popen]) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def run_variant(variant: Dict[str, Any], run_dir: str, base_port: int) -> Dict[str, Any]:
+    """
+    Run one variant in this (worker) process
+
+    Args:
+        variant: Entry of expand_grid
+        run_dir: Directory of the variant: config.json, run.log, service logs, agent_data/
+        base_port: First port of the sweep; the variant uses base_port + 10 * index onwards
+
+    Returns:
+        {"index", "params", "status", "elapsed", "error", "models": [{"signature", "status", "metrics"}]}
+    """
+    run_dir = Path(run_dir)
+    data_dir = run_dir / "agent_data"
+    data_dir.mkdir(parents=True, exist_ok=True)
+    config = copy.deepcopy(variant["config"])
+    config.setdefault("log_config", {})["log_path"] = str(data_dir)
+    config_path = run_dir / "config.json"
+    with config_path.open("w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+    # Everything the agents, the tools and result_tools resolve per run
+    port_block = base_port + PORT_BLOCK_SIZE * variant["index"]
+    env = {name: str(port_block + offset) for name, (_, offset) in SERVICE_PORTS.items()}
+    env.update({"AGENT_DATA_DIR": str(data_dir), "RUNTIME_ENV_PATH": str(run_dir / "runtime_env.json")})
+    os.environ.update(env)
+    env = {**os.environ, **env}
+
+    tool_binding = os.getenv("TOOL_BINDING") or config.get("agent_config", {}).get("tool_binding", "http")
+    services = IN_PROCESS_SERVICES if tool_binding == "in_process" else tuple(SERVICE_PORTS)
+    result = {"index": variant["index"], "params": variant["params"], "status": "failed", "elapsed": 0.0,
+              "error": None, "models": []}
+    start = time.perf_counter()
+    processes: List[subprocess.Popen] = []
+    with (run_dir / "run.log").open("w", encoding="utf-8") as log, redirect_stdout(log), redirect_stderr(log):
+        try:
+            processes = _start_services(env, services, run_dir)
+            import main
+            runs = asyncio.run(main.main(str(config_path)))
+
+            from tools.result_tools import calculate_all_metrics
+            for run in runs:
+                metrics = calculate_all_metrics(run["signature"]) if run["status"] == "completed" else {}
+                result["models"].append({"signature": run["signature"], "status": run["status"],
+                                         "error": run["error"], "metrics": metrics})
+            with (run_dir / "metrics.json").open("w", encoding="utf-8") as f:
+                json.dump(result["models"], f, indent=2, default=str)
+            result["status"] = "completed" if all(m["status"] == "completed" for m in result["models"]) else "failed"
+        except BaseException as e:  # main.py exits on configuration errors
+            result["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            _stop_services(processes)
+    result["elapsed"] = time.perf_counter() - start
+    # The table only needs the scalar metrics; the full ones are in metrics.json
+    for model in result["models"]:
+        model["metrics"] = {k: model["metrics"].get(k) for k in METRIC_COLUMNS + ["error"] if k in model["metrics"]}
+    return result
+
+
+def run_sweep(variants: List[Dict[str, Any]], output_dir: str, workers: int = 2, base_port: int = 9000) -> List[Dict[str, Any]]:
+    """Run variants on a pool of worker processes; each worker process runs a single variant"""
+    output_dir = Path(output_dir)
+    results = []
+    # Fresh interpreter per variant: module-level caches and environment never leak between variants
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=context, max_tasks_per_child=1) as pool:
+        futures = {
+            pool.submit(run_variant, variant, str(output_dir / f"variant-{variant['index']:03d}"), base_port): variant
+            for variant in variants
+        }
+        for future in as_completed(futures):
+            variant = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:  # The worker process itself died
+                result = {"index": variant["index"], "params": variant["params"], "status": "failed",
+                          "elapsed": 0.0, "error": f"{type(e).__name__}: {e}", "models": []}
+            status = "✅" if result["status"] == "completed" else "❌"
+            print(f"{status} variant {result['index']:03d} ({result['elapsed']:.1f}s): "
+                  + ", ".join(f"{k}={_describe(v)}" for k, v in result["params"].items())
+                  + (f" - {result['error']}" if result["error"] else ""))
+            results.append(result)
+    return sorted(results, key=lambda r: r["index"])
+
+
+def comparison_rows(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One row per variant and model: grid values, status and the METRIC_COLUMNS"""
+    rows = []
+    for result in results:
+        params = {path: _describe(value) for path, value in result["params"].items() if path != "models"}
+        for model in result["models"] or [{"signature": "-", "status": result["status"], "metrics": {}}]:
+            rows.append({"variant": f"{result['index']:03d}", "signature": model["signature"], **params,
+                         "status": model["status"], **{k: model["metrics"].get(k) for k in METRIC_COLUMNS}})
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        return
+    columns = list(rows[0])
+
+    def fmt(value):
+        if value is None:
+            return "-"
+        if isinstance(value, float):
+            return f"{value:.4f}"
+        return str(value)
+    cells = [columns] + [[fmt(row.get(c)) for c in columns] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(columns))]
+    print("=" * 60)
+    for i, row in enumerate(cells):
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+        if i == 0:
+            print("  ".join("-" * width for width in widths))
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a grid of backtest configurations in parallel worker processes")
+    parser.add_argument("grid", help="Grid file: {\"base_config\": path, \"grid\": {dotted.path: [values]}}")
+    parser.add_argument("--workers", type=int, default=2, help="Variants run at the same time")
+    parser.add_argument("--base-port", type=int, default=9000, help="First MCP port; variant i uses base + 10*i .. +3")
+    parser.add_argument("--output-dir", help="Directory of the runs (default: data/sweeps/<grid name>-<timestamp>)")
+    parser.add_argument("--dry-run", action="store_true", help="List the variants without running them")
+    args = parser.parse_args()
+
+    with open(args.grid, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    base_config_path = spec.get("base_config", os.path.join(project_root, "configs", "default_config.json"))
+    with open(base_config_path, "r", encoding="utf-8") as f:
+        base_config = json.load(f)
+    variants = expand_grid(base_config, spec.get("grid", {}))
+
+    print(f"🧪 {len(variants)} variant(s) from {args.grid} over {base_config_path}")
+    for variant in variants:
+        print(f"   {variant['index']:03d}: " + ", ".join(f"{k}={_describe(v)}" for k, v in variant["params"].items()))
+    if args.dry_run:
+        sys.exit(0)
+
+    output_dir = args.output_dir or os.path.join(
+        project_root, "data", "sweeps", f"{Path(args.grid).stem}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+    print(f"📁 Output: {output_dir} ({args.workers} worker(s), ports from {args.base_port})")
+    results = run_sweep(variants, output_dir, args.workers, args.base_port)
+
+    rows = comparison_rows(results)
+    print_comparison(rows)
+    with open(os.path.join(output_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump({"grid": spec, "results": results, "table": rows}, f, indent=2, default=str)
+    print(f"📄 Summary: {os.path.join(output_dir, 'summary.json')}")
+    if any(r["status"] != "completed" for r in results):
+        sys.exit(1)
@@ -0,0 +1,199 @@
+"""
+data/get_daily_price.py against a local Alpha Vantage stand-in
+
+A ThreadingHTTPServer serves scripted responses per symbol (HTTP 429/5xx,
+"Note"/"Information" throttling payloads, errors, bars), so throttling,
+retry with backoff, the token bucket and the incremental merge are exercised
+over real HTTP without an API key.
+"""
+
+import os
+import json
+import time
+import threading
+import importlib.util
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+MODULE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "get_daily_price.py")
+
+
+def load_module():
+    """Fresh import of data/get_daily_price.py (BASE_URL is read from the environment at import)"""
+    spec = importlib.util.spec_from_file_location("get_daily_price", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bars(symbol, prices):
+    """TIME_SERIES_DAILY payload with one bar per {date: close}"""
+    return {
+        "Meta Data": {"2. Symbol": symbol},
+        "Time Series (Daily)": {
+            date: {"1. open": str(p), "2. high": str(p), "3. low": str(p), "4. close": str(p), "5. volume": "100"}
+            for date, p in prices.items()
+        },
+    }
+
+
+class StandIn:
+    """Local server answering each symbol's requests from a script of (status, payload)"""
+
+    def __init__(self):
+        self.scripts = {}
+        self.requests = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                symbol = query["symbol"][0]
+                stand_in.requests.append((time.monotonic(), symbol, query["function"][0]))
+                script = stand_in.scripts[symbol]
+                status, payload = script.pop(0) if len(script) > 1 else script[0]
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/query"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def count(self, symbol):
+        return sum(1 for _, s, _ in self.requests if s == symbol)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stand_in():
+    server = StandIn()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def gdp():
+    return load_module()
+
+
+@pytest.fixture
+def backoff_sleeps(gdp, monkeypatch):
+    """Record backoff delays instead of sleeping (no jitter); token bucket waits are not recorded"""
+    delays = []
+    real_sleep = time.sleep
+    monkeypatch.setattr(gdp, "BASE_BACKOFF", 0.5)
+    monkeypatch.setattr(gdp.random, "uniform", lambda a, b: 0.0)
+
+    def sleep(seconds):
+        if seconds >= 0.5:
+            delays.append(seconds)
+        else:
+            real_sleep(seconds)
+
+    monkeypatch.setattr(gdp.time, "sleep", sleep)
+    return delays
+
+
+def fast_bucket(gdp):
+    return gdp.TokenBucket(1000.0, 10)
+
+
+def test_throttling_responses_are_retried_with_exponential_backoff(gdp, stand_in, backoff_sleeps, tmp_path):
+    payload = bars("AAA", {"2025-10-02": 11, "2025-10-01": 10})
+    stand_in.scripts["AAA"] = [
+        (429, {}),
+        (200, {"Note": "Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute."}),
+        (200, {"Information": "Please consider spreading out your free API requests more sparingly."}),
+        (503, {}),
+        (200, payload),
+    ]
+
+    ok = gdp.get_daily_price("AAA", bucket=fast_bucket(gdp), base_url=stand_in.url, data_dir=str(tmp_path))
+
+    assert ok
+    assert stand_in.count("AAA") == 5
+    assert backoff_sleeps == [0.5, 1.0, 2.0, 4.0]
+    with open(tmp_path / "daily_prices_AAA.json", encoding="utf-8") as f:
+        assert json.load(f) == payload
+
+
+def test_gives_up_after_max_retries(gdp, stand_in, backoff_sleeps, tmp_path):
+    stand_in.scripts["BBB"] = [(200, {"Note": "rate limited"})]
+
+    ok = gdp.get_daily_price("BBB", bucket=fast_bucket(gdp), base_url=stand_in.url, data_dir=str(tmp_path))
+
+    assert not ok
+    assert stand_in.count("BBB") == gdp.MAX_RETRIES
+    assert len(backoff_sleeps) == gdp.MAX_RETRIES
+    assert not (tmp_path / "daily_prices_BBB.json").exists()
+
+
+def test_error_message_is_not_retried(gdp, stand_in, backoff_sleeps, tmp_path):
+    stand_in.scripts["CCC"] = [(200, {"Error Message": "Invalid API call."})]
+
+    ok = gdp.get_daily_price("CCC", bucket=fast_bucket(gdp), base_url=stand_in.url, data_dir=str(tmp_path))
+
+    assert not ok
+    assert stand_in.count("CCC") == 1
+    assert backoff_sleeps == []
+
+
+def test_fetch_merges_into_existing_history(gdp, stand_in, tmp_path):
+    existing = bars("QQQ", {"2025-09-30": 9, "2025-10-01": 99})
+    with open(tmp_path / "daily_prices_QQQ.json", "w", encoding="utf-8") as f:
+        json.dump(existing, f)
+    stand_in.scripts["QQQ"] = [(200, bars("QQQ", {"2025-10-02": 11, "2025-10-01": 10}))]
+
+    assert gdp.get_daily_price("QQQ", bucket=fast_bucket(gdp), base_url=stand_in.url, data_dir=str(tmp_path))
+
+    with open(tmp_path / "daily_prices_QQQ.json", encoding="utf-8") as f:
+        merged = json.load(f)
+    series = merged["Time Series (Daily)"]
+    # Older bars are kept, fetched bars win on overlapping dates, newest first
+    assert list(series) == ["2025-10-02", "2025-10-01", "2025-09-30"]
+    assert series["2025-10-01"]["4. close"] == "10"
+    assert series["2025-09-30"]["4. close"] == "9"
+    with open(tmp_path / "Adaily_prices_QQQ.json", encoding="utf-8") as f:
+        assert json.load(f) == merged
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_fetch_all_respects_the_request_rate(gdp, stand_in, tmp_path):
+    symbols = [f"S{i}" for i in range(8)]
+    for symbol in symbols:
+        stand_in.scripts[symbol] = [(200, bars(symbol, {"2025-10-01": 1}))]
+
+    # 10 requests/second with a burst of 2 (one token per worker)
+    succeeded, failed, elapsed = gdp.fetch_all(symbols, max_workers=2, requests_per_minute=600,
+                                               base_url=stand_in.url, data_dir=str(tmp_path))
+
+    assert sorted(succeeded) == symbols
+    assert failed == []
+    times = sorted(t for t, _, _ in stand_in.requests)
+    # After the initial burst, requests are spaced by the refill rate
+    assert times[-1] - times[0] >= (len(symbols) - 2) / 10.0 * 0.9
+    assert elapsed >= (len(symbols) - 2) / 10.0 * 0.9
+    assert all((tmp_path / f"daily_prices_{symbol}.json").exists() for symbol in symbols)
+
+
+def test_base_url_override_from_environment(stand_in, monkeypatch, tmp_path):
+    monkeypatch.setenv("ALPHAVANTAGE_BASE_URL", stand_in.url)
+    gdp = load_module()
+    stand_in.scripts["DDD"] = [(200, bars("DDD", {"2025-10-01": 1}))]
+
+    assert gdp.BASE_URL == stand_in.url
+    assert gdp.get_daily_price("DDD", bucket=fast_bucket(gdp), data_dir=str(tmp_path))
+    assert stand_in.requests[-1][1:] == ("DDD", "TIME_SERIES_DAILY")
@@ -0,0 +1,213 @@
+import json
+from typing import Any, Dict, List, Optional
+
+# Rough conversion used to express the budget in tokens: ~4 characters per token
+CHARS_PER_TOKEN = 4
+TRADE_TOOLS = ("buy", "sell", "execute_orders")
+
+
+def _get_field(obj, key, default=None):
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+
+def _content_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return str(content)
+
+
+def _clip(text: str, limit: Optional[int]) -> str:
+    if limit is None or len(text) <= limit:
+        return text
+    return f"{text[:limit]}…[truncated {len(text) - limit} chars]"
+
+
+def _parse_json(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return None
+
+
+class ConversationContext:
+    """
+    Bounded message history for one trading session
+
+    Keeps the opening user messages and the last `keep_turns` turns verbatim.
+    Older turns are folded, one at a time as they leave the window, into a
+    structured summary (trades done with their outcome, latest known positions
+    and a short note per tool call), so each request carries at most
+    keep_turns turns plus a summary of bounded size instead of the whole
+    transcript. If the rendered messages still exceed `max_chars`, the window
+    shrinks (down to the latest turn) and long tool results are clipped.
+
+    The system prompt is passed to the agent separately and is never folded.
+    Turns are rendered exactly like the original transcript: the assistant
+    reply followed by a "Tool results: ..." user message.
+    """
+
+    def __init__(self, initial_messages: List[Dict[str, str]], keep_turns: int = 4,
+                 max_chars: int = 60000, max_tool_chars: int = 8000, max_notes: int = 20):
+        """
+        Initialize ConversationContext
+
+        Args:
+            initial_messages: Messages always sent first (e.g. the session's user query)
+            keep_turns: Number of most recent turns kept verbatim
+            max_chars: Character budget for all messages (tokens ≈ chars / CHARS_PER_TOKEN)
+            max_tool_chars: Length tool results are clipped to when the turns kept verbatim exceed max_chars
+            max_notes: Number of folded tool-call notes kept in the summary
+        """
+        self.initial_messages = list(initial_messages)
+        self.keep_turns = max(1, keep_turns)
+        self.max_chars = max_chars
+        self.max_tool_chars = max_tool_chars
+        self.max_notes = max_notes
+        self.turns: List[Dict[str, Any]] = []
+        self.step = 0
+        # Folded state
+        self.folded_steps = 0
+        self.trades: List[str] = []
+        self.positions: Optional[Dict[str, float]] = None
+        self.notes: List[str] = []
+
+    def add_turn(self, assistant_content: str, tool_messages: List[Any], response: Any = None) -> None:
+        """
+        Record one agent step
+
+        Args:
+            assistant_content: Final assistant reply of the step
+            tool_messages: ToolMessage-like entries of the step (see extract_tool_messages)
+            response: Raw agent response; used to recover each tool call's name and arguments
+        """
+        self.step += 1
+        calls = self._tool_calls_by_id(response)
+        tools = []
+        for msg in tool_messages:
+            call = calls.get(_get_field(msg, "tool_call_id"), {})
+            tools.append({
+                "name": call.get("name") or _get_field(msg, "name") or "tool",
+                "args": call.get("args") or {},
+                "content": _content_text(_get_field(msg, "content", "")),
+            })
+            self._observe_positions(tools[-1])
+        self.turns.append({"step": self.step, "assistant": assistant_content or "", "tools": tools})
+        while len(self.turns) > self.keep_turns:
+            self._fold(self.turns.pop(0))
+
+    def state(self) -> Dict[str, Any]:
+        """JSON-serializable state of the window and summary, for checkpoints"""
+        return {
+            "initial_messages": self.initial_messages,
+            "turns": self.turns,
+            "step": self.step,
+            "folded_steps": self.folded_steps,
+            "trades": self.trades,
+            "positions": self.positions,
+            "notes": self.notes,
+        }
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        """Continue from a state() snapshot; the budgets stay those of this instance"""
+        self.initial_messages = list(state["initial_messages"])
+        self.turns = list(state["turns"])
+        self.step = state["step"]
+        self.folded_steps = state["folded_steps"]
+        self.trades = list(state["trades"])
+        self.positions = state["positions"]
+        self.notes = list(state["notes"])
+
+    @staticmethod
+    def _tool_calls_by_id(response: Any) -> Dict[str, Dict[str, Any]]:
+        calls = {}
+        messages = _get_field(response, "messages", None) if response is not None else None
+        for msg in messages or []:
+            for call in _get_field(msg, "tool_calls", None) or []:
+                if _get_field(call, "id"):
+                    calls[_get_field(call, "id")] = {"name": _get_field(call, "name"), "args": _get_field(call, "args")}
+        return calls
+
+    def _observe_positions(self, tool: Dict[str, Any]) -> None:
+        """Keep the latest positions returned by a trade tool"""
+        if tool["name"] not in TRADE_TOOLS:
+            return
+        data = _parse_json(tool["content"])
+        if not isinstance(data, dict) or "error" in data:
+            return
+        positions = data.get("positions") if isinstance(data.get("positions"), dict) else data
+        if "CASH" in positions:
+            self.positions = {k: v for k, v in positions.items() if v != 0 or k == "CASH"}
+
+    def _fold(self, turn: Dict[str, Any]) -> None:
+        """Move a turn out of the window into the summary"""
+        self.folded_steps += 1
+        for tool in turn["tools"]:
+            name, args, content = tool["name"], tool["args"], tool["content"]
+            data = _parse_json(content)
+            if name in ("buy", "sell"):
+                outcome = f"rejected: {data['error']}" if isinstance(data, dict) and "error" in data else "filled"
+                self.trades.append(f"step {turn['step']}: {name} {args.get('symbol')} x{args.get('amount')} ({outcome})")
+            elif name == "execute_orders" and isinstance(data, dict) and isinstance(data.get("results"), list):
+                for r in data["results"]:
+                    outcome = r.get("status") if r.get("status") == "filled" else f"{r.get('status')}: {r.get('error')}"
+                    self.trades.append(f"step {turn['step']}: {r.get('action')} {r.get('symbol')} x{r.get('amount')} ({outcome})")
+            else:
+                call = ", ".join(f"{k}={v!r}" for k, v in args.items())
+                self.notes.append(f"step {turn['step']}: {name}({call}) -> {_clip(' '.join(content.split()), 200)}")
+        if turn["assistant"]:
+            self.notes.append(f"step {turn['step']}: assistant: {_clip(' '.join(turn['assistant'].split()), 300)}")
+        self.notes = self.notes[-self.max_notes:]
+
+    def summary(self) -> Optional[str]:
+        """Structured summary of the folded turns, or None if nothing was folded"""
+        if not self.folded_steps:
+            return None
+        lines = [f"Summary of the {self.folded_steps} earlier step(s) of this session (older messages were condensed):"]
+        lines.append("Trades done:" if self.trades else "Trades done: none")
+        lines.extend(f"  - {trade}" for trade in self.trades)
+        if self.positions is not None:
+            lines.append(f"Latest positions (non-zero): {json.dumps(self.positions)}")
+        if self.notes:
+            lines.append("Key facts:")
+            lines.extend(f"  - {note}" for note in self.notes)
+        return "\n".join(lines)
+
+    def _render_turn(self, turn: Dict[str, Any], tool_chars: Optional[int]) -> List[Dict[str, str]]:
+        tool_response = "\n".join(_clip(tool["content"], tool_chars) for tool in turn["tools"])
+        return [
+            {"role": "assistant", "content": turn["assistant"]},
+            {"role": "user", "content": f"Tool results: {tool_response}"},
+        ]
+
+    def _render(self, tool_chars: Optional[int] = None) -> List[Dict[str, str]]:
+        messages = list(self.initial_messages)
+        summary = self.summary()
+        if summary is not None:
+            messages.append({"role": "user", "content": summary})
+        for turn in self.turns:
+            messages.extend(self._render_turn(turn, tool_chars))
+        return messages
+
+    @staticmethod
+    def size(messages: List[Dict[str, str]]) -> int:
+        """Total characters of message contents"""
+        return sum(len(m.get("content") or "") for m in messages)
+
+    def messages(self) -> List[Dict[str, str]]:
+        """Messages to send for the next step, within the character budget where possible"""
+        # Kept turns go out verbatim; tool results are only clipped when the budget is exceeded
+        messages = self._render()
+        while self.size(messages) > self.max_chars and len(self.turns) > 1:
+            self._fold(self.turns.pop(0))
+            messages = self._render()
+        tool_chars = self.max_tool_chars
+        if self.size(messages) > self.max_chars:
+            messages = self._render(tool_chars)
+        while self.size(messages) > self.max_chars and tool_chars > 500:
+            tool_chars //= 2
+            messages = self._render(tool_chars)
+        return messages
@@ -1,21 +1,55 @@
 
 import os
 import json
+import hashlib
+import threading
 from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
 from dotenv import load_dotenv
 load_dotenv()
 
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+# Parsed runtime config per path, valid while the file's (mtime_ns, size, inode) is unchanged
+_config_cache: Dict[str, Tuple[Tuple[int, int, int], dict]] = {}
+_config_lock = threading.RLock()
+
+
+def _config_stamp(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
 def _load_runtime_env() -> dict:
+    """
+    Runtime config from $RUNTIME_ENV_PATH
+
+    The parsed file is cached per path and reused until its mtime, size or inode
+    changes, so a read costs one stat() call. Do not mutate the returned dict.
+    """
     path = os.environ.get("RUNTIME_ENV_PATH")
+    stamp = _config_stamp(path)
+    if stamp is None:
+        return {}
+    cached = _config_cache.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    data = {}
     try:
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if isinstance(data, dict):
-                    return data
+        with open(path, "r", encoding="utf-8") as f:
+            loaded = json.load(f)
+            if isinstance(loaded, dict):
+                data = loaded
     except Exception:
         pass
-    return {}
+    _config_cache[path] = (stamp, data)
+    return data
 
 
 def get_config_value(key: str, default=None):
@@ -26,11 +60,53 @@ def get_config_value(key: str, default=None):
     return os.getenv(key, default)
 
 def write_config_value(key: str, value: any):
-    _RUNTIME_ENV = _load_runtime_env()
-    _RUNTIME_ENV[key] = value
+    write_config_values({key: value})
+
+def write_config_values(values: Dict[str, Any]) -> None:
+    """
+    Update several runtime config keys with one read-modify-write
+
+    The file is replaced atomically (temp file + rename) under an in-process lock
+    and an advisory fcntl lock on a .lock file next to it, so concurrent writers
+    in other processes never lose each other's keys and readers never see a
+    partially written file. The cache is updated in place.
+
+    Args:
+        values: {key: value} to set
+
+    Raises:
+        RuntimeError: RUNTIME_ENV_PATH is not set
+    """
     path = os.environ.get("RUNTIME_ENV_PATH")
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(_RUNTIME_ENV, f, ensure_ascii=False, indent=4)
+    if not path:
+        raise RuntimeError("RUNTIME_ENV_PATH is not set, cannot write runtime config values")
+    with _config_lock:
+        lock_fd = os.open(f"{path}.lock", os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            _RUNTIME_ENV = dict(_load_runtime_env())
+            _RUNTIME_ENV.update(values)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(_RUNTIME_ENV, f, ensure_ascii=False, indent=4)
+            os.replace(tmp_path, path)
+            stamp = _config_stamp(path)
+            if stamp is not None:
+                _config_cache[path] = (stamp, _RUNTIME_ENV)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+            os.close(lock_fd)
+
+def source_version(*paths) -> str:
+    """Short hash of source files, used as an MCP server's version so clients can tell when its tools changed"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
 
 def extract_conversation(conversation: dict, output_type: str):
     """Extract information from a conversation payload.
@@ -0,0 +1,154 @@
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Indicator name -> default window; "returns" has no window
+DEFAULT_WINDOWS = {
+    "sma": 20,
+    "ema": 20,
+    "rsi": 14,
+    "atr": 14,
+    "volatility": 20,
+    "returns": None,
+}
+
+_SPEC_PATTERN = re.compile(r"^([a-z]+)(?:_(\d+))?$")
+
+
+def _rolling(x: np.ndarray, window: int) -> np.ndarray:
+    """Sliding windows of length `window`; row k covers x[k : k + window]"""
+    return sliding_window_view(x, window)
+
+
+def sma(x: np.ndarray, window: int) -> np.ndarray:
+    """Simple moving average; the first window-1 values are NaN"""
+    out = np.full(len(x), np.nan)
+    if window <= len(x):
+        out[window - 1:] = _rolling(x, window).mean(axis=1)
+    return out
+
+
+def _recursive_smooth(x: np.ndarray, alpha: float, window: int) -> np.ndarray:
+    """
+    Exponential smoothing s_t = alpha * x_t + (1 - alpha) * s_{t-1}, seeded with the SMA of the
+    first `window` valid values. NaN inputs yield NaN outputs and leave the state unchanged.
+    """
+    out = np.full(len(x), np.nan)
+    valid = np.flatnonzero(~np.isnan(x))
+    if len(valid) < window:
+        return out
+    seed_idx = valid[window - 1]
+    state = x[valid[:window]].mean()
+    out[seed_idx] = state
+    for k in range(seed_idx + 1, len(x)):
+        if np.isnan(x[k]):
+            continue
+        state = alpha * x[k] + (1.0 - alpha) * state
+        out[k] = state
+    return out
+
+
+def ema(x: np.ndarray, window: int) -> np.ndarray:
+    """Exponential moving average with alpha = 2 / (window + 1)"""
+    return _recursive_smooth(x, 2.0 / (window + 1), window)
+
+
+def returns(close: np.ndarray) -> np.ndarray:
+    """Simple daily returns close_t / close_{t-1} - 1; the first value is NaN"""
+    out = np.full(len(close), np.nan)
+    if len(close) > 1:
+        out[1:] = close[1:] / close[:-1] - 1.0
+    return out
+
+
+def rsi(close: np.ndarray, window: int) -> np.ndarray:
+    """Relative Strength Index with Wilder smoothing (alpha = 1 / window)"""
+    delta = np.full(len(close), np.nan)
+    delta[1:] = np.diff(close)
+    gains = np.where(delta > 0, delta, 0.0)
+    losses = np.where(delta < 0, -delta, 0.0)
+    gains[np.isnan(delta)] = np.nan
+    losses[np.isnan(delta)] = np.nan
+    avg_gain = _recursive_smooth(gains, 1.0 / window, window)
+    avg_loss = _recursive_smooth(losses, 1.0 / window, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        out = 100.0 - 100.0 / (1.0 + rs)
+    # No losses in the window: RSI is 100 by definition
+    out[(avg_loss == 0) & ~np.isnan(avg_gain)] = 100.0
+    return out
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int) -> np.ndarray:
+    """Average True Range with Wilder smoothing"""
+    prev_close = np.full(len(close), np.nan)
+    prev_close[1:] = close[:-1]
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return _recursive_smooth(true_range, 1.0 / window, window)
+
+
+def volatility(close: np.ndarray, window: int) -> np.ndarray:
+    """Rolling standard deviation (ddof=1) of daily returns, not annualized"""
+    r = returns(close)
+    out = np.full(len(close), np.nan)
+    if window >= 2 and window <= len(r):
+        out[window - 1:] = _rolling(r, window).std(axis=1, ddof=1)
+    return out
+
+
+def parse_indicator(spec: str) -> Tuple[str, int]:
+    """
+    Parse an indicator spec such as "sma_20", "rsi" or "returns"
+
+    Returns:
+        (name, window); window is None for "returns"
+
+    Raises:
+        ValueError: If the indicator name or window is invalid
+    """
+    match = _SPEC_PATTERN.match(spec.strip().lower())
+    if match is None or match.group(1) not in DEFAULT_WINDOWS:
+        supported = [name if window is None else f"{name}[_N]" for name, window in DEFAULT_WINDOWS.items()]
+        raise ValueError(f"Unknown indicator '{spec}'. Supported: {', '.join(supported)}")
+    name = match.group(1)
+    if name == "returns":
+        return name, None
+    window = int(match.group(2)) if match.group(2) else DEFAULT_WINDOWS[name]
+    if window < 1:
+        raise ValueError(f"Indicator window must be positive: '{spec}'")
+    return name, window
+
+
+def compute_indicators(columns: Dict[str, np.ndarray], specs: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Compute indicators over full OHLCV columns
+
+    Args:
+        columns: {"open", "high", "low", "close", "volume"} -> aligned float arrays
+        specs: Indicator specs, e.g. ["sma_20", "ema_12", "rsi_14", "atr_14", "volatility_20", "returns"]
+
+    Returns:
+        {spec: array aligned with the input columns}
+
+    Raises:
+        ValueError: If a spec is invalid
+    """
+    close = columns["close"]
+    results: Dict[str, np.ndarray] = {}
+    for spec in specs:
+        name, window = parse_indicator(spec)
+        if name == "sma":
+            results[spec] = sma(close, window)
+        elif name == "ema":
+            results[spec] = ema(close, window)
+        elif name == "rsi":
+            results[spec] = rsi(close, window)
+        elif name == "atr":
+            results[spec] = atr(columns["high"], columns["low"], close, window)
+        elif name == "volatility":
+            results[spec] = volatility(close, window)
+        else:
+            results[spec] = returns(close)
+    return results
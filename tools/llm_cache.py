@@ -0,0 +1,176 @@
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import sys
+
+# Add project root directory to Python path to allow running this file from subdirectories
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_openai import ChatOpenAI
+
+# "off": no cache; "record": serve hits, call the API on a miss and store the response;
+# "replay": serve only from the store, a miss raises ReplayMissError and never reaches the network
+CACHE_MODES = ("off", "record", "replay")
+DEFAULT_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "off")
+DEFAULT_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(project_root, "data", "llm_cache"))
+
+
+class ReplayMissError(RuntimeError):
+    """A replayed request has no recorded response"""
+
+
+class LLMCacheStore:
+    """
+    Content-addressed store of LLM responses
+
+    Each response is a JSON file at {root}/{key[:2]}/{key}.json, where key is
+    the SHA-256 of the normalized request. Files are written atomically
+    (temp file + rename), so concurrent recorders never leave partial entries.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0}
+        self.missed: List[str] = []
+
+    def path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[dict]:
+        try:
+            with self.path(key).open("r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.stats["misses"] += 1
+                self.missed.append(key)
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+        return entry
+
+    def put(self, key: str, entry: dict) -> None:
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.stats["writes"] += 1
+
+
+_stores: Dict[str, LLMCacheStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_cache_store(root=None) -> LLMCacheStore:
+    """Process-wide shared LLMCacheStore for a directory (defaults to $LLM_CACHE_DIR or data/llm_cache)"""
+    key = str(Path(root or DEFAULT_CACHE_DIR).resolve())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = LLMCacheStore(key)
+    return store
+
+
+def _normalize_message(message: BaseMessage) -> dict:
+    """Fields of a message that define the request; run-specific ids are left out"""
+    normalized = {"type": message.type, "content": message.content}
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        normalized["tool_calls"] = [{"name": c.get("name"), "args": c.get("args"), "id": c.get("id")} for c in tool_calls]
+    if getattr(message, "tool_call_id", None):
+        normalized["tool_call_id"] = message.tool_call_id
+    if getattr(message, "name", None):
+        normalized["name"] = message.name
+    return normalized
+
+
+def request_key(model: str, messages: List[BaseMessage], tools: Any = None, **params) -> str:
+    """SHA-256 over (model, messages, tools, remaining request parameters)"""
+    request = {
+        "model": model,
+        "messages": [_normalize_message(m) for m in messages],
+        "tools": tools,
+        "params": {k: v for k, v in params.items() if v is not None},
+    }
+    return hashlib.sha256(json.dumps(request, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+class CachedChatOpenAI(ChatOpenAI):
+    """
+    ChatOpenAI with a record/replay response cache
+
+    Requests are keyed by request_key() over the model name, the messages
+    (content, tool calls, tool results), the bound tools and the other call
+    parameters; the provider's base URL and API key are not part of the key.
+    Streaming is disabled while the cache is active so every call goes
+    through the cached generate path.
+    """
+
+    cache_mode: str = "off"
+    cache_store: Optional[Any] = None
+
+    def __init__(self, **kwargs: Any):
+        if kwargs.get("cache_mode") == "replay" and not kwargs.get("api_key") and not os.getenv("OPENAI_API_KEY"):
+            # Replay never reaches the API, but the client still insists on a key
+            kwargs["api_key"] = "replay"
+        super().__init__(**kwargs)
+        if self.cache_mode not in CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode '{self.cache_mode}', expected one of {CACHE_MODES}")
+        if self.cache_mode != "off":
+            if self.cache_store is None:
+                self.cache_store = get_cache_store()
+            self.disable_streaming = True
+
+    def _cache_key(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: dict) -> str:
+        params = {k: v for k, v in kwargs.items() if k != "tools"}
+        return request_key(self.model_name, messages, kwargs.get("tools"), stop=stop, **params)
+
+    def _lookup(self, key: str, messages: List[BaseMessage]) -> Optional[ChatResult]:
+        entry = self.cache_store.get(key)
+        if entry is not None:
+            return ChatResult(
+                generations=[ChatGeneration(message=m) for m in messages_from_dict(entry["messages"])],
+                llm_output=entry.get("llm_output"),
+            )
+        if self.cache_mode == "replay":
+            last = messages[-1].content if messages else ""
+            raise ReplayMissError(f"No recorded response for request {key} ({self.model_name}, {len(messages)} messages, last: {str(last)[:120]!r})")
+        return None
+
+    def _store(self, key: str, result: ChatResult) -> None:
+        self.cache_store.put(key, {
+            "model": self.model_name,
+            "messages": messages_to_dict([g.message for g in result.generations]),
+            "llm_output": result.llm_output,
+        })
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.cache_mode == "off":
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        key = self._cache_key(messages, stop, kwargs)
+        result = self._lookup(key, messages)
+        if result is None:
+            result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            self._store(key, result)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.cache_mode == "off":
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        key = self._cache_key(messages, stop, kwargs)
+        result = self._lookup(key, messages)
+        if result is None:
+            result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            self._store(key, result)
+        return result
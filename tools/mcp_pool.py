@@ -0,0 +1,411 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import importlib
+import threading
+from contextlib import suppress
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import sys
+
+# Add project root directory to Python path to allow running this file from subdirectories
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import httpx
+import jsonschema
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+from langchain_mcp_adapters.sessions import create_session
+from mcp import ClientSession
+from mcp.types import CallToolResult, TextContent, Tool as MCPTool
+
+from tools.session_context import HTTP_TRANSPORTS, IN_PROCESS_TRANSPORT, SessionContext, session_scope
+
+try:
+    from fastmcp.exceptions import ToolError
+except ImportError:  # Only needed for in-process servers
+    ToolError = None
+
+DEFAULT_SCHEMA_CACHE_DIR = os.getenv("MCP_CACHE_DIR", os.path.join(project_root, "data", "mcp_cache"))
+
+
+class ToolSchemaCache:
+    """
+    Tool schemas discovered from each MCP server, on disk and in memory
+
+    One JSON file per server at {root}/{name}-{sha1(url)[:12]}.json holding the
+    server's name and version (from the MCP initialize handshake) and its
+    tools. An entry is only valid for the version it was listed from; the
+    servers in agent_tools/ report a hash of their source as version, so
+    changing a tool invalidates it.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Optional[dict]] = {}
+
+    def path(self, name: str, url: str) -> Path:
+        return self.root / f"{name}-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]}.json"
+
+    def get(self, name: str, url: str) -> Optional[dict]:
+        """{"server": {"name", "version"}, "tools": [...]} or None"""
+        path = self.path(name, url)
+        with self._lock:
+            if str(path) not in self._entries:
+                try:
+                    with path.open("r", encoding="utf-8") as f:
+                        self._entries[str(path)] = json.load(f)
+                except (OSError, ValueError):
+                    self._entries[str(path)] = None
+            return self._entries[str(path)]
+
+    def put(self, name: str, url: str, server: Dict[str, Optional[str]], tools: List[MCPTool]) -> dict:
+        path = self.path(name, url)
+        entry = {
+            "url": url,
+            "server": server,
+            "tools": [tool.model_dump(mode="json", by_alias=True, exclude_none=True) for tool in tools],
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._entries[str(path)] = entry
+        return entry
+
+
+_schema_caches: Dict[str, ToolSchemaCache] = {}
+_schema_caches_lock = threading.Lock()
+
+
+def get_schema_cache(root=None) -> ToolSchemaCache:
+    """Process-wide shared ToolSchemaCache for a directory (defaults to $MCP_CACHE_DIR or data/mcp_cache)"""
+    key = str(Path(root or DEFAULT_SCHEMA_CACHE_DIR).resolve())
+    with _schema_caches_lock:
+        cache = _schema_caches.get(key)
+        if cache is None:
+            cache = _schema_caches[key] = ToolSchemaCache(key)
+    return cache
+
+
+def _http_client(headers=None, timeout=None, auth=None) -> httpx.AsyncClient:
+    """httpx client with the MCP client defaults: redirects followed, 30s timeout"""
+    return httpx.AsyncClient(follow_redirects=True, timeout=timeout or httpx.Timeout(30.0), headers=headers, auth=auth)
+
+
+def _tool_output(result: CallToolResult):
+    """
+    CallToolResult as a content_and_artifact tool output, like the MCP adapters' tools
+
+    Returns:
+        (text, non-text contents or None); text is a str for one text block, a list for several
+    Raises:
+        ToolException: The tool reported an error
+    """
+    texts = [content.text for content in result.content if isinstance(content, TextContent)]
+    others = [content for content in result.content if not isinstance(content, TextContent)]
+    text = texts[0] if len(texts) == 1 else (texts or "")
+    if result.isError:
+        raise ToolException(text)
+    return text, others or None
+
+
+def _live_headers_client_factory(connection: Dict[str, Any]):
+    """
+    httpx client factory whose requests carry the connection's current headers
+
+    A persistent session builds its HTTP client once, but apply_session_headers
+    changes the connection's headers at every trading session; the request
+    hook copies them onto each request as it is sent.
+    """
+    base_factory = connection.get("httpx_client_factory") or _http_client
+    applied: set = set()
+
+    async def apply_headers(request: httpx.Request) -> None:
+        headers = connection.get("headers") or {}
+        for key in applied - set(headers):
+            request.headers.pop(key, None)
+        request.headers.update(headers)
+        applied.update(headers)
+
+    def factory(headers=None, timeout=None, auth=None) -> httpx.AsyncClient:
+        client = base_factory(headers=headers, timeout=timeout, auth=auth)
+        client.event_hooks["request"].append(apply_headers)
+        return client
+
+    return factory
+
+
+class _ServerSession:
+    """
+    One long-lived MCP session, owned by a background task
+
+    The transport's task groups must be entered and exited by the same task,
+    while tool calls come from whichever task the agent runs them in; the
+    owner task opens the session, then waits until close().
+    """
+
+    def __init__(self, name: str, connection: Dict[str, Any], stats: dict):
+        self.name = name
+        self.connection = dict(connection)
+        if connection.get("transport") in HTTP_TRANSPORTS:
+            self.connection["httpx_client_factory"] = _live_headers_client_factory(connection)
+        self.stats = stats
+        self.session: Optional[ClientSession] = None
+        self.server_info: Dict[str, Optional[str]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._error: Optional[BaseException] = None
+
+    def start(self) -> None:
+        """Open the session in the background, unless it is open or opening"""
+        if self._task is not None and not self._task.done():
+            return
+        self._ready, self._stop, self._error = asyncio.Event(), asyncio.Event(), None
+        self._task = asyncio.create_task(self._run(self._ready, self._stop), name=f"mcp-session-{self.name}")
+
+    async def _run(self, ready: asyncio.Event, stop: asyncio.Event) -> None:
+        started = time.perf_counter()
+        session = None
+        try:
+            async with create_session(self.connection) as session:
+                result = await session.initialize()
+                self.server_info = {"name": result.serverInfo.name, "version": result.serverInfo.version}
+                self.session = session
+                self.stats["connects"] += 1
+                self.stats["connect_time"] += time.perf_counter() - started
+                ready.set()
+                await stop.wait()
+        except Exception as e:
+            self._error = e
+        finally:
+            # A replaced session must not clear its successor
+            if session is not None and self.session is session:
+                self.session = None
+            ready.set()
+
+    async def get(self) -> ClientSession:
+        """The open session, (re)connecting if needed"""
+        if self.session is None:
+            self.start()
+            await self._ready.wait()
+            if self.session is None:
+                raise ConnectionError(f"MCP server '{self.name}' unavailable: {self._error}") from self._error
+        return self.session
+
+    def reset(self) -> None:
+        """Drop a broken session; the next call reconnects"""
+        if self._stop is not None:
+            self._stop.set()
+        self.session = None
+        # The old owner task winds down on its own
+        self._task = None
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._stop.set()
+        # A transport stuck on a dead server must not hold up shutdown
+        with suppress(Exception):
+            await asyncio.wait_for(self._task, 5)
+        self._task = None
+
+
+class MCPSessionPool:
+    """
+    Long-lived MCP sessions to a set of servers, with cached tool schemas
+
+    Replaces MultiServerMCPClient, which opens a new MCP session (HTTP
+    connection + initialize handshake) for every tool call and lists all
+    servers' tools on every start:
+    - one session per server stays open for the pool's lifetime and is shared
+      by all tool calls (concurrent calls are multiplexed on it); HTTP
+      connections are kept alive by its httpx client
+    - get_tools() builds the tools from the on-disk schema cache without any
+      request; sessions open in the background and, if a server reports a
+      version other than the cached one, its tools are listed again and the
+      cache updated (the refreshed tools are returned by the next get_tools())
+    - stats() reports connections, calls, errors and latencies per server
+
+    A call that fails on the transport (not a tool error) drops the session
+    and is not retried, so a trade is never sent twice; the next call
+    reconnects. Headers are read from the connection dicts on every request,
+    so apply_session_headers keeps working on the same mcp_config.
+
+    A connection {"transport": "in_process", "module": "agent_tools.tool_math"}
+    imports that module's FastMCP server (attribute "server", default "mcp")
+    and calls its tools directly: same names, schemas, results and error
+    messages as over MCP, without serialization or HTTP. Its headers reach the
+    tools through session_scope.
+    """
+
+    def __init__(self, connections: Dict[str, Dict[str, Any]], schema_cache: Optional[ToolSchemaCache] = None):
+        """
+        Initialize MCPSessionPool
+
+        Args:
+            connections: MultiServerMCPClient-style config {server name: connection dict}
+            schema_cache: Tool schema cache, defaults to get_schema_cache()
+        """
+        self.connections = connections
+        self.schema_cache = schema_cache or get_schema_cache()
+        self._stats: Dict[str, dict] = {
+            name: {"connects": 0, "connect_time": 0.0, "calls": 0, "errors": 0, "call_time": 0.0,
+                   "max_call_time": 0.0, "discoveries": 0, "schema_cache": None}
+            for name in connections
+        }
+        self._sessions = {name: _ServerSession(name, connection, self._stats[name]) for name, connection in connections.items()}
+        self._tools: Dict[str, List[BaseTool]] = {}
+        self._local_tools: Dict[str, Dict[str, Any]] = {}
+        self._validation: List[asyncio.Task] = []
+
+    def _is_local(self, name: str) -> bool:
+        return self.connections[name].get("transport") == IN_PROCESS_TRANSPORT
+
+    def _url(self, name: str) -> str:
+        connection = self.connections[name]
+        return connection.get("url") or " ".join([connection.get("command", "")] + list(connection.get("args", [])))
+
+    async def get_tools(self) -> List[BaseTool]:
+        """LangChain tools of all servers, from the schema cache when possible"""
+        missing = []
+        for name in self.connections:
+            if name in self._tools:
+                continue
+            if self._is_local(name):
+                await self._load_local(name)
+                continue
+            entry = self.schema_cache.get(name, self._url(name))
+            if entry is None:
+                missing.append(name)
+                continue
+            self._tools[name] = self._build_tools(name, [MCPTool.model_validate(t) for t in entry["tools"]])
+            self._stats[name]["schema_cache"] = "hit"
+            self._sessions[name].start()
+            self._validation.append(asyncio.create_task(self._validate(name, entry)))
+        await asyncio.gather(*(self._discover(name) for name in missing))
+        return [tool for name in self.connections for tool in self._tools[name]]
+
+    async def _discover(self, name: str) -> None:
+        session = await self._sessions[name].get()
+        tools: List[MCPTool] = []
+        cursor = None
+        while True:
+            page = await session.list_tools(cursor=cursor)
+            tools.extend(page.tools)
+            cursor = page.nextCursor
+            if not cursor:
+                break
+        self._stats[name]["discoveries"] += 1
+        self._stats[name]["schema_cache"] = self._stats[name]["schema_cache"] or "miss"
+        self.schema_cache.put(name, self._url(name), self._sessions[name].server_info, tools)
+        self._tools[name] = self._build_tools(name, tools)
+
+    async def _load_local(self, name: str) -> None:
+        """Tools of an in-process FastMCP server"""
+        connection = self.connections[name]
+        server = getattr(importlib.import_module(connection["module"]), connection.get("server", "mcp"))
+        tools = await server.get_tools()
+        mcp_tools = {key: tool.to_mcp_tool(name=key) for key, tool in tools.items()}
+        # Arguments are checked against the input schema first, like the MCP server does
+        self._local_tools[name] = {
+            key: (tool, jsonschema.validators.validator_for(mcp_tools[key].inputSchema)(mcp_tools[key].inputSchema))
+            for key, tool in tools.items()
+        }
+        self._sessions[name].server_info = {"name": server.name, "version": server.version}
+        self._stats[name]["schema_cache"] = "in-process"
+        self._tools[name] = self._build_tools(name, list(mcp_tools.values()))
+
+    async def _call_local(self, server: str, name: str, arguments: Dict[str, Any]) -> CallToolResult:
+        """Run an in-process tool; errors become error results worded like the MCP server's"""
+        tool, validator = self._local_tools[server][name]
+        try:
+            validator.validate(arguments)
+        except jsonschema.ValidationError as e:
+            return CallToolResult(content=[TextContent(type="text", text=f"Input validation error: {e.message}")], isError=True)
+        context = SessionContext.from_headers(self.connections[server].get("headers") or {})
+        with session_scope(context):
+            try:
+                result = await tool.run(arguments)
+            except Exception as e:
+                message = str(e) if ToolError is not None and isinstance(e, ToolError) else f"Error calling tool {name!r}: {e}"
+                return CallToolResult(content=[TextContent(type="text", text=message)], isError=True)
+        return CallToolResult(content=result.content, structuredContent=result.structured_content, isError=False)
+
+    async def _validate(self, name: str, entry: dict) -> None:
+        """Refresh a server's cached tools if its version changed"""
+        try:
+            await self._sessions[name].get()
+        except ConnectionError:
+            return  # Reported by the first tool call
+        if self._sessions[name].server_info != entry.get("server"):
+            print(f"🔁 MCP server '{name}' version changed ({entry.get('server', {}).get('version')} -> "
+                  f"{self._sessions[name].server_info.get('version')}), refreshing its tool schemas")
+            self._stats[name]["schema_cache"] = "stale"
+            with suppress(Exception):
+                await self._discover(name)
+
+    def _build_tools(self, server: str, tools: List[MCPTool]) -> List[BaseTool]:
+        return [self._build_tool(server, tool) for tool in tools]
+
+    def _build_tool(self, server: str, tool: MCPTool) -> BaseTool:
+        """Same tool as langchain_mcp_adapters builds, calling through the pooled session"""
+        async def call_tool(**arguments: Dict[str, Any]):
+            return await self.call_tool(server, tool.name, arguments)
+
+        base = tool.annotations.model_dump() if tool.annotations is not None else {}
+        meta = {"_meta": tool.meta} if getattr(tool, "meta", None) is not None else {}
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description or "",
+            args_schema=tool.inputSchema,
+            coroutine=call_tool,
+            response_format="content_and_artifact",
+            metadata={**base, **meta} or None,
+        )
+
+    async def call_tool(self, server: str, name: str, arguments: Dict[str, Any]):
+        stats = self._stats[server]
+        started = time.perf_counter()
+        stats["calls"] += 1
+        try:
+            if self._is_local(server):
+                result = await self._call_local(server, name, arguments)
+            else:
+                session = await self._sessions[server].get()
+                result = await session.call_tool(name, arguments)
+        except Exception:
+            stats["errors"] += 1
+            self._sessions[server].reset()
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            stats["call_time"] += elapsed
+            stats["max_call_time"] = max(stats["max_call_time"], elapsed)
+        if result.isError:
+            stats["errors"] += 1
+        return _tool_output(result)
+
+    def stats(self) -> Dict[str, dict]:
+        """Per server: connects, calls, errors, schema cache status and latencies in seconds"""
+        report = {}
+        for name, stats in self._stats.items():
+            report[name] = {
+                **stats,
+                "avg_call_time": stats["call_time"] / stats["calls"] if stats["calls"] else None,
+                "server_version": self._sessions[name].server_info.get("version"),
+            }
+        return report
+
+    async def close(self) -> None:
+        """Close all sessions"""
+        for task in self._validation:
+            task.cancel()
+        await asyncio.gather(*(session.close() for session in self._sessions.values()))
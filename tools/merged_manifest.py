@@ -0,0 +1,65 @@
+import os
+import json
+from pathlib import Path
+from typing import Optional
+
+MANIFEST_FILENAME = "merged_manifest.json"
+
+
+def manifest_path(merged_path: str) -> Path:
+    """The manifest lives next to merged.jsonl."""
+    return Path(merged_path).parent / MANIFEST_FILENAME
+
+
+def empty_manifest() -> dict:
+    return {"generation": 0, "output_stamp": None, "files": {}}
+
+
+def load_manifest(merged_path: str) -> dict:
+    """
+    Load the merge manifest for merged.jsonl
+
+    Layout:
+        generation: Incremented every time merged.jsonl content is replaced
+        output_stamp: [mtime_ns, size] of merged.jsonl as written by the last merge
+        files: {source basename: {"hash", "stamp", "line"}}, where line is the
+            0-based line of merged.jsonl holding that file's symbol
+
+    Returns:
+        Manifest dict; an empty manifest if missing or unreadable
+    """
+    try:
+        with manifest_path(merged_path).open("r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except Exception:
+        return empty_manifest()
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("files"), dict):
+        return empty_manifest()
+    return manifest
+
+
+def save_manifest(merged_path: str, manifest: dict) -> None:
+    """Write the manifest atomically (temp file + rename)"""
+    path = manifest_path(merged_path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def read_generation(merged_path: str) -> Optional[int]:
+    """
+    Generation number of merged.jsonl
+
+    Returns:
+        The generation recorded by the last merge, or None if merged.jsonl was
+        not produced by merge_jsonl.py (no manifest, or the file changed since)
+    """
+    manifest = load_manifest(merged_path)
+    try:
+        st = os.stat(merged_path)
+    except OSError:
+        return None
+    if manifest.get("output_stamp") != [st.st_mtime_ns, st.st_size]:
+        return None
+    return int(manifest.get("generation", 0))
@@ -0,0 +1,939 @@
+import os
+import json
+import hashlib
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import sys
+
+# Add project root directory to Python path to allow running this file from subdirectories
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+INDEX_SUFFIX = ".idx.json"
+INDEX_VERSION = 3
+
+# "always": fsync after every append (crash-safe); "never": leave flushing to the OS
+FSYNC_POLICIES = ("always", "never")
+DEFAULT_FSYNC = os.getenv("POSITION_FSYNC", "always")
+
+# Checkpoint records carry the ledger index so readers can start from them instead of line 1
+CHECKPOINT_KEY = "checkpoint"
+CHECKPOINT_INTERVAL = int(os.getenv("POSITION_CHECKPOINT_INTERVAL", "50"))
+ARCHIVE_FILENAME = "position_archive.jsonl"
+
+# On-disk position encodings:
+#   "full":   every record stores the complete positions dict (legacy format)
+#   "sparse": records store only non-zero holdings plus CASH; zero holdings are
+#             restored from the ledger's symbol universe when read
+#   "delta":  like sparse, but trade records store only the holdings that differ
+#             from the latest anchor (a sparse record), with a new anchor written
+#             every ANCHOR_INTERVAL records or whenever a delta would not be smaller
+ENCODINGS = ("full", "sparse", "delta")
+DEFAULT_ENCODING = os.getenv("POSITION_ENCODING", "full")
+ANCHOR_INTERVAL = int(os.getenv("POSITION_ANCHOR_INTERVAL", "20"))
+# Keys that only exist in encoded records and are stripped when decoding
+_ENCODING_KEYS = ("encoding", "anchor", "universe", "base", "delta")
+
+
+def position_file_path(signature: str, base_dir: Optional[str] = None) -> Path:
+    """{base_dir}/{signature}/position/position.jsonl; base_dir defaults to $AGENT_DATA_DIR or {project_root}/data/agent_data"""
+    if base_dir is None:
+        base_dir = os.getenv("AGENT_DATA_DIR") or os.path.join(project_root, "data", "agent_data")
+    return Path(base_dir) / signature / "position" / "position.jsonl"
+
+
+def index_file_path(position_file) -> Path:
+    """The byte-offset sidecar index lives next to position.jsonl (position.idx.json)"""
+    position_file = Path(position_file)
+    return position_file.with_name(position_file.stem + INDEX_SUFFIX)
+
+
+class PositionLedger:
+    """
+    Indexed view of an append-only position.jsonl ledger
+
+    For every date the ledger keeps (max id, byte offset, length) of the record
+    with the highest id, so "latest position on date X" is a dict lookup plus
+    one seek. The index is updated in place on append(); appends made by other
+    processes are picked up by scanning only the bytes past the indexed size.
+
+    A sidecar index (position.idx.json) persists the per-date offsets, so a cold
+    start only parses the records written after the sidecar was saved. Without
+    a usable sidecar, the reader seeks back to the latest checkpoint record in
+    position.jsonl and only parses what follows it.
+
+    Checkpoint records are written every CHECKPOINT_INTERVAL records. They hold
+    nothing but a "checkpoint" field with the index: no date, id or positions,
+    so line readers that pick the highest-id record of a date never take one
+    for a trade. They are not counted as ledger records.
+
+    Writers serialize through transaction(): an in-process lock plus an advisory
+    fcntl lock on position.jsonl, so read-validate-append sequences from several
+    threads or processes never interleave and never reuse an action id.
+
+    Records are written in the ledger's encoding (see ENCODINGS) and always
+    returned decoded, with the full positions dict, so callers never see the
+    difference. Every encoding can read files written in any other, including
+    legacy full-positions files; a single file may mix encodings.
+    """
+
+    def __init__(self, position_file, fsync: Optional[str] = None, encoding: Optional[str] = None):
+        """
+        Initialize PositionLedger
+
+        Args:
+            position_file: Path to position.jsonl
+            fsync: "always" or "never", defaults to $POSITION_FSYNC or "always"
+            encoding: Encoding for new records ("full", "sparse" or "delta"),
+                defaults to $POSITION_ENCODING or "full"
+        """
+        self.position_file = Path(position_file)
+        self.index_file = index_file_path(self.position_file)
+        self.fsync = fsync or DEFAULT_FSYNC
+        if self.fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{self.fsync}', expected one of {FSYNC_POLICIES}")
+        self.encoding = encoding or DEFAULT_ENCODING
+        if self.encoding not in ENCODINGS:
+            raise ValueError(f"Unknown position encoding '{self.encoding}', expected one of {ENCODINGS}")
+        self._lock = threading.RLock()
+        self._txn_fd: Optional[int] = None
+        self._txn_depth = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        # date -> (max id, byte offset, byte length) of the selected record
+        self._dates: Dict[str, Tuple[int, int, int]] = {}
+        # (offset, length) of the physically last record
+        self._last: Optional[Tuple[int, int]] = None
+        self._count = 0
+        # Highest id seen anywhere in the ledger; ids handed out by next_id() stay above it
+        self._max_id = -1
+        self._indexed_size = 0
+        self._since_checkpoint = 0
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._records: Dict[int, dict] = {}
+        # Every symbol seen in any record, in first-seen order; zero holdings of sparse records
+        self._universe: List[str] = []
+        self._universe_set = set()
+        # Anchor id -> (offset, length) for delta records, plus the current anchor
+        self._anchors: Dict[int, Tuple[int, int]] = {}
+        self._anchor_id: Optional[int] = None
+        self._since_anchor = 0
+        self._anchor_cache: Dict[int, Dict[str, float]] = {}
+
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.position_file)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def _index_line(self, raw: bytes, offset: int) -> None:
+        if not raw.strip():
+            return
+        try:
+            doc = json.loads(raw)
+        except Exception:
+            return
+        if not isinstance(doc, dict):
+            return
+        if CHECKPOINT_KEY in doc:
+            self._since_checkpoint = 0
+            checkpoint = doc[CHECKPOINT_KEY]
+            if isinstance(checkpoint, dict):
+                self._extend_universe(checkpoint.get("universe", ()))
+            return
+        self._add_to_index(doc, offset, len(raw))
+
+    def _extend_universe(self, symbols) -> None:
+        for symbol in symbols:
+            if symbol not in self._universe_set:
+                self._universe_set.add(symbol)
+                self._universe.append(symbol)
+
+    def _observe_encoding(self, doc: dict, offset: int, length: int) -> None:
+        """Track the symbol universe and delta anchors as records are indexed"""
+        encoding = doc.get("encoding")
+        if encoding == "delta":
+            delta = doc.get("delta")
+            if isinstance(delta, dict):
+                self._extend_universe(delta)
+            self._since_anchor += 1
+            return
+        self._extend_universe(doc.get("universe", ()))
+        positions = doc.get("positions")
+        if isinstance(positions, dict):
+            self._extend_universe(positions)
+        if doc.get("anchor") and isinstance(doc.get("id"), int):
+            self._anchors[doc["id"]] = (offset, length)
+            self._anchor_id = doc["id"]
+            self._since_anchor = 0
+
+    def _expand(self, positions: dict) -> Dict[str, float]:
+        """Sparse positions -> full positions over the universe, CASH last"""
+        full = {symbol: 0 for symbol in self._universe if symbol != "CASH"}
+        full.update(positions)
+        if "CASH" in full:
+            full["CASH"] = full.pop("CASH")
+        return full
+
+    def _anchor_positions(self, anchor_id: int) -> Dict[str, float]:
+        """Full positions of a delta anchor"""
+        positions = self._anchor_cache.get(anchor_id)
+        if positions is None:
+            entry = self._anchors.get(anchor_id)
+            if entry is None:
+                raise ValueError(f"Delta anchor id {anchor_id} not found in {self.position_file}")
+            doc = json.loads(self._read_raw(*entry))
+            positions = self._expand(doc.get("positions", {}))
+            if len(self._anchor_cache) > 8:
+                self._anchor_cache.clear()
+            self._anchor_cache[anchor_id] = positions
+        return positions
+
+    def _decode(self, doc: dict) -> dict:
+        """Encoded record -> record with the full positions dict"""
+        encoding = doc.get("encoding")
+        if encoding is None:
+            return doc
+        decoded = {k: v for k, v in doc.items() if k not in _ENCODING_KEYS and k != "positions"}
+        if encoding == "delta":
+            positions = dict(self._anchor_positions(doc.get("base")))
+            positions.update(doc.get("delta", {}))
+            if "CASH" in positions:
+                positions["CASH"] = positions.pop("CASH")
+        else:
+            positions = self._expand(doc.get("positions", {}))
+        decoded["positions"] = positions
+        return decoded
+
+    def _encode(self, record: dict, encoding: Optional[str] = None) -> dict:
+        """Record with full positions -> on-disk record in the given (default: the ledger's) encoding"""
+        encoding = encoding or self.encoding
+        positions = record.get("positions")
+        if encoding == "full" or not isinstance(positions, dict):
+            return record
+        base = {k: v for k, v in record.items() if k != "positions"}
+        sparse = {k: v for k, v in positions.items() if v != 0 or k == "CASH"}
+        if encoding == "delta" and self._anchor_id is not None and self._since_anchor < ANCHOR_INTERVAL:
+            anchor = self._anchor_positions(self._anchor_id)
+            delta = {k: v for k, v in positions.items() if k not in anchor or anchor[k] != v}
+            if all(k in positions for k in anchor) and len(delta) < len(sparse):
+                return {**base, "encoding": "delta", "base": self._anchor_id, "delta": delta}
+        encoded = {**base, "positions": sparse, "encoding": "sparse"}
+        # Zero holdings of symbols the ledger has not seen yet must be declared explicitly
+        new_symbols = [k for k in positions if k not in self._universe_set and k not in sparse]
+        if new_symbols:
+            encoded["universe"] = new_symbols
+        if encoding == "delta":
+            encoded["anchor"] = True
+        return encoded
+
+    def _add_to_index(self, doc: dict, offset: int, length: int) -> None:
+        self._count += 1
+        self._since_checkpoint += 1
+        self._observe_encoding(doc, offset, length)
+        self._last = (offset, length)
+        date = doc.get("date")
+        if not date:
+            return
+        record_id = doc.get("id", 0)
+        if isinstance(record_id, int) and record_id > self._max_id:
+            self._max_id = record_id
+        current = self._dates.get(date)
+        # Strictly greater: on duplicate ids the first record wins
+        if current is None or record_id > current[0]:
+            if current is not None:
+                self._records.pop(current[1], None)
+            self._dates[date] = (record_id, offset, length)
+            self._records[offset] = doc
+
+    def _scan_from(self, offset: int) -> None:
+        """Index every complete line from offset to EOF"""
+        with self.position_file.open("rb") as f:
+            f.seek(offset)
+            while True:
+                raw = f.readline()
+                if not raw:
+                    break
+                if not raw.endswith(b"\n"):
+                    # Trailing line without newline: a complete record from a writer that
+                    # omitted it is indexed; a partially written one is left for the next refresh
+                    try:
+                        complete = isinstance(json.loads(raw), dict)
+                    except Exception:
+                        complete = False
+                    if not complete:
+                        break
+                self._index_line(raw, offset)
+                offset += len(raw)
+        self._indexed_size = offset
+
+    def _read_raw(self, offset: int, length: int) -> bytes:
+        with self.position_file.open("rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def _load_sidecar(self) -> bool:
+        """Restore the index from the sidecar if it still describes a prefix of the ledger"""
+        try:
+            with self.index_file.open("r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("version") != INDEX_VERSION:
+                return False
+            size = int(index["size"])
+            if size > self.position_file.stat().st_size:
+                return False
+            last = index.get("last")
+            if last is not None:
+                # The last indexed record must still be where the sidecar says it is
+                raw = self._read_raw(last[0], last[1])
+                if hashlib.sha1(raw).hexdigest() != index.get("last_sha1"):
+                    return False
+            self._dates = {d: tuple(v) for d, v in index["dates"].items()}
+            self._last = tuple(last) if last is not None else None
+            self._count = int(index["count"])
+            self._max_id = int(index["max_id"])
+            self._since_checkpoint = int(index.get("since_checkpoint", 0))
+            self._restore_encoding_state(index)
+            self._indexed_size = size
+            return True
+        except Exception:
+            self._reset()
+            return False
+
+    def _save_sidecar(self) -> None:
+        last_sha1 = None
+        if self._last is not None:
+            last_sha1 = hashlib.sha1(self._read_raw(*self._last)).hexdigest()
+        index = {
+            "version": INDEX_VERSION,
+            "size": self._indexed_size,
+            "count": self._count,
+            "max_id": self._max_id,
+            "since_checkpoint": self._since_checkpoint,
+            "last": list(self._last) if self._last is not None else None,
+            "last_sha1": last_sha1,
+            "dates": {d: list(v) for d, v in self._dates.items()},
+            **self._encoding_state(),
+        }
+        tmp_file = self.index_file.with_name(f".{self.index_file.name}.tmp")
+        try:
+            with tmp_file.open("w", encoding="utf-8") as f:
+                json.dump(index, f)
+            os.replace(tmp_file, self.index_file)
+        except OSError:
+            # The sidecar is only an accelerator; a read-only directory is fine
+            pass
+
+    def _find_checkpoint(self) -> Optional[Tuple[int, int, dict]]:
+        """
+        Locate the last checkpoint record by reading position.jsonl backwards
+
+        Returns:
+            (byte offset, byte length, record) or None if the file has no checkpoint
+        """
+        marker = f'"{CHECKPOINT_KEY}"'.encode("utf-8")
+        block = 1 << 16
+        with self.position_file.open("rb") as f:
+            f.seek(0, os.SEEK_END)
+            pos = f.tell()
+            buf = b""
+            # Only search before this point of buf (later candidates were rejected)
+            limit = None
+            while True:
+                hit = buf.rfind(marker, 0, limit) if buf else -1
+                if hit >= 0:
+                    line_start = buf.rfind(b"\n", 0, hit) + 1
+                    line_end = buf.find(b"\n", hit)
+                    if line_start == 0 and pos > 0:
+                        hit = -1  # Line starts before the loaded block: read more
+                    elif line_end >= 0:
+                        try:
+                            doc = json.loads(buf[line_start:line_end + 1])
+                        except Exception:
+                            doc = None
+                        if isinstance(doc, dict) and isinstance(doc.get(CHECKPOINT_KEY), dict):
+                            return pos + line_start, line_end + 1 - line_start, doc
+                        limit = line_start
+                        continue
+                    else:
+                        limit = line_start
+                        continue
+                if pos == 0:
+                    return None
+                read = min(block, pos)
+                pos -= read
+                f.seek(pos)
+                chunk = f.read(read)
+                if limit is not None:
+                    limit += len(chunk)
+                buf = chunk + buf
+                block *= 2
+
+    def _load_checkpoint(self) -> bool:
+        """Restore the index from the latest checkpoint record; the scan resumes right after it"""
+        try:
+            found = self._find_checkpoint()
+            if found is None:
+                return False
+            offset, length, doc = found
+            checkpoint = doc[CHECKPOINT_KEY]
+            self._dates = {d: tuple(v) for d, v in checkpoint["dates"].items()}
+            last = checkpoint.get("last")
+            self._last = tuple(last) if last is not None else None
+            self._count = int(checkpoint["count"])
+            self._max_id = int(checkpoint["max_id"])
+            self._restore_encoding_state(checkpoint)
+            self._indexed_size = offset + length
+            self._since_checkpoint = 0
+            return True
+        except Exception:
+            self._reset()
+            return False
+
+    def _checkpoint_record(self) -> Optional[dict]:
+        """Checkpoint record for the current index (None if the ledger has no dated records)"""
+        if not self._dates:
+            return None
+        return {
+            CHECKPOINT_KEY: {
+                "count": self._count,
+                "max_id": self._max_id,
+                "last": list(self._last) if self._last is not None else None,
+                "dates": {d: list(v) for d, v in self._dates.items()},
+                **self._encoding_state(),
+            },
+        }
+
+    def _encoding_state(self) -> dict:
+        """Universe and delta anchors, persisted in the sidecar and in checkpoints"""
+        return {
+            "universe": list(self._universe),
+            "anchors": {str(k): list(v) for k, v in self._anchors.items()},
+            "anchor_id": self._anchor_id,
+            "since_anchor": self._since_anchor,
+        }
+
+    def _restore_encoding_state(self, state: dict) -> None:
+        self._extend_universe(state.get("universe", ()))
+        self._anchors = {int(k): tuple(v) for k, v in state.get("anchors", {}).items()}
+        self._anchor_id = state.get("anchor_id")
+        self._since_anchor = int(state.get("since_anchor", 0))
+
+    def refresh(self) -> bool:
+        """
+        Bring the index up to date with position.jsonl
+
+        Returns:
+            True if the ledger file exists, False otherwise
+        """
+        stamp = self._file_stamp()
+        with self._lock:
+            if stamp is None:
+                self._reset()
+                return False
+            if stamp == self._stamp:
+                return True
+            size, ino = stamp[1], stamp[2]
+            if self._stamp is None:
+                # Cold start: sidecar first, else the latest checkpoint, then only the tail
+                self._reset()
+                if not self._load_sidecar():
+                    self._load_checkpoint()
+            elif ino != self._stamp[2] or size < self._indexed_size or size == self._stamp[1]:
+                # Replaced (e.g. compacted), truncated or rewritten in place: rebuild from the latest checkpoint
+                self._reset()
+                self._load_checkpoint()
+            previous_size = self._indexed_size
+            self._scan_from(self._indexed_size)
+            self._stamp = stamp
+            if self._indexed_size != previous_size:
+                self._save_sidecar()
+            return True
+
+    def exists(self) -> bool:
+        return self.position_file.exists()
+
+    def _record_at(self, offset: int, length: int) -> Optional[dict]:
+        doc = self._records.get(offset)
+        if doc is None:
+            try:
+                doc = json.loads(self._read_raw(offset, length))
+            except Exception:
+                return None
+            self._records[offset] = doc
+        try:
+            return self._decode(doc)
+        except Exception:
+            return None
+
+    def latest(self, date: str) -> Optional[dict]:
+        """
+        Record with the highest id on date
+
+        Returns:
+            Decoded record dict (do not mutate), or None if the date has no records
+        """
+        with self._lock:
+            self.refresh()
+            entry = self._dates.get(date)
+            if entry is None:
+                return None
+            return self._record_at(entry[1], entry[2])
+
+    def positions_on(self, date: str) -> Tuple[Dict[str, float], int]:
+        """
+        Positions of the highest-id record on date
+
+        Returns:
+            (positions copy, max id); ({}, -1) if the date has no records
+        """
+        record = self.latest(date)
+        if record is None:
+            return {}, -1
+        return dict(record.get("positions", {})), record.get("id", 0)
+
+    def max_id(self, date: str) -> int:
+        """Highest record id on date, or -1"""
+        with self._lock:
+            self.refresh()
+            entry = self._dates.get(date)
+            return entry[0] if entry is not None else -1
+
+    def dates(self) -> List[str]:
+        """Sorted list of dates that have at least one record"""
+        with self._lock:
+            self.refresh()
+            return sorted(self._dates)
+
+    def max_date(self) -> Optional[str]:
+        dates = self.dates()
+        return dates[-1] if dates else None
+
+    def last_record(self) -> Optional[dict]:
+        """Physically last record in the file"""
+        with self._lock:
+            self.refresh()
+            if self._last is None:
+                return None
+            return self._record_at(*self._last)
+
+    def count(self) -> int:
+        """Number of records in the ledger"""
+        with self._lock:
+            self.refresh()
+            return self._count
+
+    @contextmanager
+    def transaction(self):
+        """
+        Exclusive write section over the ledger
+
+        Holds the in-process lock and an advisory fcntl lock on position.jsonl for
+        the duration, with the index refreshed on entry. Reads, next_id() and
+        append() inside the block see a consistent ledger. Re-entrant.
+
+        Example:
+            >>> with ledger.transaction():
+            ...     positions, last_id = ledger.positions_on(today_date)
+            ...     ledger.append({"date": today_date, "id": ledger.next_id(last_id), ...})
+        """
+        with self._lock:
+            if self._txn_depth > 0:
+                self._txn_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._txn_depth -= 1
+                return
+            self.position_file.parent.mkdir(parents=True, exist_ok=True)
+            while True:
+                fd = os.open(self.position_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    current_ino = os.stat(self.position_file).st_ino
+                except OSError:
+                    current_ino = None
+                if current_ino == os.fstat(fd).st_ino:
+                    break
+                # The file was replaced (compacted) while we waited for the lock: lock the new one
+                os.close(fd)
+            try:
+                self.refresh()
+                self._repair_tail(fd)
+                self._txn_fd = fd
+                self._txn_depth = 1
+                yield self
+            finally:
+                self._txn_fd = None
+                self._txn_depth = 0
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    def _repair_tail(self, fd: int) -> None:
+        """
+        Drop a torn trailing line left by a crash mid-append, or terminate a complete one
+
+        Only called under the exclusive lock after refresh(), so any bytes past the
+        indexed size are an incomplete line nobody is still writing.
+        """
+        size = os.fstat(fd).st_size
+        if size > self._indexed_size:
+            print(f"⚠️ Truncating {size - self._indexed_size} bytes of incomplete record at the end of {self.position_file}")
+            os.ftruncate(fd, self._indexed_size)
+            self._stamp = self._file_stamp()
+        elif size > 0 and self._read_raw(size - 1, 1) != b"\n":
+            # Last record lacks its newline: terminate it so the next append starts a new line
+            os.write(fd, b"\n")
+            self._indexed_size += 1
+            self._stamp = self._file_stamp()
+
+    def next_id(self, base_id: int = -1) -> int:
+        """
+        Allocate the id for the next record
+
+        Args:
+            base_id: Id of the record the new one builds on (e.g. from positions_on)
+
+        Returns:
+            max(base_id, highest id in the ledger) + 1; call inside transaction()
+            so the id cannot be handed out twice
+        """
+        with self._lock:
+            self.refresh()
+            return max(base_id, self._max_id) + 1
+
+    def append(self, record: dict) -> None:
+        """
+        Append one record to position.jsonl and update the index in place
+
+        Args:
+            record: {"date", "id", "this_action", "positions"}
+        """
+        self.append_many([record])
+
+    def append_many(self, records: List[dict]) -> None:
+        """
+        Append records to position.jsonl in order and update the index in place
+
+        Records are encoded in the ledger's encoding, then all lines are written
+        with a single write() on an O_APPEND descriptor and fsynced once according
+        to the ledger's fsync policy.
+
+        Args:
+            records: List of {"date", "id", "this_action", "positions"} with full positions
+        """
+        if not records:
+            return
+        with self.transaction():
+            fd = self._txn_fd
+            offset = os.fstat(fd).st_size
+            # Another process appended since our refresh: the records are encoded
+            # against a stale anchor/universe, so re-read the tail first
+            if offset != self._indexed_size:
+                self.refresh()
+                offset = self._indexed_size
+            try:
+                # Encode and index one record at a time: each may become the anchor of the next
+                lines = []
+                for record in records:
+                    lines.append(self._encode_and_index(record, offset))
+                    offset += len(lines[-1])
+                self._indexed_size = offset
+                if self._since_checkpoint >= CHECKPOINT_INTERVAL:
+                    lines.append(self._checkpoint_line())
+                    self._since_checkpoint = 0
+                    self._indexed_size += len(lines[-1])
+                data = b"".join(lines)
+                written = os.write(fd, data)
+                while written < len(data):
+                    written += os.write(fd, data[written:])
+            except BaseException:
+                # The in-memory index may be ahead of the file: rebuild it on the next read
+                self._reset()
+                raise
+            if self.fsync == "always":
+                os.fsync(fd)
+            self._stamp = self._file_stamp()
+
+    def _encode_and_index(self, record: dict, offset: int) -> bytes:
+        """Encode a record, index it at offset and return its line"""
+        line = (json.dumps(self._encode(record)) + "\n").encode("utf-8")
+        self._index_line(line, offset)
+        if self._anchor_id == record.get("id") and isinstance(record.get("positions"), dict):
+            # Later records of the same batch are encoded against it before it reaches the file
+            self._anchor_cache[self._anchor_id] = self._expand(record["positions"])
+        return line
+
+    def _checkpoint_line(self) -> bytes:
+        """Serialized checkpoint record for the current index (empty if the ledger has no dated records)"""
+        checkpoint = self._checkpoint_record()
+        if checkpoint is None:
+            return b""
+        return (json.dumps(checkpoint) + "\n").encode("utf-8")
+
+    def checkpoint(self) -> None:
+        """Append a checkpoint record now"""
+        with self.transaction():
+            line = self._checkpoint_line()
+            written = os.write(self._txn_fd, line)
+            while written < len(line):
+                written += os.write(self._txn_fd, line[written:])
+            self._indexed_size += len(line)
+            self._since_checkpoint = 0
+            if self.fsync == "always":
+                os.fsync(self._txn_fd)
+            self._stamp = self._file_stamp()
+
+    def _rebase(self, doc: dict, raw: bytes, kept_anchor_ids: set) -> bytes:
+        """Line for a record kept by compact(); a delta whose anchor is dropped is rewritten as an anchor"""
+        if doc.get("anchor"):
+            kept_anchor_ids.add(doc.get("id"))
+        if doc.get("encoding") != "delta" or doc.get("base") in kept_anchor_ids:
+            return raw
+        decoded = self._decode(doc)
+        record = {k: v for k, v in decoded.items() if k != "positions"}
+        record["positions"] = {k: v for k, v in decoded["positions"].items() if v != 0 or k == "CASH"}
+        record["encoding"] = "sparse"
+        record["anchor"] = True
+        kept_anchor_ids.add(record.get("id"))
+        return (json.dumps(record) + "\n").encode("utf-8")
+
+    def compact(self, before: Optional[str] = None, archive_file=None) -> Dict[str, int]:
+        """
+        Rewrite every day before `before` as a single end-of-day record
+
+        All original records of the compacted days are first appended to the
+        archive, so the full action audit trail is kept. For each compacted day
+        only its highest-id record stays in position.jsonl (so every position
+        lookup returns exactly what it did before); days on or after `before`
+        are kept verbatim. The new ledger ends with a checkpoint and replaces
+        position.jsonl atomically under the ledger lock.
+
+        Args:
+            before: First date kept in full; defaults to the latest date in the ledger
+            archive_file: Audit trail archive, defaults to position_archive.jsonl next to position.jsonl
+
+        Returns:
+            {"records_before", "records_after", "archived", "bytes_before", "bytes_after"}
+        """
+        archive_file = Path(archive_file) if archive_file is not None else self.position_file.with_name(ARCHIVE_FILENAME)
+        with self.transaction():
+            records_before = self._count
+            bytes_before = self._indexed_size
+            if before is None:
+                before = max(self._dates) if self._dates else None
+            if before is None:
+                return {"records_before": 0, "records_after": 0, "archived": 0, "bytes_before": bytes_before, "bytes_after": bytes_before}
+
+            snapshot_offsets = {entry[1] for date, entry in self._dates.items() if date < before}
+            old_records: List[Tuple[str, bytes]] = []
+            kept: List[bytes] = []
+            # Anchors that survive compaction; deltas against a dropped anchor become anchors themselves
+            kept_anchor_ids = set()
+            offset = 0
+            with self.position_file.open("rb") as f:
+                for raw in f:
+                    try:
+                        doc = json.loads(raw)
+                    except Exception:
+                        doc = None
+                    if isinstance(doc, dict) and CHECKPOINT_KEY in doc:
+                        # Old checkpoints point at old offsets; a fresh one is written below
+                        pass
+                    elif isinstance(doc, dict) and doc.get("date") and doc["date"] < before:
+                        old_records.append((doc["date"], raw))
+                        if offset in snapshot_offsets:
+                            kept.append(self._rebase(doc, raw, kept_anchor_ids))
+                    elif isinstance(doc, dict):
+                        kept.append(self._rebase(doc, raw, kept_anchor_ids))
+                    elif raw.strip():
+                        kept.append(raw)
+                    offset += len(raw)
+
+            # Days that already hold a single record (e.g. compacted earlier) are left out of the archive
+            records_per_date: Dict[str, int] = {}
+            for date, _ in old_records:
+                records_per_date[date] = records_per_date.get(date, 0) + 1
+            archived = [raw for date, raw in old_records if records_per_date[date] > 1]
+            if archived:
+                with archive_file.open("ab") as f:
+                    f.write(b"".join(archived))
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            # Re-index the compacted content in memory, then close it with a checkpoint.
+            # Dropped records may have declared symbols the kept sparse records rely on.
+            universe = list(self._universe)
+            self._reset()
+            self._extend_universe(universe)
+            offset = 0
+            for raw in kept:
+                self._index_line(raw, offset)
+                offset += len(raw)
+            self._indexed_size = offset
+            checkpoint = self._checkpoint_record()
+            if checkpoint is not None:
+                kept.append((json.dumps(checkpoint) + "\n").encode("utf-8"))
+                self._indexed_size += len(kept[-1])
+            self._since_checkpoint = 0
+
+            tmp_file = self.position_file.with_name(f".{self.position_file.name}.tmp")
+            with tmp_file.open("wb") as f:
+                f.write(b"".join(kept))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.position_file)
+            self._stamp = self._file_stamp()
+            self._save_sidecar()
+
+            return {
+                "records_before": records_before,
+                "records_after": self._count,
+                "archived": len(archived),
+                "bytes_before": bytes_before,
+                "bytes_after": self._indexed_size,
+            }
+
+    def iter_records(self):
+        """
+        Yield every ledger record in file order, decoded (checkpoints excluded)
+
+        Returns:
+            Iterator of record dicts with full positions
+        """
+        with self._lock:
+            self.refresh()
+            end = self._indexed_size
+            with self.position_file.open("rb") as f:
+                offset = 0
+                for raw in f:
+                    if offset >= end:
+                        break
+                    offset += len(raw)
+                    try:
+                        doc = json.loads(raw)
+                    except Exception:
+                        continue
+                    if isinstance(doc, dict) and CHECKPOINT_KEY not in doc:
+                        yield self._decode(doc)
+
+    def rewrite(self, encoding: str) -> Dict[str, int]:
+        """
+        Re-encode every record of position.jsonl in the given encoding
+
+        Record order, ids and decoded positions are unchanged. The new ledger ends
+        with a checkpoint and replaces position.jsonl atomically under the ledger
+        lock; new records are written in that encoding from then on.
+
+        Args:
+            encoding: "full", "sparse" or "delta"
+
+        Returns:
+            {"records", "bytes_before", "bytes_after"}
+        """
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown position encoding '{encoding}', expected one of {ENCODINGS}")
+        with self.transaction():
+            bytes_before = self._indexed_size
+            records = list(self.iter_records())
+            # Start from an empty universe so the first records declare every symbol again
+            self._reset()
+            self.encoding = encoding
+            lines: List[bytes] = []
+            offset = 0
+            for record in records:
+                lines.append(self._encode_and_index(record, offset))
+                offset += len(lines[-1])
+            self._indexed_size = offset
+            checkpoint = self._checkpoint_record()
+            if checkpoint is not None:
+                lines.append((json.dumps(checkpoint) + "\n").encode("utf-8"))
+                self._indexed_size += len(lines[-1])
+            self._since_checkpoint = 0
+
+            tmp_file = self.position_file.with_name(f".{self.position_file.name}.tmp")
+            with tmp_file.open("wb") as f:
+                f.write(b"".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.position_file)
+            self._stamp = self._file_stamp()
+            self._save_sidecar()
+
+            return {"records": self._count, "bytes_before": bytes_before, "bytes_after": self._indexed_size}
+
+
+_ledgers: Dict[str, PositionLedger] = {}
+_ledgers_lock = threading.Lock()
+
+
+def get_position_ledger(position_file) -> PositionLedger:
+    """
+    Get the process-wide shared PositionLedger for a position.jsonl path
+
+    Args:
+        position_file: Path to position.jsonl
+
+    Returns:
+        Shared PositionLedger instance
+    """
+    key = str(Path(position_file).resolve())
+    ledger = _ledgers.get(key)
+    if ledger is None:
+        with _ledgers_lock:
+            ledger = _ledgers.get(key)
+            if ledger is None:
+                ledger = PositionLedger(key)
+                _ledgers[key] = ledger
+    return ledger
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="position.jsonl ledger maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compact_parser = subparsers.add_parser("compact", help="Rewrite old days as one end-of-day record each, archiving the action audit trail")
+    compact_parser.add_argument("target", help="Agent signature or path to a position.jsonl file")
+    compact_parser.add_argument("--before", help="First date kept in full (YYYY-MM-DD), defaults to the latest date")
+    compact_parser.add_argument("--archive", help=f"Archive path, defaults to {ARCHIVE_FILENAME} next to the ledger")
+    compact_parser.add_argument("--base-dir", help="agent_data directory used to resolve a signature")
+    checkpoint_parser = subparsers.add_parser("checkpoint", help="Append a checkpoint record now")
+    checkpoint_parser.add_argument("target", help="Agent signature or path to a position.jsonl file")
+    checkpoint_parser.add_argument("--base-dir", help="agent_data directory used to resolve a signature")
+    convert_parser = subparsers.add_parser("convert", help="Re-encode every record in another position encoding")
+    convert_parser.add_argument("target", help="Agent signature or path to a position.jsonl file")
+    convert_parser.add_argument("--encoding", required=True, choices=ENCODINGS)
+    convert_parser.add_argument("--base-dir", help="agent_data directory used to resolve a signature")
+    args = parser.parse_args()
+
+    target = Path(args.target)
+    position_file = target if target.suffix == ".jsonl" else position_file_path(args.target, args.base_dir)
+    if not position_file.exists():
+        parser.error(f"Position file {position_file} does not exist")
+    ledger = PositionLedger(position_file)
+
+    if args.command == "compact":
+        stats = ledger.compact(before=args.before, archive_file=args.archive)
+        print(f"✅ Compacted {position_file}")
+        print(f"   records: {stats['records_before']} -> {stats['records_after']} ({stats['archived']} archived)")
+        print(f"   size: {stats['bytes_before']:,} -> {stats['bytes_after']:,} bytes")
+    elif args.command == "convert":
+        stats = ledger.rewrite(args.encoding)
+        print(f"✅ Converted {position_file} to {args.encoding} encoding ({stats['records']} records)")
+        print(f"   size: {stats['bytes_before']:,} -> {stats['bytes_after']:,} bytes")
+    else:
+        ledger.checkpoint()
+        print(f"✅ Checkpoint appended to {position_file}")
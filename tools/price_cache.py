@@ -0,0 +1,233 @@
+import os
+import json
+import shutil
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import sys
+
+import numpy as np
+
+# Add project root directory to Python path to allow running this file from subdirectories
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# Matrix name -> bar field name in merged.jsonl
+CACHE_FIELDS = {
+    "open": "1. buy price",
+    "high": "2. high",
+    "low": "3. low",
+    "close": "4. sell price",
+    "volume": "5. volume",
+}
+CACHE_DTYPE = np.float64
+INDEX_FILENAME = "index.json"
+
+
+def default_cache_dir(merged_path: str) -> Path:
+    """The columnar cache lives next to merged.jsonl in a price_cache/ directory."""
+    return Path(merged_path).parent / "price_cache"
+
+
+def file_content_hash(path: str) -> str:
+    """sha256 of a file's bytes"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _file_stamp(path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _read_index(cache_dir: Path) -> Optional[dict]:
+    index_file = cache_dir / INDEX_FILENAME
+    try:
+        with index_file.open("r", encoding="utf-8") as f:
+            index = json.load(f)
+    except Exception:
+        return None
+    return index if isinstance(index, dict) else None
+
+
+def build_price_cache(merged_path: str, cache_dir: Optional[str] = None, force: bool = False) -> bool:
+    """
+    Build the symbol x trading-date columnar cache from merged.jsonl
+
+    One .npy matrix per OHLCV field plus a boolean "present" matrix (bar exists)
+    is written into a version directory named after the content hash, then
+    index.json (symbols, dates, hash) is swapped in atomically. merged.jsonl
+    stays the source of truth; the cache is only rebuilt when its hash changes.
+
+    Args:
+        merged_path: Path to merged.jsonl
+        cache_dir: Output directory, defaults to price_cache/ next to merged.jsonl
+        force: Rebuild even if the content hash is unchanged
+
+    Returns:
+        True if the cache was (re)built, False if it was already up to date
+    """
+    cache_dir = Path(cache_dir) if cache_dir is not None else default_cache_dir(merged_path)
+    content_hash = file_content_hash(merged_path)
+    source_stamp = _file_stamp(merged_path)
+
+    index = _read_index(cache_dir)
+    if not force and index is not None and index.get("content_hash") == content_hash \
+            and (cache_dir / index.get("version", "")).is_dir():
+        if index.get("source_stamp") != list(source_stamp):
+            # Same content, new mtime (e.g. rewritten identically): only refresh the stamp
+            index["source_stamp"] = list(source_stamp)
+            _write_index(cache_dir, index)
+        return False
+
+    series_by_symbol: Dict[str, dict] = {}
+    with open(merged_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                doc = json.loads(line)
+            except Exception:
+                continue
+            meta = doc.get("Meta Data", {}) if isinstance(doc, dict) else {}
+            sym = meta.get("2. Symbol")
+            series = doc.get("Time Series (Daily)", {})
+            if sym and isinstance(series, dict):
+                series_by_symbol[sym] = series
+
+    symbols = list(series_by_symbol.keys())
+    dates = sorted({d for series in series_by_symbol.values() for d in series})
+    date_pos = {d: j for j, d in enumerate(dates)}
+
+    shape = (len(symbols), len(dates))
+    matrices = {name: np.full(shape, np.nan, dtype=CACHE_DTYPE) for name in CACHE_FIELDS}
+    present = np.zeros(shape, dtype=np.bool_)
+    for i, sym in enumerate(symbols):
+        for date, bar in series_by_symbol[sym].items():
+            if not isinstance(bar, dict):
+                continue
+            j = date_pos[date]
+            present[i, j] = True
+            for name, field in CACHE_FIELDS.items():
+                value = bar.get(field)
+                if value is None:
+                    continue
+                try:
+                    matrices[name][i, j] = float(value)
+                except Exception:
+                    continue
+
+    version = content_hash[:16]
+    version_dir = cache_dir / version
+    tmp_dir = cache_dir / f".{version}.tmp"
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+    for name, matrix in matrices.items():
+        np.save(tmp_dir / f"{name}.npy", matrix)
+    np.save(tmp_dir / "present.npy", present)
+    if version_dir.exists():
+        shutil.rmtree(version_dir)
+    os.replace(tmp_dir, version_dir)
+
+    _write_index(cache_dir, {
+        "version": version,
+        "content_hash": content_hash,
+        "source_stamp": list(source_stamp),
+        "dtype": np.dtype(CACHE_DTYPE).name,
+        "fields": list(CACHE_FIELDS.keys()),
+        "symbols": symbols,
+        "dates": dates,
+    })
+
+    # Drop superseded versions; processes still mapping them keep their pages until they close
+    for child in cache_dir.iterdir():
+        if child.is_dir() and child.name != version and not child.name.startswith("."):
+            shutil.rmtree(child, ignore_errors=True)
+    return True
+
+
+def _write_index(cache_dir: Path, index: dict) -> None:
+    tmp_file = cache_dir / f".{INDEX_FILENAME}.tmp"
+    with tmp_file.open("w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_file, cache_dir / INDEX_FILENAME)
+
+
+class PriceMatrix:
+    """
+    Read-only, memory-mapped view of the columnar price cache
+
+    Matrices are opened with mmap_mode="r", so opening is O(1) and pages are
+    shared between every process that maps the same cache version.
+    """
+
+    def __init__(self, cache_dir: Path, index: dict):
+        self.cache_dir = Path(cache_dir)
+        self.version = index["version"]
+        self.content_hash = index["content_hash"]
+        self.symbols: List[str] = index["symbols"]
+        self.dates: List[str] = index["dates"]
+        self.symbol_index: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+        self.date_index: Dict[str, int] = {d: j for j, d in enumerate(self.dates)}
+        version_dir = self.cache_dir / self.version
+        self.fields: Dict[str, np.ndarray] = {
+            name: np.load(version_dir / f"{name}.npy", mmap_mode="r") for name in index["fields"]
+        }
+        self.present: np.ndarray = np.load(version_dir / "present.npy", mmap_mode="r")
+
+    def has_bar(self, symbol: str, date: str) -> bool:
+        i = self.symbol_index.get(symbol)
+        j = self.date_index.get(date)
+        if i is None or j is None:
+            return False
+        return bool(self.present[i, j])
+
+    def get(self, symbol: str, date: str, field: str) -> Optional[float]:
+        """
+        Get one value by matrix field name ("open", "high", "low", "close", "volume")
+
+        Returns:
+            Float value, or None if the bar or the field is missing
+        """
+        i = self.symbol_index.get(symbol)
+        j = self.date_index.get(date)
+        if i is None or j is None or not self.present[i, j]:
+            return None
+        value = self.fields[field][i, j]
+        return None if np.isnan(value) else float(value)
+
+
+def load_price_matrix(merged_path: str, cache_dir: Optional[str] = None) -> Optional[PriceMatrix]:
+    """
+    Open the columnar cache for merged.jsonl if it is present and current
+
+    The cache counts as current when merged.jsonl's mtime/size still match the
+    stamp recorded at build time; otherwise None is returned and callers fall
+    back to parsing the JSONL file.
+    """
+    cache_dir = Path(cache_dir) if cache_dir is not None else default_cache_dir(merged_path)
+    index = _read_index(cache_dir)
+    if index is None:
+        return None
+    source_stamp = _file_stamp(merged_path)
+    if source_stamp is None or index.get("source_stamp") != list(source_stamp):
+        return None
+    try:
+        return PriceMatrix(cache_dir, index)
+    except Exception:
+        return None
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    merged_file = args[0] if args else os.path.join(project_root, "data", "merged.jsonl")
+    rebuilt = build_price_cache(merged_file, force="--force" in sys.argv)
+    print(f"Price cache {'rebuilt' if rebuilt else 'already up to date'}: {default_cache_dir(merged_file)}")
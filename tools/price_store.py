@@ -0,0 +1,376 @@
+import os
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import sys
+
+# Add project root directory to Python path to allow running this file from subdirectories
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+
+from tools.price_cache import CACHE_FIELDS, INDEX_FILENAME, default_cache_dir, load_price_matrix, PriceMatrix
+from tools.merged_manifest import read_generation
+
+# Alpha Vantage style bar field names as written by data/merge_jsonl.py
+BUY_PRICE_FIELD = "1. buy price"
+HIGH_FIELD = "2. high"
+LOW_FIELD = "3. low"
+SELL_PRICE_FIELD = "4. sell price"
+VOLUME_FIELD = "5. volume"
+
+# Bar field name -> columnar cache matrix name
+_MATRIX_FIELDS = {field: name for name, field in CACHE_FIELDS.items()}
+
+
+def default_merged_path() -> Path:
+    """Return the default location of data/merged.jsonl under the project root."""
+    return Path(__file__).resolve().parents[1] / "data" / "merged.jsonl"
+
+
+class PriceStore:
+    """
+    In-memory (symbol, date) index over merged.jsonl
+
+    The file is parsed once and kept in memory; every lookup afterwards is a
+    dictionary access. The file's mtime/size/inode is checked on access (a
+    single stat), and the index is rebuilt transparently when merged.jsonl is
+    regenerated; merge_jsonl.py replaces the file atomically, so a reload never
+    observes a half-written file. generation() exposes the merge generation.
+
+    Numeric lookups (has_bar / get_price) are served from the memory-mapped
+    columnar cache (tools/price_cache.py) when it matches merged.jsonl, so they
+    never pay for JSON parsing; raw bar access falls back to the JSON index.
+    """
+
+    def __init__(self, merged_path: Optional[str] = None):
+        """
+        Initialize PriceStore
+
+        Args:
+            merged_path: Path to merged.jsonl, defaults to data/merged.jsonl under project root
+        """
+        self.merged_path = Path(merged_path) if merged_path is not None else default_merged_path()
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._generation: Optional[int] = None
+        self._series: Dict[str, Dict[str, dict]] = {}
+        self._bars: Dict[Tuple[str, str], dict] = {}
+        self.cache_dir = default_cache_dir(str(self.merged_path))
+        self._matrix_key: Optional[tuple] = None
+        self._matrix_obj: Optional[PriceMatrix] = None
+
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.merged_path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def _load(self) -> None:
+        """Parse merged.jsonl and rebuild the symbol and (symbol, date) indexes"""
+        series_by_symbol: Dict[str, Dict[str, dict]] = {}
+        bars: Dict[Tuple[str, str], dict] = {}
+
+        with self.merged_path.open("r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    doc = json.loads(line)
+                except Exception:
+                    continue
+                meta = doc.get("Meta Data", {}) if isinstance(doc, dict) else {}
+                sym = meta.get("2. Symbol")
+                if not sym:
+                    continue
+                series = doc.get("Time Series (Daily)", {})
+                if not isinstance(series, dict):
+                    continue
+                series_by_symbol[sym] = series
+                for date, bar in series.items():
+                    if isinstance(bar, dict):
+                        bars[(sym, date)] = bar
+
+        self._series = series_by_symbol
+        self._bars = bars
+        self._generation = read_generation(str(self.merged_path))
+
+    def refresh(self) -> bool:
+        """
+        Reload the index if merged.jsonl changed since the last load
+
+        Returns:
+            True if the data file exists (index is usable), False otherwise
+        """
+        stamp = self._file_stamp()
+        if stamp is None:
+            with self._lock:
+                self._stamp = None
+                self._series = {}
+                self._bars = {}
+                self._generation = None
+            return False
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._load()
+                    self._stamp = stamp
+        return True
+
+    def exists(self) -> bool:
+        """Whether the underlying data file exists"""
+        return self._file_stamp() is not None
+
+    def stamp(self) -> Optional[Tuple[int, int, int]]:
+        """(mtime_ns, size, inode) of merged.jsonl, or None if missing; changes whenever the data changes"""
+        return self._file_stamp()
+
+    def generation(self) -> Optional[int]:
+        """
+        Merge generation of the loaded merged.jsonl (see data/merge_jsonl.py)
+
+        Returns:
+            Generation number, or None if the file was not written by merge_jsonl.py
+        """
+        self.refresh()
+        return self._generation
+
+    def matrix(self) -> Optional[PriceMatrix]:
+        """
+        Get the memory-mapped columnar cache if it is current for merged.jsonl
+
+        Returns:
+            PriceMatrix, or None if no up-to-date cache has been built
+        """
+        try:
+            index_stamp = os.stat(self.cache_dir / INDEX_FILENAME).st_mtime_ns
+        except OSError:
+            index_stamp = None
+        key = (self._file_stamp(), index_stamp)
+        if key != self._matrix_key:
+            with self._lock:
+                if key != self._matrix_key:
+                    self._matrix_obj = load_price_matrix(str(self.merged_path), str(self.cache_dir)) if index_stamp else None
+                    self._matrix_key = key
+        return self._matrix_obj
+
+    def has_symbol(self, symbol: str) -> bool:
+        matrix = self.matrix()
+        if matrix is not None:
+            return symbol in matrix.symbol_index
+        self.refresh()
+        return symbol in self._series
+
+    def symbols(self) -> List[str]:
+        matrix = self.matrix()
+        if matrix is not None:
+            return list(matrix.symbols)
+        self.refresh()
+        return list(self._series.keys())
+
+    def all_dates(self) -> List[str]:
+        """Sorted union of all dates that have a bar for any symbol"""
+        matrix = self.matrix()
+        if matrix is not None:
+            return [matrix.dates[j] for j in np.flatnonzero(matrix.present.any(axis=0))]
+        self.refresh()
+        return sorted({date for series in self._series.values() for date in series})
+
+    def get_series(self, symbol: str) -> Optional[Dict[str, dict]]:
+        """Return the full daily series {date: bar} for a symbol, or None if unknown"""
+        self.refresh()
+        return self._series.get(symbol)
+
+    def get_bar(self, symbol: str, date: str) -> Optional[dict]:
+        """Return the raw bar dict for (symbol, date), or None if not present"""
+        self.refresh()
+        return self._bars.get((symbol, date))
+
+    def has_bar(self, symbol: str, date: str) -> bool:
+        """Whether a bar exists for (symbol, date)"""
+        matrix = self.matrix()
+        if matrix is not None:
+            return matrix.has_bar(symbol, date)
+        return self.get_bar(symbol, date) is not None
+
+    def available_dates(self, symbol: str) -> List[str]:
+        """Return the sorted list of dates that have a bar for symbol"""
+        matrix = self.matrix()
+        if matrix is not None:
+            i = matrix.symbol_index.get(symbol)
+            if i is None:
+                return []
+            return [matrix.dates[j] for j in np.flatnonzero(matrix.present[i])]
+        return sorted(self.get_series(symbol) or {})
+
+    def get_history(self, symbol: str) -> Tuple[List[str], Dict[str, np.ndarray]]:
+        """
+        Get the full daily history of a symbol as aligned float arrays
+
+        Args:
+            symbol: Stock symbol
+
+        Returns:
+            (dates, columns): ascending dates and {"open"|"high"|"low"|"close"|"volume": float64 array};
+            missing values are NaN. Both are empty for an unknown symbol.
+        """
+        matrix = self.matrix()
+        if matrix is not None:
+            i = matrix.symbol_index.get(symbol)
+            if i is None:
+                return [], {}
+            cols = np.flatnonzero(matrix.present[i])
+            dates = [matrix.dates[j] for j in cols]
+            return dates, {name: np.asarray(values[i, cols], dtype=np.float64) for name, values in matrix.fields.items()}
+
+        series = self.get_series(symbol)
+        if series is None:
+            return [], {}
+        dates = sorted(d for d, bar in series.items() if isinstance(bar, dict))
+        columns = {}
+        for field, name in _MATRIX_FIELDS.items():
+            values = np.full(len(dates), np.nan, dtype=np.float64)
+            for k, date in enumerate(dates):
+                value = series[date].get(field)
+                try:
+                    values[k] = float(value) if value is not None else np.nan
+                except Exception:
+                    continue
+            columns[name] = values
+        return dates, columns
+
+    def get_ohlcv(self, symbol: str, date: str) -> Optional[Dict[str, Optional[str]]]:
+        """
+        Get a bar as {field name: raw string value}, in the merged.jsonl representation
+
+        Served from the columnar cache when available (prices formatted with 4
+        decimals and volume as an integer, as delivered by Alpha Vantage), otherwise
+        from the JSON index.
+
+        Returns:
+            Dict keyed by bar field name (missing fields map to None), or None if no bar exists
+        """
+        matrix = self.matrix()
+        if matrix is None:
+            bar = self.get_bar(symbol, date)
+            if bar is None:
+                return None
+            return {field: bar.get(field) for field in _MATRIX_FIELDS}
+        if not matrix.has_bar(symbol, date):
+            return None
+        ohlcv: Dict[str, Optional[str]] = {}
+        for field, name in _MATRIX_FIELDS.items():
+            value = matrix.get(symbol, date, name)
+            if value is None:
+                ohlcv[field] = None
+            elif field == VOLUME_FIELD:
+                ohlcv[field] = f"{value:.0f}"
+            else:
+                ohlcv[field] = f"{value:.4f}"
+        return ohlcv
+
+    def get_price(self, symbol: str, date: str, field: str) -> Optional[float]:
+        """
+        Get a single numeric field of a bar
+
+        Args:
+            symbol: Stock symbol
+            date: Date in YYYY-MM-DD format
+            field: Bar field name, e.g. BUY_PRICE_FIELD
+
+        Returns:
+            Field value as float, or None if bar/field is missing or not numeric
+        """
+        matrix = self.matrix()
+        if matrix is not None and field in _MATRIX_FIELDS:
+            return matrix.get(symbol, date, _MATRIX_FIELDS[field])
+        bar = self.get_bar(symbol, date)
+        if bar is None:
+            return None
+        value = bar.get(field)
+        try:
+            return float(value) if value is not None else None
+        except Exception:
+            return None
+
+
+_stores: Dict[str, PriceStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_price_store(merged_path: Optional[str] = None) -> PriceStore:
+    """
+    Get the process-wide shared PriceStore for a merged.jsonl path
+
+    Args:
+        merged_path: Optional custom merged.jsonl path; defaults to data/merged.jsonl
+
+    Returns:
+        Shared PriceStore instance
+    """
+    path = Path(merged_path) if merged_path is not None else default_merged_path()
+    key = str(path.resolve())
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(key)
+            if store is None:
+                store = PriceStore(key)
+                _stores[key] = store
+    return store
+
+
+def _scan_lookup(merged_file: Path, symbol: str, date: str) -> Optional[dict]:
+    """Legacy lookup: scan and parse merged.jsonl line by line (used for benchmarking only)"""
+    with merged_file.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            doc = json.loads(line)
+            if doc.get("Meta Data", {}).get("2. Symbol") != symbol:
+                continue
+            return doc.get("Time Series (Daily)", {}).get(date)
+    return None
+
+
+if __name__ == "__main__":
+    # Benchmark: per-lookup latency of full-file scan vs. indexed PriceStore
+    import time
+    from tools.price_tools import all_nasdaq_100_symbols
+
+    merged_file = Path(sys.argv[1]) if len(sys.argv) > 1 else default_merged_path()
+    store = PriceStore(str(merged_file))
+
+    start = time.perf_counter()
+    store.refresh()
+    load_time = time.perf_counter() - start
+
+    dates = sorted({d for sym in store.symbols() for d in (store.get_series(sym) or {})})
+    bench_date = dates[-2] if len(dates) > 1 else (dates[0] if dates else "")
+    symbols = all_nasdaq_100_symbols
+
+    start = time.perf_counter()
+    for sym in symbols:
+        _scan_lookup(merged_file, sym, bench_date)
+    scan_total = time.perf_counter() - start
+
+    rounds = 1000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for sym in symbols:
+            store.get_bar(sym, bench_date)
+    store_total = time.perf_counter() - start
+
+    scan_per_lookup = scan_total / len(symbols)
+    store_per_lookup = store_total / (rounds * len(symbols))
+    print(f"File: {merged_file} ({len(store.symbols())} symbols, {len(dates)} dates)")
+    print(f"Benchmark date: {bench_date}, lookups per pass: {len(symbols)}")
+    print(f"PriceStore initial load: {load_time * 1000:.2f} ms")
+    print(f"Full-file scan:  {scan_per_lookup * 1e6:12.2f} us/lookup")
+    print(f"PriceStore:      {store_per_lookup * 1e6:12.2f} us/lookup")
+    if store_per_lookup > 0:
+        print(f"Speedup: {scan_per_lookup / store_per_lookup:,.0f}x")
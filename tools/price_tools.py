@@ -1,9 +1,6 @@
 import os
 from dotenv import load_dotenv
 load_dotenv()
-import json
-from datetime import datetime, timedelta
-from pathlib import Path
 from typing import Dict, List, Optional
 import sys
 
@@ -12,6 +9,9 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 from tools.general_tools import get_config_value
+from tools.price_store import get_price_store, BUY_PRICE_FIELD, SELL_PRICE_FIELD
+from tools.trading_calendar import get_trading_calendar
+from tools.position_ledger import get_position_ledger, position_file_path
 
 all_nasdaq_100_symbols = [
     "NVDA", "MSFT", "AAPL", "GOOG", "GOOGL", "AMZN", "META", "AVGO", "TSLA",
@@ -29,23 +29,15 @@ all_nasdaq_100_symbols = [
 
 def get_yesterday_date(today_date: str) -> str:
     """
-    获取昨日日期，考虑休市日。
+    获取昨日日期（上一个交易日），考虑周末与休市日。
     Args:
         today_date: 日期字符串，格式 YYYY-MM-DD，代表今天日期。
 
     Returns:
         yesterday_date: 昨日日期字符串，格式 YYYY-MM-DD。
     """
-    # 计算昨日日期，考虑休市日
-    today_dt = datetime.strptime(today_date, "%Y-%m-%d")
-    yesterday_dt = today_dt - timedelta(days=1)
-    
-    # 如果昨日是周末，向前找到最近的交易日
-    while yesterday_dt.weekday() >= 5:  # 5=Saturday, 6=Sunday
-        yesterday_dt -= timedelta(days=1)
-    
-    yesterday_date = yesterday_dt.strftime("%Y-%m-%d")
-    return yesterday_date
+    # 基于交易日历（数据中的实际交易日 + NYSE 休市表）计算上一个交易日
+    return get_trading_calendar().prev_trading_day(today_date)
 
 def get_open_prices(today_date: str, symbols: List[str], merged_path: Optional[str] = None) -> Dict[str, Optional[float]]:
     """从 data/merged.jsonl 中读取指定日期与标的的开盘价。
@@ -58,40 +50,19 @@ def get_open_prices(today_date: str, symbols: List[str], merged_path: Optional[s
     Returns:
         {symbol_price: open_price 或 None} 的字典；若未找到对应日期或标的，则值为 None。
     """
-    wanted = set(symbols)
     results: Dict[str, Optional[float]] = {}
 
-    if merged_path is None:
-        base_dir = Path(__file__).resolve().parents[1]
-        merged_file = base_dir / "data" / "merged.jsonl"
-    else:
-        merged_file = Path(merged_path)
-
-    if not merged_file.exists():
+    store = get_price_store(merged_path)
+    if not store.exists():
         return results
 
-    with merged_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                doc = json.loads(line)
-            except Exception:
-                continue
-            meta = doc.get("Meta Data", {}) if isinstance(doc, dict) else {}
-            sym = meta.get("2. Symbol")
-            if sym not in wanted:
-                continue
-            series = doc.get("Time Series (Daily)", {})
-            if not isinstance(series, dict):
-                continue
-            bar = series.get(today_date)
-            if isinstance(bar, dict):
-                open_val = bar.get("1. buy price")
-                try:
-                    results[f'{sym}_price'] = float(open_val) if open_val is not None else None
-                except Exception:
-                    results[f'{sym}_price'] = None
+    # 结果按 merged.jsonl 中的股票顺序排列（与逐行扫描文件时一致）
+    wanted = set(symbols)
+    for sym in store.symbols():
+        if sym not in wanted:
+            continue
+        if store.has_bar(sym, today_date):
+            results[f'{sym}_price'] = store.get_price(sym, today_date, BUY_PRICE_FIELD)
 
     return results
 
@@ -106,84 +77,30 @@ def get_yesterday_open_and_close_price(today_date: str, symbols: List[str], merg
     Returns:
         (买入价字典, 卖出价字典) 的元组；若未找到对应日期或标的，则值为 None。
     """
-    wanted = set(symbols)
     buy_results: Dict[str, Optional[float]] = {}
     sell_results: Dict[str, Optional[float]] = {}
 
-    if merged_path is None:
-        base_dir = Path(__file__).resolve().parents[1]
-        merged_file = base_dir / "data" / "merged.jsonl"
-    else:
-        merged_file = Path(merged_path)
-
-    if not merged_file.exists():
+    store = get_price_store(merged_path)
+    if not store.exists():
         return buy_results, sell_results
 
-    yesterday_date = get_yesterday_date(today_date)
+    calendar = get_trading_calendar(merged_path)
+    yesterday_date = calendar.prev_trading_day(today_date)
 
-    with merged_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                doc = json.loads(line)
-            except Exception:
-                continue
-            meta = doc.get("Meta Data", {}) if isinstance(doc, dict) else {}
-            sym = meta.get("2. Symbol")
-            if sym not in wanted:
-                continue
-            series = doc.get("Time Series (Daily)", {})
-            if not isinstance(series, dict):
-                continue
-            
-            # 尝试获取昨日买入价和卖出价
-            bar = series.get(yesterday_date)
-            if isinstance(bar, dict):
-                buy_val = bar.get("1. buy price")  # 买入价字段
-                sell_val = bar.get("4. sell price")  # 卖出价字段
-                
-                try:
-                    buy_price = float(buy_val) if buy_val is not None else None
-                    sell_price = float(sell_val) if sell_val is not None else None
-                    buy_results[f'{sym}_price'] = buy_price
-                    sell_results[f'{sym}_price'] = sell_price
-                except Exception:
-                    buy_results[f'{sym}_price'] = None
-                    sell_results[f'{sym}_price'] = None
-            else:
-                # 如果昨日没有数据，尝试向前查找最近的交易日
-                today_dt = datetime.strptime(today_date, "%Y-%m-%d")
-                yesterday_dt = today_dt - timedelta(days=1)
-                current_date = yesterday_dt
-                found_data = False
-                
-                # 最多向前查找5个交易日
-                for _ in range(5):
-                    current_date -= timedelta(days=1)
-                    # 跳过周末
-                    while current_date.weekday() >= 5:
-                        current_date -= timedelta(days=1)
-                    
-                    check_date = current_date.strftime("%Y-%m-%d")
-                    bar = series.get(check_date)
-                    if isinstance(bar, dict):
-                        buy_val = bar.get("1. buy price")
-                        sell_val = bar.get("4. sell price")
-                        
-                        try:
-                            buy_price = float(buy_val) if buy_val is not None else None
-                            sell_price = float(sell_val) if sell_val is not None else None
-                            buy_results[f'{sym}_price'] = buy_price
-                            sell_results[f'{sym}_price'] = sell_price
-                            found_data = True
-                            break
-                        except Exception:
-                            continue
-                
-                if not found_data:
-                    buy_results[f'{sym}_price'] = None
-                    sell_results[f'{sym}_price'] = None
+    # 结果按 merged.jsonl 中的股票顺序排列（与逐行扫描文件时一致）
+    wanted = set(symbols)
+    for sym in store.symbols():
+        if sym not in wanted:
+            continue
+
+        # 优先使用昨日数据；若昨日缺失，则回退到最多 5 个交易日内最近的有数据日期
+        check_date = calendar.nearest_available(sym, yesterday_date, max_lookback=5)
+        if check_date is not None:
+            buy_results[f'{sym}_price'] = store.get_price(sym, check_date, BUY_PRICE_FIELD)  # 买入价字段
+            sell_results[f'{sym}_price'] = store.get_price(sym, check_date, SELL_PRICE_FIELD)  # 卖出价字段
+        else:
+            buy_results[f'{sym}_price'] = None
+            sell_results[f'{sym}_price'] = None
 
     return buy_results, sell_results
 
@@ -233,31 +150,15 @@ def get_today_init_position(today_date: str, modelname: str) -> Dict[str, float]
     Returns:
         {symbol: weight} 的字典；若未找到对应日期，则返回空字典。
     """
-    base_dir = Path(__file__).resolve().parents[1]
-    position_file = base_dir / "data" / "agent_data" / modelname / "position" / "position.jsonl"
+    position_file = position_file_path(modelname)
 
     if not position_file.exists():
         print(f"Position file {position_file} does not exist")
         return {}
-    
+
+    # 账本按日期索引了 id 最大的记录，无需扫描全文件
     yesterday_date = get_yesterday_date(today_date)
-    max_id = -1
-    latest_positions = {}
-  
-    with position_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                doc = json.loads(line)
-                if doc.get("date") == yesterday_date:
-                    current_id = doc.get("id", 0)
-                    if current_id > max_id:
-                        max_id = current_id
-                        latest_positions = doc.get("positions", {})
-            except Exception:
-                continue
-    
+    latest_positions, _ = get_position_ledger(position_file).positions_on(yesterday_date)
     return latest_positions
 
 def get_latest_position(today_date: str, modelname: str) -> Dict[str, float]:
@@ -275,53 +176,19 @@ def get_latest_position(today_date: str, modelname: str) -> Dict[str, float]:
           - positions: {symbol: weight} 的字典；若未找到任何记录，则为空字典。
           - max_id: 选中记录的最大 id；若未找到任何记录，则为 -1。
     """
-    base_dir = Path(__file__).resolve().parents[1]
-    position_file = base_dir / "data" / "agent_data" / modelname / "position" / "position.jsonl"
+    ledger = get_position_ledger(position_file_path(modelname))
 
-    if not position_file.exists():
+    if not ledger.exists():
         return {}, -1
-    
+
     # 先尝试读取当天记录
-    max_id_today = -1
-    latest_positions_today: Dict[str, float] = {}
-    
-    with position_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                doc = json.loads(line)
-                if doc.get("date") == today_date:
-                    current_id = doc.get("id", -1)
-                    if current_id > max_id_today:
-                        max_id_today = current_id
-                        latest_positions_today = doc.get("positions", {})
-            except Exception:
-                continue
-    
+    latest_positions_today, max_id_today = ledger.positions_on(today_date)
     if max_id_today >= 0:
         return latest_positions_today, max_id_today
 
     # 当天没有记录，则回退到上一个交易日
     prev_date = get_yesterday_date(today_date)
-    max_id_prev = -1
-    latest_positions_prev: Dict[str, float] = {}
-
-    with position_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                doc = json.loads(line)
-                if doc.get("date") == prev_date:
-                    current_id = doc.get("id", -1)
-                    if current_id > max_id_prev:
-                        max_id_prev = current_id
-                        latest_positions_prev = doc.get("positions", {})
-            except Exception:
-                continue
-
-    return latest_positions_prev, max_id_prev
+    return ledger.positions_on(prev_date)
 
 def add_no_trade_record(today_date: str, modelname: str):
     """
@@ -333,19 +200,18 @@ def add_no_trade_record(today_date: str, modelname: str):
     Returns:
         None
     """
-    save_item = {}
-    current_position, current_action_id = get_latest_position(today_date, modelname)
-    print(current_position, current_action_id)
-    save_item["date"] = today_date
-    save_item["id"] = current_action_id+1
-    save_item["this_action"] = {"action":"no_trade","symbol":"","amount":0}
-    
-    save_item["positions"] = current_position
-    base_dir = Path(__file__).resolve().parents[1]
-    position_file = base_dir / "data" / "agent_data" / modelname / "position" / "position.jsonl"
-
-    with position_file.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(save_item) + "\n")
+    ledger = get_position_ledger(position_file_path(modelname))
+    # 与买卖工具相同：在账本事务内读取持仓并追加，id 取自账本的单调计数器
+    with ledger.transaction():
+        save_item = {}
+        current_position, current_action_id = get_latest_position(today_date, modelname)
+        print(current_position, current_action_id)
+        save_item["date"] = today_date
+        save_item["id"] = ledger.next_id(current_action_id)
+        save_item["this_action"] = {"action":"no_trade","symbol":"","amount":0}
+        
+        save_item["positions"] = current_position
+        ledger.append(save_item)
     return 
 
 if __name__ == "__main__":
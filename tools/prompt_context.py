@@ -0,0 +1,223 @@
+import os
+import threading
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+import sys
+
+# Add project root directory to Python path to allow running this file from subdirectories
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+
+from tools.price_cache import CACHE_FIELDS
+from tools.price_store import get_price_store, BUY_PRICE_FIELD, SELL_PRICE_FIELD
+from tools.trading_calendar import get_trading_calendar
+from tools.position_ledger import get_position_ledger, position_file_path
+
+# Trading days a missing yesterday bar may fall back to (as in get_yesterday_open_and_close_price)
+YESTERDAY_MAX_LOOKBACK = 5
+
+_FIELD_NAMES = {field: name for name, field in CACHE_FIELDS.items()}
+
+
+class PromptContextBuilder:
+    """
+    Daily system prompt context for a fixed symbol list
+
+    Produces for a trading day the same values as get_yesterday_open_and_close_price,
+    get_open_prices, get_today_init_position and get_yesterday_profit, without
+    querying them symbol by symbol and day by day. The buy and sell prices of
+    all symbols are loaded once as a (symbol, date) matrix; prepare(dates) then
+    resolves yesterday's bar (with the same 5 trading day fallback) and today's
+    bar for every symbol and every date of a range in one vectorized pass.
+    Initial positions come from the ledger index and yesterday's profit is
+    computed on the price vectors.
+
+    Contexts are cached per (position file, date) and reused while the ledger's
+    highest record id of the previous trading day is unchanged, so retries and
+    re-runs of a day do not rebuild them; everything is rebuilt when merged.jsonl
+    changes.
+    """
+
+    def __init__(self, symbols: Iterable[str], merged_path: Optional[str] = None):
+        """
+        Initialize PromptContextBuilder
+
+        Args:
+            symbols: Symbols of the prompt, in prompt order
+            merged_path: Optional custom merged.jsonl path; defaults to data/merged.jsonl
+        """
+        self.symbols: List[str] = list(dict.fromkeys(symbols))
+        self.merged_path = merged_path
+        self.store = get_price_store(merged_path)
+        self._keys = [f"{symbol}_price" for symbol in self.symbols]
+        self._lock = threading.RLock()
+        self._stamp = None
+        self._loaded = False
+        # date -> (yesterday_date, yesterday buy, yesterday sell, today present, today buy), arrays over self.symbols
+        self._prices: Dict[str, tuple] = {}
+        # date -> (yesterday_date, yesterday buy dict, yesterday sell dict, today buy dict)
+        self._price_dicts: Dict[str, tuple] = {}
+        # (position file, date) -> (ledger mark, context)
+        self._contexts: Dict[Tuple[str, str], tuple] = {}
+
+    def _refresh(self) -> None:
+        """(Re)load the price matrix when merged.jsonl changed"""
+        stamp = self.store.stamp()
+        if self._loaded and stamp == self._stamp:
+            return
+        store = self.store
+        self._known = np.array([store.has_symbol(symbol) for symbol in self.symbols], dtype=bool)
+        # Price dicts list symbols in merged.jsonl order, like get_open_prices and get_yesterday_open_and_close_price
+        position = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._store_order = np.array([position[symbol] for symbol in store.symbols() if symbol in position], dtype=np.intp)
+        self._dates = store.all_dates()
+        column = {date: j for j, date in enumerate(self._dates)}
+        shape = (len(self.symbols), len(self._dates))
+        self._buy = np.full(shape, np.nan)
+        self._sell = np.full(shape, np.nan)
+        self._present = np.zeros(shape, dtype=bool)
+        for i, symbol in enumerate(self.symbols):
+            dates, columns = store.get_history(symbol)
+            if not dates:
+                continue
+            cols = np.fromiter((column[date] for date in dates), dtype=np.intp, count=len(dates))
+            self._present[i, cols] = True
+            self._buy[i, cols] = columns[_FIELD_NAMES[BUY_PRICE_FIELD]]
+            self._sell[i, cols] = columns[_FIELD_NAMES[SELL_PRICE_FIELD]]
+        # Column of each symbol's latest bar on or before each date (-1: none yet)
+        self._last_bar = np.where(self._present, np.arange(shape[1]), -1)
+        np.maximum.accumulate(self._last_bar, axis=1, out=self._last_bar)
+        self._calendar = get_trading_calendar(self.merged_path)
+        # Trading-day rank of each date, to measure how far back a fallback bar is
+        self._rank = np.array([bisect_right(self._calendar.days, date) for date in self._dates], dtype=np.intp)
+        self._column = column
+        self._prices.clear()
+        self._price_dicts.clear()
+        self._contexts.clear()
+        self._stamp = stamp
+        self._loaded = True
+
+    def prepare(self, dates: Iterable[str]) -> None:
+        """Resolve the prices of all symbols for all dates in one pass"""
+        with self._lock:
+            self._refresh()
+            todo = [date for date in dict.fromkeys(dates) if date not in self._prices]
+            if not todo:
+                return
+            calendar = self._calendar
+            yesterdays = [calendar.prev_trading_day(date) for date in todo]
+            rows = np.arange(len(self.symbols))[:, None]
+
+            if self._dates:
+                yesterday_cols = np.array([bisect_right(self._dates, y) - 1 for y in yesterdays], dtype=np.intp)
+                found = self._last_bar[:, np.maximum(yesterday_cols, 0)]
+                found[:, yesterday_cols < 0] = -1
+                yesterday_rank = np.array([bisect_right(calendar.days, y) for y in yesterdays], dtype=np.intp)
+                gap = yesterday_rank[None, :] - self._rank[np.maximum(found, 0)]
+                usable = (found >= 0) & (gap <= YESTERDAY_MAX_LOOKBACK)
+                found = np.maximum(found, 0)
+                yesterday_buy = np.where(usable, self._buy[rows, found], np.nan)
+                yesterday_sell = np.where(usable, self._sell[rows, found], np.nan)
+
+                today_cols = np.array([self._column.get(date, -1) for date in todo], dtype=np.intp)
+                today_present = self._present[:, np.maximum(today_cols, 0)] & (today_cols >= 0)[None, :]
+                today_buy = np.where(today_present, self._buy[:, np.maximum(today_cols, 0)], np.nan)
+            else:
+                shape = (len(self.symbols), len(todo))
+                yesterday_buy = yesterday_sell = today_buy = np.full(shape, np.nan)
+                today_present = np.zeros(shape, dtype=bool)
+
+            for n, date in enumerate(todo):
+                self._prices[date] = (yesterdays[n], yesterday_buy[:, n], yesterday_sell[:, n],
+                                      today_present[:, n], today_buy[:, n])
+
+    def _as_dict(self, values: np.ndarray, mask: np.ndarray) -> Dict[str, Optional[float]]:
+        return {self._keys[i]: (None if np.isnan(values[i]) else float(values[i])) for i in self._store_order if mask[i]}
+
+    def price_context(self, today_date: str) -> tuple:
+        """
+        Prices of a day, in the format of get_yesterday_open_and_close_price and get_open_prices
+
+        Returns:
+            (yesterday_date, yesterday buy prices, yesterday sell prices, today buy prices); do not mutate
+        """
+        with self._lock:
+            self.prepare([today_date])
+            cached = self._price_dicts.get(today_date)
+            if cached is None:
+                yesterday, yesterday_buy, yesterday_sell, today_present, today_buy = self._prices[today_date]
+                cached = (yesterday, self._as_dict(yesterday_buy, self._known), self._as_dict(yesterday_sell, self._known),
+                          self._as_dict(today_buy, today_present))
+                self._price_dicts[today_date] = cached
+            return cached
+
+    def context(self, today_date: str, signature: str) -> Dict[str, dict]:
+        """
+        System prompt context of a day
+
+        Args:
+            today_date: Trading day
+            signature: Agent signature, whose ledger gives the initial positions
+
+        Returns:
+            {"date", "positions", "yesterday_close_price", "today_buy_price", "yesterday_profit"},
+            the placeholders of agent_system_prompt; do not mutate
+        """
+        with self._lock:
+            yesterday, _, yesterday_sell_prices, today_buy_prices = self.price_context(today_date)
+            position_file = position_file_path(signature)
+            ledger = get_position_ledger(position_file)
+            if not ledger.exists():
+                print(f"Position file {position_file} does not exist")
+                mark = None
+            else:
+                mark = ledger.max_id(yesterday)
+            key = (str(position_file), today_date)
+            cached = self._contexts.get(key)
+            if cached is not None and cached[0] == mark:
+                return cached[1]
+
+            positions = ledger.positions_on(yesterday)[0] if mark is not None else {}
+            _, yesterday_buy, yesterday_sell, _, _ = self._prices[today_date]
+            weights = np.array([positions.get(symbol, 0.0) for symbol in self.symbols], dtype=np.float64)
+            profit = (yesterday_sell - yesterday_buy) * weights
+            has_profit = ~np.isnan(profit) & (weights > 0)
+            context = {
+                "date": today_date,
+                "positions": positions,
+                "yesterday_close_price": yesterday_sell_prices,
+                "today_buy_price": today_buy_prices,
+                "yesterday_profit": {symbol: round(float(profit[i]), 4) if has_profit[i] else 0.0
+                                     for i, symbol in enumerate(self.symbols)},
+            }
+            self._contexts[key] = (mark, context)
+            return context
+
+
+_builders: Dict[tuple, PromptContextBuilder] = {}
+_builders_lock = threading.Lock()
+
+
+def get_prompt_context_builder(symbols: Iterable[str], merged_path: Optional[str] = None) -> PromptContextBuilder:
+    """
+    Get the process-wide shared PromptContextBuilder for a symbol list and merged.jsonl path
+
+    Args:
+        symbols: Symbols of the prompt
+        merged_path: Optional custom merged.jsonl path; defaults to data/merged.jsonl
+
+    Returns:
+        Shared PromptContextBuilder instance
+    """
+    key = (tuple(dict.fromkeys(symbols)), str(get_price_store(merged_path).merged_path))
+    builder = _builders.get(key)
+    if builder is None:
+        with _builders_lock:
+            builder = _builders.get(key)
+            if builder is None:
+                builder = PromptContextBuilder(key[0], merged_path)
+                _builders[key] = builder
+    return builder
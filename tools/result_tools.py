@@ -21,6 +21,8 @@ from tools.price_tools import (
     all_nasdaq_100_symbols
 )
 from tools.general_tools import get_config_value
+from tools.price_store import get_price_store, SELL_PRICE_FIELD
+from tools.position_ledger import get_position_ledger, position_file_path
 
 
 def calculate_portfolio_value(positions: Dict[str, float], prices: Dict[str, Optional[float]], cash: float = 0.0) -> float:
@@ -58,30 +60,15 @@ def get_available_date_range(modelname: str) -> Tuple[str, str]:
     Returns:
         Tuple of (earliest date, latest date) in YYYY-MM-DD format
     """
-    base_dir = Path(__file__).resolve().parents[1]
-    position_file = base_dir / "data" / "agent_data" / modelname / "position" / "position.jsonl"
-    
-    if not position_file.exists():
+    ledger = get_position_ledger(position_file_path(modelname))
+
+    if not ledger.exists():
         return "", ""
-    
-    dates = []
-    
-    with position_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                doc = json.loads(line)
-                date = doc.get("date")
-                if date:
-                    dates.append(date)
-            except Exception:
-                continue
-    
+
+    dates = ledger.dates()
     if not dates:
         return "", ""
-    
-    dates.sort()
+
     return dates[0], dates[-1]
 
 
@@ -98,7 +85,7 @@ def get_daily_portfolio_values(modelname: str, start_date: Optional[str] = None,
         Dictionary of daily portfolio values in format {date: portfolio_value}
     """
     base_dir = Path(__file__).resolve().parents[1]
-    position_file = base_dir / "data" / "agent_data" / modelname / "position" / "position.jsonl"
+    position_file = position_file_path(modelname)
     merged_file = base_dir / "data" / "merged.jsonl"
     
     if not position_file.exists() or not merged_file.exists():
@@ -115,68 +102,31 @@ def get_daily_portfolio_values(modelname: str, start_date: Optional[str] = None,
         if end_date is None:
             end_date = latest_date
     
-    # Read position data
-    position_data = []
-    with position_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                doc = json.loads(line)
-                position_data.append(doc)
-            except Exception:
-                continue
-    
-    # Read price data
-    price_data = {}
-    with merged_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                doc = json.loads(line)
-                meta = doc.get("Meta Data", {})
-                symbol = meta.get("2. Symbol")
-                if symbol:
-                    price_data[symbol] = doc.get("Time Series (Daily)", {})
-            except Exception:
-                continue
+    # Per-date latest records come straight from the ledger index
+    ledger = get_position_ledger(position_file)
+
+    # Shared in-memory price index
+    price_store = get_price_store(str(merged_file))
     
     # Calculate daily portfolio values
     daily_values = {}
     
-    # Group position data by date
-    positions_by_date = {}
-    for record in position_data:
-        date = record.get("date")
-        if date:
-            if date not in positions_by_date:
-                positions_by_date[date] = []
-            positions_by_date[date].append(record)
-    
-    # For each date, sort records by id and take latest position
-    for date, records in positions_by_date.items():
+    for date in ledger.dates():
         if start_date and date < start_date:
             continue
         if end_date and date > end_date:
             continue
             
-        # Sort by id and take latest position
-        latest_record = max(records, key=lambda x: x.get("id", 0))
-        positions = latest_record.get("positions", {})
+        # Latest (max id) position of the day
+        positions = ledger.latest(date).get("positions", {})
         
         # Get daily prices
         daily_prices = {}
         for symbol in all_nasdaq_100_symbols:
-            if symbol in price_data:
-                symbol_prices = price_data[symbol]
-                if date in symbol_prices:
-                    price_info = symbol_prices[date]
-                    buy_price = price_info.get("1. buy price")
-                    sell_price = price_info.get("4. sell price")
-                    # Use closing (sell) price to calculate value
-                    if sell_price is not None:
-                        daily_prices[f'{symbol}_price'] = float(sell_price)
+            # Use closing (sell) price to calculate value
+            sell_price = price_store.get_price(symbol, date, SELL_PRICE_FIELD)
+            if sell_price is not None:
+                daily_prices[f'{symbol}_price'] = sell_price
         
         # Calculate portfolio value
         cash = positions.get("CASH", 0.0)
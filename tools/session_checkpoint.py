@@ -0,0 +1,200 @@
+import os
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import sys
+
+# Add project root directory to Python path to allow running this file from subdirectories
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from tools.position_ledger import PositionLedger
+
+CHECKPOINT_DIRNAME = "checkpoint"
+CHECKPOINT_FILENAME = "session.json"
+
+
+def checkpoint_file_path(base_log_path: str, signature: str, today_date: str) -> Path:
+    """{base_log_path}/{signature}/checkpoint/{today_date}/session.json, next to log/ and metrics/"""
+    return Path(base_log_path) / signature / CHECKPOINT_DIRNAME / today_date / CHECKPOINT_FILENAME
+
+
+class SessionCheckpoint:
+    """
+    Resumable state of one trading session
+
+    Saved after every completed step: the conversation state (see
+    ConversationContext.state), the number of completed steps, the session id
+    and the ledger's high-water mark (highest record id of the day). Records
+    of the day above the mark were written by a step that did not complete.
+    The file is replaced atomically and removed when the session completes,
+    so its presence means the day was interrupted.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """{"signature", "date", "session_id", "step", "ledger_mark", "context", "updated_at"} or None"""
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, signature: str, today_date: str, session_id: str, step: int, ledger_mark: int, context: Dict[str, Any]) -> None:
+        state = {
+            "signature": signature,
+            "date": today_date,
+            "session_id": session_id,
+            "step": step,
+            "ledger_mark": ledger_mark,
+            "context": context,
+            "updated_at": datetime.now().isoformat(),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+def applied_since(ledger: PositionLedger, today_date: str, ledger_mark: int) -> List[dict]:
+    """Trade records of today_date with an id above ledger_mark, in file order"""
+    return [
+        record for record in ledger.iter_records()
+        if record.get("date") == today_date and record.get("id", -1) > ledger_mark
+        and (record.get("this_action") or {}).get("action") in ("buy", "sell")
+    ]
+
+
+def _order_key(action: Any, symbol: Any, amount: Any) -> Tuple[str, Any, Any]:
+    return str(action or "").lower(), symbol, amount
+
+
+class ResumeGuard:
+    """
+    Keeps the trades of an interrupted step from being executed twice
+
+    After a retry or resume the agent redoes the interrupted step, and the
+    model may place the same orders again. Once armed with the trades the
+    ledger already holds from that step, each buy/sell (or execute_orders
+    entry) matching one of them by action, symbol and amount is answered from
+    the ledger record instead of being sent to the trade tool; every applied
+    trade is matched at most once.
+    """
+
+    def __init__(self, applied: Optional[List[dict]] = None):
+        self.pending: List[Tuple[Tuple[str, Any, Any], dict]] = []
+        self.skipped = 0
+        self.arm(applied or [])
+
+    def arm(self, applied: List[dict]) -> None:
+        """Guard against repeating these trade records (replaces the previous ones)"""
+        self.pending = [(_order_key(r["this_action"].get("action"), r["this_action"].get("symbol"),
+                                    r["this_action"].get("amount")), r) for r in applied]
+
+    def _take(self, action: Any, symbol: Any, amount: Any) -> Optional[dict]:
+        key = _order_key(action, symbol, amount)
+        for index, (pending_key, record) in enumerate(self.pending):
+            if pending_key == key:
+                del self.pending[index]
+                self.skipped += 1
+                return record
+        return None
+
+    def wrap(self, tools: List[BaseTool]) -> List[BaseTool]:
+        """Tools with buy, sell and execute_orders going through the guard"""
+        handlers = {"buy": self._guard_trade, "sell": self._guard_trade, "execute_orders": self._guard_batch}
+        return [self._wrap_tool(tool, handlers[tool.name]) if tool.name in handlers else tool for tool in tools]
+
+    @staticmethod
+    def _wrap_tool(tool: BaseTool, handler) -> BaseTool:
+        async def call(**arguments):
+            return await handler(tool, arguments)
+
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            coroutine=call,
+            response_format=tool.response_format,
+            metadata=tool.metadata,
+        )
+
+    @staticmethod
+    def _output(tool: BaseTool, result: Dict[str, Any]):
+        content = json.dumps(result, ensure_ascii=False)
+        return (content, None) if tool.response_format == "content_and_artifact" else content
+
+    async def _guard_trade(self, tool: BaseTool, arguments: Dict[str, Any]):
+        record = self._take(tool.name, arguments.get("symbol"), arguments.get("amount"))
+        if record is not None:
+            # What the trade tool returned when it executed this order
+            return self._output(tool, record["positions"])
+        return await tool.coroutine(**arguments)
+
+    async def _guard_batch(self, tool: BaseTool, arguments: Dict[str, Any]):
+        orders = arguments.get("orders") or []
+        replayed: Dict[int, dict] = {}
+        remaining = []
+        for index, order in enumerate(orders):
+            record = self._take(order.get("action"), order.get("symbol"), order.get("amount")) if isinstance(order, dict) else None
+            if record is not None:
+                replayed[index] = record
+            else:
+                remaining.append(index)
+        if not replayed:
+            return await tool.coroutine(**arguments)
+
+        result: Dict[str, Any] = {"date": None, "filled": 0, "rejected": 0, "results": [], "positions": {}}
+        if remaining:
+            output = await tool.coroutine(**{**arguments, "orders": [orders[i] for i in remaining]})
+            content = output[0] if isinstance(output, tuple) else output
+            try:
+                result = json.loads(content)
+            except (TypeError, ValueError):
+                return output
+        results = {remaining[r["order"]]: {**r, "order": remaining[r["order"]]} for r in result.get("results", [])}
+        for index, record in replayed.items():
+            action = record["this_action"]
+            results[index] = {"order": index, "action": action["action"], "symbol": action["symbol"],
+                              "amount": action["amount"], "status": "filled"}
+        last = max(replayed.values(), key=lambda r: r["id"])
+        result.update({
+            "date": result.get("date") or last["date"],
+            "filled": result.get("filled", 0) + len(replayed),
+            "results": [results[i] for i in sorted(results)],
+            "positions": result.get("positions") or last["positions"],
+        })
+        return self._output(tool, result)
+
+
+def resume_turn(applied: List[dict]) -> Tuple[str, List[dict], Dict[str, Any]]:
+    """
+    The trades of an interrupted step as one conversation turn
+
+    Returns:
+        (assistant_content, tool_messages, response) for ConversationContext.add_turn
+    """
+    calls, tool_messages = [], []
+    for record in applied:
+        action = record["this_action"]
+        call_id = f"resumed-{record['id']}"
+        calls.append({"id": call_id, "name": action["action"], "args": {"symbol": action["symbol"], "amount": action["amount"]}})
+        tool_messages.append({"tool_call_id": call_id, "name": action["action"], "content": json.dumps(record["positions"])})
+    assistant = ("The session was interrupted and resumed. These orders of the interrupted step were already "
+                 "executed and must not be placed again: "
+                 + ", ".join(f"{c['name']} {c['args']['symbol']} x{c['args']['amount']}" for c in calls))
+    return assistant, tool_messages, {"messages": [{"tool_calls": calls}]}
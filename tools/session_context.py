@@ -0,0 +1,111 @@
+import os
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, NamedTuple, Optional
+import sys
+
+# Add project root directory to Python path to allow running this file from subdirectories
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from tools.general_tools import get_config_value
+
+try:
+    from fastmcp.server.dependencies import get_http_headers
+except ImportError:  # Outside an MCP server there is no request to read
+    def get_http_headers(include_all: bool = False) -> Dict[str, str]:
+        return {}
+
+# HTTP headers carrying the session context on every MCP request (lower case, as seen by the server)
+SIGNATURE_HEADER = "x-trading-signature"
+DATE_HEADER = "x-trading-date"
+SESSION_HEADER = "x-trading-session-id"
+
+# MCP transports that send HTTP headers with each request
+HTTP_TRANSPORTS = ("streamable_http", "sse")
+# Tools of a local FastMCP server called directly in the agent process (see tools.mcp_pool);
+# the headers of its connection are handed to the tools through session_scope
+IN_PROCESS_TRANSPORT = "in_process"
+
+
+class SessionContext(NamedTuple):
+    """Which agent and trading day an MCP tool call belongs to"""
+
+    signature: Optional[str]
+    today_date: Optional[str]
+    # None when the context came from the shared runtime config instead of a session
+    session_id: Optional[str] = None
+
+    def headers(self) -> Dict[str, str]:
+        """Request headers that deliver this context to the MCP servers"""
+        headers = {SIGNATURE_HEADER: self.signature, DATE_HEADER: self.today_date, SESSION_HEADER: self.session_id}
+        return {k: v for k, v in headers.items() if v is not None}
+
+    @classmethod
+    def from_headers(cls, headers: Dict[str, str]) -> Optional["SessionContext"]:
+        """Context carried by request headers, or None without a signature header"""
+        signature = headers.get(SIGNATURE_HEADER)
+        if not signature:
+            return None
+        return cls(signature, headers.get(DATE_HEADER), headers.get(SESSION_HEADER))
+
+
+# Context of the tool call being run in-process, set by session_scope
+_current_session: ContextVar[Optional[SessionContext]] = ContextVar("trading_session", default=None)
+
+
+def new_session(signature: str, today_date: str) -> SessionContext:
+    """Context for a new trading session of signature on today_date"""
+    return SessionContext(signature, today_date, uuid.uuid4().hex)
+
+
+@contextmanager
+def session_scope(context: Optional[SessionContext]) -> Iterator[None]:
+    """Make context the session of tool calls run inside the block (in-process tools)"""
+    token = _current_session.set(context)
+    try:
+        yield
+    finally:
+        _current_session.reset(token)
+
+
+def get_session_context() -> SessionContext:
+    """
+    Session context of the MCP request being served
+
+    Read from the request headers set by the agent (see SessionContext.headers),
+    so one server can serve many agents and dates at once; tools called
+    in-process get the same context through session_scope. Calls without
+    either (stdio transport, scripts, older clients) fall back to SIGNATURE and
+    TODAY_DATE from the shared runtime config, with session_id None.
+
+    Must be called from the tool's own coroutine/thread, not from a worker thread.
+    """
+    current = _current_session.get()
+    if current is not None:
+        return current
+    context = SessionContext.from_headers(get_http_headers())
+    if context is not None:
+        return context
+    return SessionContext(get_config_value("SIGNATURE"), get_config_value("TODAY_DATE"))
+
+
+def apply_session_headers(mcp_config: Dict[str, Dict], context: SessionContext) -> None:
+    """
+    Set the session headers on every HTTP and in-process connection of an MCP client config, in place
+
+    MultiServerMCPClient and MCPSessionPool keep references to these
+    connection dicts and read the headers when a tool call opens its session
+    (MultiServerMCPClient) or sends its request (MCPSessionPool), so updating
+    them switches all subsequent tool calls to the new context.
+    """
+    for connection in mcp_config.values():
+        if connection.get("transport") not in HTTP_TRANSPORTS + (IN_PROCESS_TRANSPORT,):
+            continue
+        if connection.get("headers") is None:
+            connection["headers"] = {}
+        for header in (SIGNATURE_HEADER, DATE_HEADER, SESSION_HEADER):
+            connection["headers"].pop(header, None)
+        connection["headers"].update(context.headers())
@@ -0,0 +1,163 @@
+import os
+import json
+import gzip
+import atexit
+import asyncio
+import threading
+import weakref
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator, List, Optional
+import sys
+
+# Add project root directory to Python path to allow running this file from subdirectories
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# None: plain log.jsonl; "gzip": log.jsonl.gz, one gzip member per flushed batch
+LOG_COMPRESSIONS = (None, "gzip")
+DEFAULT_LOG_COMPRESSION = os.getenv("LOG_COMPRESSION") or None
+
+# Loggers with entries not yet on disk, flushed synchronously if the process exits without closing them
+_open_loggers: "weakref.WeakSet[SessionLogger]" = weakref.WeakSet()
+
+
+def log_file_path(base_log_path: str, signature: str, today_date: str, compression: Optional[str] = None) -> Path:
+    """{base_log_path}/{signature}/log/{today_date}/log.jsonl (log.jsonl.gz when gzip-compressed)"""
+    suffix = ".gz" if compression == "gzip" else ""
+    return Path(base_log_path) / signature / "log" / today_date / f"log.jsonl{suffix}"
+
+
+class SessionLogger:
+    """
+    Buffered writer of a trading session's log.jsonl
+
+    log() only serializes the entry and queues it; a background task appends
+    queued entries in batches, when max_entries are waiting or flush_interval
+    seconds after the oldest one, with the file write done in a worker thread
+    so the trading loop never blocks on disk. close() (or leaving the
+    `async with` block, also on an exception) writes whatever is left, and an
+    atexit hook flushes loggers that were never closed.
+
+    Entries are the same lines as before: {"timestamp", "signature", "new_messages"}
+    per line, the timestamp taken when log() is called. With compression="gzip"
+    each batch is appended as a gzip member, and `zcat log.jsonl.gz` (or
+    iter_log_entries) gives back those lines.
+    """
+
+    def __init__(self, log_file, signature: str, compression: Optional[str] = None,
+                 max_entries: int = 64, flush_interval: float = 1.0):
+        """
+        Initialize SessionLogger
+
+        Args:
+            log_file: Path of the log (see log_file_path)
+            signature: Agent signature written in every entry
+            compression: None or "gzip"
+            max_entries: Queued entries that trigger a flush
+            flush_interval: Longest time in seconds an entry waits in the queue
+        """
+        if compression not in LOG_COMPRESSIONS:
+            raise ValueError(f"Unknown log compression '{compression}', expected one of {LOG_COMPRESSIONS}")
+        self.log_file = Path(log_file)
+        self.signature = signature
+        self.compression = compression
+        self.max_entries = max(1, max_entries)
+        self.flush_interval = flush_interval
+        self._buffer: List[str] = []
+        # Serializes file writes between the background task, close() and the atexit hook
+        self._write_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def log(self, new_messages: Any) -> None:
+        """Queue one entry"""
+        if self._closed:
+            raise RuntimeError(f"Log {self.log_file} is closed")
+        log_entry = {
+            "timestamp": datetime.now().isoformat(),
+            "signature": self.signature,
+            "new_messages": new_messages
+        }
+        # Serialized right away, so later changes to the messages cannot leak into the log
+        self._buffer.append(json.dumps(log_entry, ensure_ascii=False) + "\n")
+        _open_loggers.add(self)
+        if self._task is None:
+            self._start()
+        elif len(self._buffer) >= self.max_entries:
+            self._wakeup.set()
+
+    def _start(self) -> None:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts, tests): write through
+            self._write(self._take())
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def _take(self) -> List[str]:
+        lines, self._buffer = self._buffer, []
+        return lines
+
+    def _write(self, lines: List[str]) -> None:
+        if not lines:
+            return
+        data = "".join(lines).encode("utf-8")
+        with self._write_lock:
+            self.log_file.parent.mkdir(parents=True, exist_ok=True)
+            with self.log_file.open("ab") as f:
+                f.write(gzip.compress(data) if self.compression == "gzip" else data)
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await asyncio.to_thread(self._write, self._take())
+
+    def flush_sync(self) -> None:
+        """Write queued entries from the calling thread"""
+        self._write(self._take())
+
+    async def aclose(self) -> None:
+        """Stop the background task and write the remaining entries"""
+        self._closed = True
+        if self._task is not None:
+            self._wakeup.set()
+            try:
+                await self._task
+            finally:
+                self._task = None
+        await asyncio.to_thread(self._write, self._take())
+        _open_loggers.discard(self)
+
+    async def __aenter__(self) -> "SessionLogger":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+
+@atexit.register
+def _flush_open_loggers() -> None:
+    for logger in list(_open_loggers):
+        try:
+            logger.flush_sync()
+        except OSError:
+            pass
+
+
+def iter_log_entries(log_file) -> Iterator[dict]:
+    """Entries of a log.jsonl or log.jsonl.gz"""
+    log_file = Path(log_file)
+    opener = gzip.open if log_file.suffix == ".gz" else open
+    with opener(log_file, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,291 @@
+import os
+import json
+import math
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+import sys
+
+# Add project root directory to Python path to allow running this file from subdirectories
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+METRICS_DIRNAME = "metrics"
+METRICS_FILENAME = "metrics.jsonl"
+
+
+def metrics_file_path(base_log_path: str, signature: str, today_date: str) -> Path:
+    """{base_log_path}/{signature}/metrics/{today_date}/metrics.jsonl, next to log/{today_date}/log.jsonl"""
+    return Path(base_log_path) / signature / METRICS_DIRNAME / today_date / METRICS_FILENAME
+
+
+def _token_usage(message: Any) -> Dict[str, Optional[int]]:
+    """Prompt/completion tokens of an AI message, from response_metadata or usage_metadata"""
+    metadata = getattr(message, "response_metadata", None) or {}
+    usage = metadata.get("token_usage") or metadata.get("usage") or {}
+    prompt = usage.get("prompt_tokens", usage.get("input_tokens"))
+    completion = usage.get("completion_tokens", usage.get("output_tokens"))
+    if prompt is None and completion is None:
+        usage = getattr(message, "usage_metadata", None) or {}
+        prompt, completion = usage.get("input_tokens"), usage.get("output_tokens")
+    return {"prompt_tokens": prompt, "completion_tokens": completion}
+
+
+def _payload_chars(output: Any) -> int:
+    content = getattr(output, "content", output)
+    return len(content if isinstance(content, str) else json.dumps(content, ensure_ascii=False, default=str))
+
+
+class SessionMetrics(BaseCallbackHandler):
+    """
+    Timing records for one trading session, written to metrics.jsonl
+
+    Passed as a LangChain callback handler to the agent invocation, it times
+    every LLM call (latency, prompt/completion tokens) and every tool call
+    (latency, result size). BaseAgent adds one "step" record per reasoning
+    step (wall time, retries) and one "session" record at the end (steps used).
+    Records are buffered and appended once per step.
+
+    Record types (all carry ts, signature, date, session_id and step):
+        llm:     latency, prompt_tokens, completion_tokens, error
+        tool:    tool, latency, payload_chars, error
+        step:    latency, retries
+        session: latency, steps, retries, status
+    """
+
+    # Callbacks only do bookkeeping: run them on the event loop, not in a thread pool
+    run_inline = True
+
+    def __init__(self, metrics_file, signature: str, today_date: str, session_id: Optional[str] = None):
+        """
+        Initialize SessionMetrics
+
+        Args:
+            metrics_file: Path to metrics.jsonl (see metrics_file_path)
+            signature: Agent signature
+            today_date: Trading date of the session
+            session_id: Session id, if the session has one
+        """
+        self.metrics_file = Path(metrics_file)
+        self.signature = signature
+        self.today_date = today_date
+        self.session_id = session_id
+        self.step = 0
+        self.retries = 0
+        self._started = time.perf_counter()
+        self._step_started = self._started
+        self._step_retries = 0
+        self._pending: Dict[UUID, tuple] = {}
+        self._buffer: List[dict] = []
+
+    def _record(self, record_type: str, **fields) -> None:
+        self._buffer.append({
+            "type": record_type,
+            "ts": datetime.now().isoformat(),
+            "signature": self.signature,
+            "date": self.today_date,
+            "session_id": self.session_id,
+            "step": self.step,
+            **fields,
+        })
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
+        with self.metrics_file.open("a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in self._buffer))
+        self._buffer = []
+
+    # LangChain callbacks
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs) -> None:
+        self._pending[run_id] = ("llm", time.perf_counter(), None)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs) -> None:
+        self._pending[run_id] = ("llm", time.perf_counter(), None)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return
+        usage = {"prompt_tokens": None, "completion_tokens": None}
+        generations = getattr(response, "generations", None) or []
+        if generations and generations[0]:
+            usage = _token_usage(getattr(generations[0][0], "message", None))
+        if usage["prompt_tokens"] is None:
+            token_usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+            usage = {"prompt_tokens": token_usage.get("prompt_tokens"), "completion_tokens": token_usage.get("completion_tokens")}
+        self._record("llm", latency=time.perf_counter() - pending[1], error=None, **usage)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        pending = self._pending.pop(run_id, None)
+        if pending is not None:
+            self._record("llm", latency=time.perf_counter() - pending[1], prompt_tokens=None, completion_tokens=None, error=str(error)[:200])
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, **kwargs) -> None:
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._pending[run_id] = ("tool", time.perf_counter(), name)
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs) -> None:
+        pending = self._pending.pop(run_id, None)
+        if pending is not None:
+            self._record("tool", tool=pending[2], latency=time.perf_counter() - pending[1], payload_chars=_payload_chars(output), error=None)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        pending = self._pending.pop(run_id, None)
+        if pending is not None:
+            self._record("tool", tool=pending[2], latency=time.perf_counter() - pending[1], payload_chars=0, error=str(error)[:200])
+
+    # Session bookkeeping (called by BaseAgent)
+
+    def start_step(self, step: int) -> None:
+        self.step = step
+        self._step_started = time.perf_counter()
+        self._step_retries = 0
+
+    def retry(self) -> None:
+        """Count one retried agent invocation in the current step"""
+        self._step_retries += 1
+        self.retries += 1
+
+    def end_step(self) -> None:
+        self._record("step", latency=time.perf_counter() - self._step_started, retries=self._step_retries)
+        self.flush()
+
+    def end_session(self, status: str = "completed") -> None:
+        self._record("session", latency=time.perf_counter() - self._started, steps=self.step, retries=self.retries, status=status)
+        self.flush()
+
+
+def load_metrics(base_log_path: str, signature: Optional[str] = None) -> List[dict]:
+    """All metrics records under base_log_path, optionally for one signature"""
+    pattern = f"{signature or '*'}/{METRICS_DIRNAME}/*/{METRICS_FILENAME}"
+    records = []
+    for path in sorted(Path(base_log_path).glob(pattern)):
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return records
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(q / 100.0 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def aggregate_metrics(records: List[dict]) -> Dict[str, List[dict]]:
+    """
+    Aggregate metrics records per model, per model and day, and per tool
+
+    Returns:
+        {"models": [...], "days": [...], "tools": [...]}, each row with counts,
+        totals and p50/p95 latencies in seconds
+    """
+    def summarize(group: List[dict]) -> dict:
+        llm = [r for r in group if r["type"] == "llm"]
+        tools = [r for r in group if r["type"] == "tool"]
+        steps = [r for r in group if r["type"] == "step"]
+        sessions = [r for r in group if r["type"] == "session"]
+        return {
+            "sessions": len(sessions),
+            "steps": sum(r.get("steps", 0) for r in sessions) or len(steps),
+            "retries": sum(r.get("retries", 0) for r in steps),
+            "wall_time": sum(r["latency"] for r in sessions) or sum(r["latency"] for r in steps),
+            "llm_calls": len(llm),
+            "llm_time": sum(r["latency"] for r in llm),
+            "llm_p50": _percentile([r["latency"] for r in llm], 50),
+            "llm_p95": _percentile([r["latency"] for r in llm], 95),
+            "prompt_tokens": sum(r.get("prompt_tokens") or 0 for r in llm),
+            "completion_tokens": sum(r.get("completion_tokens") or 0 for r in llm),
+            "tool_calls": len(tools),
+            "tool_time": sum(r["latency"] for r in tools),
+        }
+
+    by_model: Dict[str, List[dict]] = {}
+    by_day: Dict[tuple, List[dict]] = {}
+    by_tool: Dict[str, List[dict]] = {}
+    for r in records:
+        by_model.setdefault(r.get("signature"), []).append(r)
+        by_day.setdefault((r.get("signature"), r.get("date")), []).append(r)
+        if r["type"] == "tool":
+            by_tool.setdefault(r.get("tool"), []).append(r)
+
+    tools = []
+    for name, group in sorted(by_tool.items()):
+        latencies = [r["latency"] for r in group]
+        tools.append({
+            "tool": name,
+            "calls": len(group),
+            "errors": sum(1 for r in group if r.get("error")),
+            "total_time": sum(latencies),
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "payload_p50": _percentile([r.get("payload_chars", 0) for r in group], 50),
+            "payload_p95": _percentile([r.get("payload_chars", 0) for r in group], 95),
+        })
+    return {
+        "models": [{"signature": sig, **summarize(group)} for sig, group in sorted(by_model.items())],
+        "days": [{"signature": sig, "date": date, **summarize(group)} for (sig, date), group in sorted(by_day.items())],
+        "tools": tools,
+    }
+
+
+def _format_table(rows: List[dict], columns: List[str]) -> str:
+    def fmt(value):
+        if value is None:
+            return "-"
+        if isinstance(value, float):
+            return f"{value:.3f}"
+        return str(value)
+    cells = [columns] + [[fmt(row.get(c)) for c in columns] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(columns))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in cells]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+def print_report(report: Dict[str, List[dict]]) -> None:
+    session_columns = ["sessions", "steps", "retries", "wall_time", "llm_calls", "llm_time", "llm_p50", "llm_p95",
+                       "prompt_tokens", "completion_tokens", "tool_calls", "tool_time"]
+    print("📊 Per model (seconds)")
+    print(_format_table(report["models"], ["signature"] + session_columns))
+    print()
+    print("📅 Per model and day (seconds)")
+    print(_format_table(report["days"], ["signature", "date"] + session_columns))
+    print()
+    print("🔧 Per tool (seconds, payload in characters)")
+    print(_format_table(report["tools"], ["tool", "calls", "errors", "total_time", "p50", "p95", "payload_p50", "payload_p95"]))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Trading session metrics")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report_parser = subparsers.add_parser("report", help="Aggregate metrics per model, per day and per tool (p50/p95)")
+    report_parser.add_argument("--base-dir", default=os.path.join(project_root, "data", "agent_data"), help="agent_data directory (log_path)")
+    report_parser.add_argument("--signature", help="Only this agent signature")
+    report_parser.add_argument("--json", action="store_true", help="Print the aggregates as JSON")
+    args = parser.parse_args()
+
+    records = load_metrics(args.base_dir, args.signature)
+    if not records:
+        parser.exit(1, f"No metrics found under {args.base_dir}\n")
+    report = aggregate_metrics(records)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
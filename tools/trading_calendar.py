@@ -0,0 +1,181 @@
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+import sys
+
+# Add project root directory to Python path to allow running this file from subdirectories
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from tools.price_store import PriceStore, get_price_store
+
+# NYSE full-day market closures
+NYSE_HOLIDAYS = frozenset([
+    # 2023
+    "2023-01-02", "2023-01-16", "2023-02-20", "2023-04-07", "2023-05-29",
+    "2023-06-19", "2023-07-04", "2023-09-04", "2023-11-23", "2023-12-25",
+    # 2024
+    "2024-01-01", "2024-01-15", "2024-02-19", "2024-03-29", "2024-05-27",
+    "2024-06-19", "2024-07-04", "2024-09-02", "2024-11-28", "2024-12-25",
+    # 2025
+    "2025-01-01", "2025-01-09", "2025-01-20", "2025-02-17", "2025-04-18",
+    "2025-05-26", "2025-06-19", "2025-07-04", "2025-09-01", "2025-11-27",
+    "2025-12-25",
+    # 2026
+    "2026-01-01", "2026-01-19", "2026-02-16", "2026-04-03", "2026-05-25",
+    "2026-06-19", "2026-07-03", "2026-09-07", "2026-11-26", "2026-12-25",
+])
+
+_DATE_FORMAT = "%Y-%m-%d"
+
+
+def is_rule_trading_day(date: str, holidays: Iterable[str] = NYSE_HOLIDAYS) -> bool:
+    """Weekday that is not a listed holiday"""
+    return datetime.strptime(date, _DATE_FORMAT).weekday() < 5 and date not in holidays
+
+
+class TradingCalendar:
+    """
+    Sorted array of trading days with bisect-based navigation
+
+    Inside the span covered by merged.jsonl, the trading days are exactly the
+    dates that have bars. Outside it, they are weekdays minus the NYSE holiday
+    table, so dates before or after the data are still handled sensibly.
+    """
+
+    def __init__(self, data_dates: Iterable[str], holidays: Iterable[str] = NYSE_HOLIDAYS, store: Optional[PriceStore] = None):
+        """
+        Initialize TradingCalendar
+
+        Args:
+            data_dates: Dates that have price data
+            holidays: Full-day market closures used outside the data span
+            store: PriceStore used by nearest_available
+        """
+        self.holidays = frozenset(holidays)
+        self._store = store
+        data = sorted(set(data_dates))
+        self.first_data_date: Optional[str] = data[0] if data else None
+        self.last_data_date: Optional[str] = data[-1] if data else None
+
+        years = sorted({d[:4] for d in self.holidays} | {d[:4] for d in data})
+        rule_days: List[str] = []
+        if years:
+            current = datetime.strptime(f"{years[0]}-01-01", _DATE_FORMAT)
+            last = datetime.strptime(f"{years[-1]}-12-31", _DATE_FORMAT)
+            while current <= last:
+                day = current.strftime(_DATE_FORMAT)
+                if current.weekday() < 5 and day not in self.holidays:
+                    if not data or not (data[0] <= day <= data[-1]):
+                        rule_days.append(day)
+                current += timedelta(days=1)
+
+        self.days: List[str] = sorted(set(rule_days) | set(data))
+        self._position: Dict[str, int] = {d: i for i, d in enumerate(self.days)}
+        self._symbol_dates: Dict[str, List[str]] = {}
+
+    @classmethod
+    def from_store(cls, store: PriceStore) -> "TradingCalendar":
+        """Build a calendar from the dates present in a PriceStore"""
+        return cls(store.all_dates(), store=store)
+
+    def _rule_step(self, date: str, step: int) -> str:
+        current = datetime.strptime(date, _DATE_FORMAT) + timedelta(days=step)
+        while not is_rule_trading_day(current.strftime(_DATE_FORMAT), self.holidays):
+            current += timedelta(days=step)
+        return current.strftime(_DATE_FORMAT)
+
+    def is_trading_day(self, date: str) -> bool:
+        if date in self._position:
+            return True
+        if self.days and self.days[0] <= date <= self.days[-1]:
+            return False
+        return is_rule_trading_day(date, self.holidays)
+
+    def prev_trading_day(self, date: str) -> str:
+        """Latest trading day strictly before date"""
+        i = bisect_left(self.days, date)
+        if i > 0:
+            return self.days[i - 1]
+        return self._rule_step(date, -1)
+
+    def next_trading_day(self, date: str) -> str:
+        """Earliest trading day strictly after date"""
+        i = bisect_right(self.days, date)
+        if i < len(self.days):
+            return self.days[i]
+        return self._rule_step(date, 1)
+
+    def trading_days_between(self, start: str, end: str) -> List[str]:
+        """Trading days in [start, end], both inclusive"""
+        if start > end:
+            return []
+        days = self.days[bisect_left(self.days, start):bisect_right(self.days, end)]
+        # Extend with rule-based days if the range runs past the precomputed array
+        if not self.days or end > self.days[-1]:
+            if self.days and self.days[-1] >= start:
+                current = self.days[-1]
+            else:
+                current = self._rule_step(start, -1)
+            while True:
+                current = self._rule_step(current, 1)
+                if current > end:
+                    break
+                days.append(current)
+        return days
+
+    def nearest_available(self, symbol: str, date: str, max_lookback: Optional[int] = None) -> Optional[str]:
+        """
+        Latest date on or before `date` that has a bar for symbol
+
+        Args:
+            symbol: Stock symbol
+            date: Date in YYYY-MM-DD format
+            max_lookback: Optional limit on how many trading days back the bar may be
+
+        Returns:
+            Date string, or None if no bar is found (within max_lookback)
+        """
+        dates = self._symbol_dates.get(symbol)
+        if dates is None:
+            dates = self._store.available_dates(symbol) if self._store is not None else []
+            self._symbol_dates[symbol] = dates
+        i = bisect_right(dates, date)
+        if i == 0:
+            return None
+        found = dates[i - 1]
+        if max_lookback is not None:
+            gap = bisect_right(self.days, date) - bisect_right(self.days, found)
+            if gap > max_lookback:
+                return None
+        return found
+
+
+_calendars: Dict[str, tuple] = {}
+_calendars_lock = threading.Lock()
+
+
+def get_trading_calendar(merged_path: Optional[str] = None) -> TradingCalendar:
+    """
+    Get the shared TradingCalendar for a merged.jsonl path, rebuilt when the file changes
+
+    Args:
+        merged_path: Optional custom merged.jsonl path; defaults to data/merged.jsonl
+
+    Returns:
+        TradingCalendar instance
+    """
+    store = get_price_store(merged_path)
+    key = str(store.merged_path)
+    stamp = store.stamp()
+    cached = _calendars.get(key)
+    if cached is None or cached[0] != stamp:
+        with _calendars_lock:
+            cached = _calendars.get(key)
+            if cached is None or cached[0] != stamp:
+                cached = (stamp, TradingCalendar.from_store(store))
+                _calendars[key] = cached
+    return cached[1]